@@ -0,0 +1,369 @@
+"""Batch chat runs for offline and evaluation workloads.
+
+Input is JSONL, one item per line::
+
+    {"id": "q1", "persona": "mental_health_nurse", "prompt": "...",
+     "conversation": [{"role": "user", "content": "..."}, ...]}
+
+``id`` defaults to the line number and ``persona`` to the default persona.
+``conversation`` is optional prior history. Items are answered with bounded
+concurrency and results are written as JSONL in completion order, one line
+per item::
+
+    {"id": "q1", "persona": "...", "response": "...", "error": null,
+     "timings": {"queue_ms": 0.4, "generate_ms": 2310.5, "total_ms": 2311.2}}
+
+By default Redis is not touched at all. With memory enabled, each item must
+carry a ``user_id``; its stored history is used as the context and the
+exchange is appended to it, as with the chat API.
+
+The output file doubles as the checkpoint: each result is flushed as soon as
+it completes, and ``--resume`` skips items already answered successfully
+(failed items are retried)::
+
+    python -m app.batch prompts.jsonl -o results.jsonl --concurrency 4
+    python -m app.batch prompts.jsonl -o results.jsonl --resume
+"""
+import argparse
+import asyncio
+import json
+import logging
+import sys
+import time
+from typing import Any, AsyncIterator, Dict, Iterable, Iterator, List, Optional, Set
+
+from redis import Redis
+
+from app import metrics
+from app.cascade import ModelCascade, create_cascade
+from app.circuit_breaker import CircuitOpenError
+from app.memory import ChatMemoryManager
+from app.llm_router import LLMRouter, create_llm_router
+from app.persona import PersonaManager
+from app.scheduler import GenerationScheduler
+from app.write_behind import WriteBehindBuffer
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+def parse_items(lines: Iterable[str], require_user_id: bool = False) -> Iterator[Dict[str, Any]]:
+    """Parse batch input lines into items.
+    
+    Args:
+        lines: JSONL lines; blank lines are skipped
+        require_user_id: Reject items without ``user_id`` (memory mode)
+    
+    Yields:
+        Item dictionaries with ``id`` filled in
+    
+    Raises:
+        ValueError: For malformed lines, naming the line number
+    """
+    for line_no, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            item = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Line {line_no}: invalid JSON ({e})")
+        if not isinstance(item, dict) or not isinstance(item.get("prompt"), str):
+            raise ValueError(f"Line {line_no}: item needs a string 'prompt'")
+        if require_user_id and not item.get("user_id"):
+            raise ValueError(f"Line {line_no}: 'user_id' is required when memory is enabled")
+        item["id"] = str(item.get("id", line_no))
+        yield item
+
+
+def build_prompt(conversation: List[Dict[str, Any]], prompt: str) -> str:
+    """Format history and the new message the way the chat endpoints do.
+    
+    Args:
+        conversation: Prior messages with ``role`` and ``content``
+        prompt: New user message
+    
+    Returns:
+        Prompt text ending with ``Assistant:``
+    """
+    context = "\n".join(
+        f"{'User' if msg.get('role') == 'user' else 'Assistant'}: {msg.get('content', '')}"
+        for msg in conversation
+    )
+    if context:
+        return f"{context}\n\nUser: {prompt}\nAssistant:"
+    return f"User: {prompt}\nAssistant:"
+
+
+def completed_ids(path: str) -> Set[str]:
+    """Get ids answered successfully in an existing results file.
+    
+    A partially written last line (interrupted run) is ignored.
+    
+    Args:
+        path: Results JSONL file
+    
+    Returns:
+        Set of item ids; empty if the file does not exist
+    """
+    done: Set[str] = set()
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    result = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if result.get("error") is None:
+                    done.add(str(result.get("id")))
+    except FileNotFoundError:
+        pass
+    return done
+
+
+class BatchRunner:
+    """Answers batch items with bounded concurrency."""
+    
+    def __init__(
+        self,
+        llm: LLMRouter,
+        persona_manager: PersonaManager,
+        scheduler: GenerationScheduler,
+        concurrency: int = 4,
+        redis_client: Optional[Redis] = None,
+        max_retries: int = 3,
+        cascade: Optional[ModelCascade] = None,
+        write_buffer: Optional[WriteBehindBuffer] = None
+    ):
+        """Initialize batch runner.
+        
+        Args:
+            llm: LLM router
+            persona_manager: Persona configuration
+            scheduler: Generation scheduler; batch items share its slots
+            concurrency: Items in flight at once for this run
+            redis_client: Redis client; enables reading and writing memory
+            max_retries: Attempts per item while the circuit breaker is open
+            cascade: Small/large model routing; None uses persona backends
+            write_buffer: Write-behind buffer whose queued replies for a user
+                are written before that user's history is read
+        """
+        self.llm = llm
+        self.persona_manager = persona_manager
+        self.scheduler = scheduler
+        self.concurrency = max(concurrency, 1)
+        self.redis = redis_client
+        self.max_retries = max_retries
+        self.cascade = cascade
+        self.write_buffer = write_buffer
+    
+    async def run(self, items: Iterable[Dict[str, Any]]) -> AsyncIterator[Dict[str, Any]]:
+        """Answer items, yielding results as they complete.
+        
+        Items are pulled lazily, so large inputs are never held in memory.
+        
+        Args:
+            items: Parsed batch items
+        
+        Yields:
+            Result dictionaries (see module docstring)
+        """
+        pending = iter(items)
+        results: asyncio.Queue = asyncio.Queue()
+        
+        async def worker() -> None:
+            try:
+                for item in pending:
+                    await results.put(await self.run_item(item))
+            finally:
+                await results.put(_DONE)
+        
+        workers = [asyncio.create_task(worker()) for _ in range(self.concurrency)]
+        remaining = len(workers)
+        try:
+            while remaining:
+                result = await results.get()
+                if result is _DONE:
+                    remaining -= 1
+                    continue
+                yield result
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+    
+    async def run_item(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        """Answer a single item.
+        
+        Args:
+            item: Parsed batch item
+        
+        Returns:
+            Result dictionary; failures are reported in ``error``
+        """
+        started = time.perf_counter()
+        persona_key = item.get("persona") or self.persona_manager.get_default_persona()
+        result: Dict[str, Any] = {"id": item["id"], "persona": persona_key, "response": None, "error": None}
+        timings: Dict[str, float] = {}
+        
+        persona_info = self.persona_manager.get_persona_info(persona_key)
+        if not persona_info:
+            result["error"] = f"Unknown persona: {persona_key}"
+            result["timings"] = {"total_ms": _ms(started)}
+            return result
+        
+        memory = None
+        conversation = item.get("conversation") or []
+        if self.redis is not None:
+            if self.write_buffer is not None:
+                self.write_buffer.flush_user(item["user_id"])
+            memory = ChatMemoryManager(self.redis, item["user_id"])
+            conversation = memory.get_messages()
+        prompt = build_prompt(conversation, item["prompt"])
+        backend = self.persona_manager.get_backend(persona_key)
+        if self.cascade is not None:
+            backend = self.cascade.select_backend(item["prompt"], persona_key, backend)
+        
+        generate_started: List[float] = []
+        
+        def generate() -> str:
+            generate_started.append(time.perf_counter())
+            return self.llm.generate(
+                prompt=prompt,
+                system=self.persona_manager.get_system_prompt(persona_key),
+                options=self.persona_manager.get_generation_options(persona_key),
+                backend=backend
+            )
+        
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                result["response"] = await self.scheduler.run(generate)
+                result["error"] = None
+                break
+            except CircuitOpenError as e:
+                result["error"] = str(e)
+                if attempt == self.max_retries:
+                    break
+                logger.warning(f"Batch item {item['id']} waiting {e.retry_after:.1f}s for {e.name}")
+                await asyncio.sleep(e.retry_after)
+            except Exception as e:
+                logger.error(f"Batch item {item['id']} failed: {e}")
+                result["error"] = str(e)
+                break
+        
+        finished = time.perf_counter()
+        if generate_started:
+            timings["queue_ms"] = round((generate_started[-1] - started) * 1000, 1)
+            timings["generate_ms"] = round((finished - generate_started[-1]) * 1000, 1)
+        timings["total_ms"] = _ms(started)
+        result["timings"] = timings
+        metrics.CHAT_LATENCY.labels(endpoint="batch").observe(finished - started)
+        
+        if memory is not None and result["error"] is None:
+            memory.add_message("user", item["prompt"])
+            memory.add_message("assistant", result["response"])
+        
+        return result
+
+
+def _ms(started: float) -> float:
+    """Milliseconds elapsed since ``started`` (a ``perf_counter`` value)."""
+    return round((time.perf_counter() - started) * 1000, 1)
+
+
+def _ends_with_newline(path: str) -> bool:
+    """Whether a non-empty file's last byte is a newline."""
+    with open(path, "rb") as f:
+        f.seek(-1, 2)
+        return f.read(1) == b"\n"
+
+
+async def run_file(
+    runner: BatchRunner,
+    input_path: str,
+    output_path: str,
+    resume: bool = False
+) -> Dict[str, Any]:
+    """Run a batch from a JSONL file into a JSONL results file.
+    
+    Args:
+        runner: Configured batch runner
+        input_path: Input JSONL file
+        output_path: Results file, appended to when resuming
+        resume: Skip items already answered in ``output_path``
+    
+    Returns:
+        Summary with item counts and elapsed time
+    """
+    skip = completed_ids(output_path) if resume else set()
+    require_user_id = runner.redis is not None
+    
+    # Validate up front so a bad line fails the run before any generation
+    with open(input_path, "r", encoding="utf-8") as f:
+        for _ in parse_items(f, require_user_id):
+            pass
+    
+    started = time.perf_counter()
+    summary = {"completed": 0, "failed": 0, "skipped": 0}
+    
+    def remaining() -> Iterator[Dict[str, Any]]:
+        with open(input_path, "r", encoding="utf-8") as f:
+            for item in parse_items(f, require_user_id):
+                if item["id"] in skip:
+                    summary["skipped"] += 1
+                    continue
+                yield item
+    
+    with open(output_path, "a" if resume else "w", encoding="utf-8") as out:
+        if out.tell() and not _ends_with_newline(output_path):
+            # Terminate a line cut off by an interrupted run; it is ignored on resume
+            out.write("\n")
+        async for result in runner.run(remaining()):
+            out.write(json.dumps(result) + "\n")
+            out.flush()
+            summary["failed" if result["error"] else "completed"] += 1
+    
+    summary["elapsed_seconds"] = round(time.perf_counter() - started, 2)
+    return summary
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Command line entry point."""
+    from config.config import settings
+    from app.redis_client import create_redis_client
+    
+    parser = argparse.ArgumentParser(description="Run a batch of chat prompts")
+    parser.add_argument("input", help="JSONL file of items")
+    parser.add_argument("-o", "--output", required=True, help="JSONL results file (also the checkpoint)")
+    parser.add_argument("--concurrency", type=int, default=settings.max_concurrent_generations)
+    parser.add_argument("--resume", action="store_true", help="Skip items already answered in --output")
+    parser.add_argument("--memory", action="store_true", help="Use and update Redis conversation memory")
+    parser.add_argument("--personas", default="config/personas.yaml")
+    args = parser.parse_args(argv)
+    
+    logging.basicConfig(
+        level=settings.log_level,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    
+    runner = BatchRunner(
+        create_llm_router(settings),
+        PersonaManager(args.personas),
+        GenerationScheduler(args.concurrency),
+        concurrency=args.concurrency,
+        redis_client=create_redis_client(settings) if args.memory else None,
+        cascade=create_cascade(settings)
+    )
+    
+    try:
+        summary = asyncio.run(run_file(runner, args.input, args.output, resume=args.resume))
+    except ValueError as e:
+        parser.exit(2, f"{e}\n")
+    
+    print(json.dumps(summary))
+    if summary["failed"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""Cascade routing: simple turns to a small fast model, hard ones to the large one.
+
+The decision is made per message, before generation, from cheap local
+signals only:
+
+1. personas listed as large-only always use the large model
+2. escalation keywords (by default crisis and medical terms, where answer
+   quality matters most) force the large model
+3. messages longer than ``max_chars`` use the large model
+4. otherwise a complexity score in [0, 1] is compared with ``threshold``
+
+The score comes from ``complexity_score`` unless another scorer (e.g. a
+trained classifier) is passed in.
+"""
+import logging
+import re
+from typing import Callable, Iterable, Optional, Tuple
+
+from app import metrics
+
+logger = logging.getLogger(__name__)
+
+SMALL = "small"
+LARGE = "large"
+
+# Words that suggest the user wants reasoning or planning rather than a short reply
+_REASONING_CUES = re.compile(
+    r"\b(why|how|explain|compare|difference|plan|steps?|pros|cons|should i|what if)\b",
+    re.IGNORECASE
+)
+
+
+def complexity_score(message: str) -> float:
+    """Estimate how demanding a message is, from 0 (trivial) to 1 (hard).
+    
+    Combines length, the number of questions asked, reasoning cues and
+    multi-line structure. Cheap enough to run on every message.
+    
+    Args:
+        message: User message
+    
+    Returns:
+        Score in [0, 1]
+    """
+    words = len(message.split())
+    score = min(words / 60, 1.0) * 0.4
+    if message.count("?") > 1:
+        score += 0.2
+    if _REASONING_CUES.search(message):
+        score += 0.25
+    if message.count("\n") >= 2:
+        score += 0.15
+    return min(score, 1.0)
+
+
+class ModelCascade:
+    """Chooses the small or large model for each message."""
+    
+    def __init__(
+        self,
+        max_chars: int = 200,
+        threshold: float = 0.5,
+        escalate_keywords: Iterable[str] = (),
+        large_personas: Iterable[str] = (),
+        scorer: Callable[[str], float] = complexity_score
+    ):
+        """Initialize cascade.
+        
+        Args:
+            max_chars: Longer messages go to the large model
+            threshold: Scores at or above this go to the large model
+            escalate_keywords: Case-insensitive phrases that force the large model
+            large_personas: Personas that always use the large model
+            scorer: Function scoring a message's complexity in [0, 1]
+        """
+        self.max_chars = max_chars
+        self.threshold = threshold
+        self.keywords = [keyword.lower() for keyword in escalate_keywords if keyword]
+        self.large_personas = set(large_personas)
+        self.scorer = scorer
+    
+    def route(self, message: str, persona_key: Optional[str] = None) -> Tuple[str, str]:
+        """Decide which model answers a message.
+        
+        Args:
+            message: User message
+            persona_key: Persona answering
+        
+        Returns:
+            ``(route, reason)``: route is ``small`` or ``large``; reason is
+            ``persona``, ``keyword``, ``length``, ``score`` or ``simple``
+        """
+        if persona_key in self.large_personas:
+            return self._record(LARGE, "persona")
+        lowered = message.lower()
+        if any(keyword in lowered for keyword in self.keywords):
+            return self._record(LARGE, "keyword")
+        if len(message) > self.max_chars:
+            return self._record(LARGE, "length")
+        if self.scorer(message) >= self.threshold:
+            return self._record(LARGE, "score")
+        return self._record(SMALL, "simple")
+    
+    def select_backend(
+        self,
+        message: str,
+        persona_key: Optional[str],
+        pinned_backend: Optional[str]
+    ) -> Optional[str]:
+        """Get the backend for a message.
+        
+        Personas pinned to a backend keep it; the cascade only chooses
+        between the small model and the default backend.
+        
+        Args:
+            message: User message
+            persona_key: Persona answering
+            pinned_backend: Backend named by the persona, if any
+        
+        Returns:
+            ``small`` for simple turns, otherwise ``pinned_backend``
+        """
+        if pinned_backend:
+            return pinned_backend
+        route, _ = self.route(message, persona_key)
+        return SMALL if route == SMALL else None
+    
+    @staticmethod
+    def _record(route: str, reason: str) -> Tuple[str, str]:
+        metrics.CASCADE_ROUTES.labels(route=route, reason=reason).inc()
+        return route, reason
+
+
+def create_cascade(settings) -> Optional[ModelCascade]:
+    """Build the cascade from settings.
+    
+    Args:
+        settings: Application settings
+    
+    Returns:
+        Cascade, or None when no small model is configured
+    """
+    if not settings.small_model_name:
+        return None
+    return ModelCascade(
+        max_chars=settings.cascade_max_chars,
+        threshold=settings.cascade_score_threshold,
+        escalate_keywords=settings.cascade_escalate_keyword_list,
+        large_personas=settings.cascade_large_persona_list
+    )
@@ -0,0 +1,164 @@
+"""Circuit breaker for fast-failing calls to an unhealthy backend."""
+import logging
+import threading
+import time
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is rejected because the circuit is open."""
+    
+    def __init__(self, name: str, retry_after: float):
+        """Initialize error.
+        
+        Args:
+            name: Name of the protected backend
+            retry_after: Seconds until the circuit half-opens
+        """
+        super().__init__(f"{name} is unavailable (circuit open, retry in {retry_after:.0f}s)")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with half-open probing.
+    
+    - closed: calls pass through; consecutive errors or slow calls are counted
+    - open: calls are rejected immediately with ``CircuitOpenError``
+    - half_open: after ``recovery_timeout`` a limited number of probe calls
+      are let through; a success closes the circuit, a failure re-opens it
+    """
+    
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+    
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        recovery_timeout: float = 30.0,
+        slow_call_threshold: Optional[float] = None,
+        half_open_max_calls: int = 1
+    ):
+        """Initialize circuit breaker.
+        
+        Args:
+            name: Name of the protected backend (used in logs and errors)
+            failure_threshold: Consecutive failures that open the circuit
+            recovery_timeout: Seconds to stay open before probing
+            slow_call_threshold: Calls slower than this many seconds count as failures
+            half_open_max_calls: Concurrent probe calls allowed while half-open
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.slow_call_threshold = slow_call_threshold
+        self.half_open_max_calls = half_open_max_calls
+        
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._lock = threading.Lock()
+    
+    @property
+    def state(self) -> str:
+        """Current state, moving open to half_open once the timeout has passed."""
+        with self._lock:
+            return self._current_state()
+    
+    def _current_state(self) -> str:
+        """Compute state; caller must hold the lock."""
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.recovery_timeout:
+            self._state = self.HALF_OPEN
+            self._probes_in_flight = 0
+            logger.info(f"Circuit for {self.name} half-open, probing")
+        return self._state
+    
+    def before_call(self) -> None:
+        """Reserve permission for a call.
+        
+        Raises:
+            CircuitOpenError: If the circuit is open or half-open probes are exhausted
+        """
+        with self._lock:
+            state = self._current_state()
+            if state == self.CLOSED:
+                return
+            if state == self.HALF_OPEN and self._probes_in_flight < self.half_open_max_calls:
+                self._probes_in_flight += 1
+                return
+            retry_after = max(self.recovery_timeout - (time.monotonic() - self._opened_at), 0.0)
+            raise CircuitOpenError(self.name, retry_after)
+    
+    def record_success(self, duration: Optional[float] = None) -> None:
+        """Record a completed call.
+        
+        Args:
+            duration: Call duration in seconds, checked against the slow-call threshold
+        """
+        if self.slow_call_threshold is not None and duration is not None \
+                and duration > self.slow_call_threshold:
+            logger.warning(f"Slow call to {self.name}: {duration:.1f}s")
+            self.record_failure()
+            return
+        
+        with self._lock:
+            if self._state != self.CLOSED:
+                logger.info(f"Circuit for {self.name} closed")
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probes_in_flight = 0
+    
+    def record_failure(self) -> None:
+        """Record a failed (or too slow) call."""
+        with self._lock:
+            state = self._current_state()
+            self._failures += 1
+            if state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if state != self.OPEN:
+                    logger.warning(
+                        f"Circuit for {self.name} opened after {self._failures} consecutive failures"
+                    )
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._probes_in_flight = 0
+    
+    def call(self, func, *args, **kwargs) -> Any:
+        """Run a function under the breaker.
+        
+        Args:
+            func: Callable to invoke
+            *args: Positional arguments for func
+            **kwargs: Keyword arguments for func
+        
+        Returns:
+            Result of func
+        
+        Raises:
+            CircuitOpenError: If the call is rejected
+        """
+        self.before_call()
+        started = time.monotonic()
+        try:
+            result = func(*args, **kwargs)
+        except Exception:
+            self.record_failure()
+            raise
+        self.record_success(time.monotonic() - started)
+        return result
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """Get breaker state for health reporting.
+        
+        Returns:
+            Dictionary with state and consecutive failure count
+        """
+        with self._lock:
+            return {
+                "state": self._current_state(),
+                "consecutive_failures": self._failures
+            }
@@ -0,0 +1,194 @@
+"""Load-adaptive degradation: shorter prompts and replies under peak load.
+
+When generations queue up or get slow, answering with less history and a
+lower ``max_tokens`` is better than timing out. The controller maps load
+onto a level:
+
+- ``normal``: full context window and persona ``max_tokens``
+- ``reduced``: half the history, 60% of ``max_tokens``
+- ``minimal``: a fifth of the history, 30% of ``max_tokens``
+
+Load is read from the generation scheduler: its queue depth and its
+moving-average latency (queue wait plus generation time). Levels rise as
+soon as a threshold is crossed and fall one step at a time, only after
+load has stayed below the current level for ``recovery_seconds``, so the
+level does not flap.
+"""
+import logging
+import time
+from dataclasses import dataclass, replace
+from typing import Callable, Dict, Sequence
+
+from app import metrics
+from app.llm import GenerationOptions
+from app.scheduler import GenerationScheduler
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class DegradationLevel:
+    """How much of the context window and reply length a level keeps."""
+    
+    name: str
+    context_fraction: float
+    max_tokens_fraction: float
+
+
+LEVELS = (
+    DegradationLevel("normal", 1.0, 1.0),
+    DegradationLevel("reduced", 0.5, 0.6),
+    DegradationLevel("minimal", 0.2, 0.3),
+)
+
+
+class DegradationController:
+    """Chooses the degradation level from scheduler load."""
+    
+    def __init__(
+        self,
+        scheduler: GenerationScheduler,
+        queue_thresholds: Sequence[int] = (8, 16),
+        latency_thresholds: Sequence[float] = (30.0, 60.0),
+        recovery_seconds: float = 30.0,
+        min_context_messages: int = 2,
+        min_max_tokens: int = 64,
+        enabled: bool = True,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """Initialize controller.
+        
+        Args:
+            scheduler: Scheduler whose queue depth and latency are watched
+            queue_thresholds: Waiting generations that trigger each level above normal
+            latency_thresholds: Recent latency in seconds that triggers each level
+            recovery_seconds: Time below the current level's thresholds before stepping down
+            min_context_messages: Fewest history messages kept at any level
+            min_max_tokens: Lowest ``max_tokens`` used at any level
+            enabled: When False the level stays normal
+            clock: Monotonic time source
+        """
+        self.scheduler = scheduler
+        self.queue_thresholds = list(queue_thresholds)
+        self.latency_thresholds = list(latency_thresholds)
+        self.recovery_seconds = recovery_seconds
+        self.min_context_messages = min_context_messages
+        self.min_max_tokens = min_max_tokens
+        self.enabled = enabled
+        self.clock = clock
+        self.level = 0
+        self._calm_since = None
+        metrics.DEGRADATION_LEVEL.set(0)
+    
+    @property
+    def current(self) -> DegradationLevel:
+        """The level in force."""
+        return LEVELS[self.level]
+    
+    def update(self) -> DegradationLevel:
+        """Re-evaluate load and move the level if needed.
+        
+        Cheap; called before each chat turn and on health checks.
+        
+        Returns:
+            The level now in force
+        """
+        if not self.enabled:
+            return self.current
+        
+        target = self._target_level()
+        now = self.clock()
+        if target > self.level:
+            self._set_level(target)
+            self._calm_since = None
+        elif target < self.level:
+            if self._calm_since is None:
+                self._calm_since = now
+            elif now - self._calm_since >= self.recovery_seconds:
+                self._set_level(self.level - 1)
+                self._calm_since = now
+        else:
+            self._calm_since = None
+        return self.current
+    
+    def context_limit(self, max_messages: int) -> int:
+        """Get the number of history messages to put in the prompt.
+        
+        Args:
+            max_messages: Messages used at the normal level
+        
+        Returns:
+            Message limit for the current level
+        """
+        limit = int(max_messages * self.current.context_fraction)
+        return min(max_messages, max(limit, self.min_context_messages))
+    
+    def apply(self, options: GenerationOptions) -> GenerationOptions:
+        """Get generation options with ``max_tokens`` cut for the current level.
+        
+        Args:
+            options: Persona generation options
+        
+        Returns:
+            The same options at the normal level, otherwise a reduced copy
+        """
+        if self.level == 0:
+            return options
+        num_predict = int(options.num_predict * self.current.max_tokens_fraction)
+        return replace(options, num_predict=min(options.num_predict, max(num_predict, self.min_max_tokens)))
+    
+    def snapshot(self) -> Dict:
+        """Get the level and the load it was derived from.
+        
+        Returns:
+            Dictionary with level, name, queue_depth and recent_latency
+        """
+        return {
+            "level": self.level,
+            "name": self.current.name,
+            "queue_depth": self.scheduler.waiting,
+            "recent_latency": round(self.scheduler.recent_latency, 3)
+        }
+    
+    def _target_level(self) -> int:
+        """Level matching the current load, ignoring hysteresis."""
+        queue_level = sum(1 for threshold in self.queue_thresholds if self.scheduler.waiting >= threshold)
+        latency_level = 0
+        # The latency average only moves when calls finish, so an idle
+        # scheduler would otherwise keep the last busy value forever
+        if self.scheduler.active or self.scheduler.waiting:
+            latency = self.scheduler.recent_latency
+            latency_level = sum(1 for threshold in self.latency_thresholds if latency >= threshold)
+        return min(max(queue_level, latency_level), len(LEVELS) - 1)
+    
+    def _set_level(self, level: int) -> None:
+        """Switch level, logging and recording the change."""
+        previous = self.current.name
+        self.level = level
+        metrics.DEGRADATION_LEVEL.set(level)
+        metrics.DEGRADATION_CHANGES.labels(level=self.current.name).inc()
+        logger.warning(
+            f"Degradation {previous} -> {self.current.name} "
+            f"(queue {self.scheduler.waiting}, latency {self.scheduler.recent_latency:.1f}s)"
+        )
+
+
+def create_degradation_controller(settings, scheduler: GenerationScheduler) -> DegradationController:
+    """Build the controller from settings.
+    
+    Args:
+        settings: Application settings
+        scheduler: Generation scheduler to watch
+    
+    Returns:
+        Configured controller
+    """
+    return DegradationController(
+        scheduler,
+        queue_thresholds=settings.degradation_queue_threshold_list,
+        latency_thresholds=settings.degradation_latency_threshold_list,
+        recovery_seconds=settings.degradation_recovery_seconds,
+        min_context_messages=settings.degradation_min_context_messages,
+        min_max_tokens=settings.degradation_min_max_tokens,
+        enabled=settings.degradation_enabled
+    )
@@ -0,0 +1,90 @@
+"""Run one user turn against several personas concurrently."""
+import asyncio
+import logging
+import time
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List
+
+from app import metrics
+from app.circuit_breaker import CircuitOpenError
+from app.scheduler import GenerationScheduler
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+async def fan_out(
+    scheduler: GenerationScheduler,
+    generate_stream: Callable[..., Iterator[str]],
+    prompt: str,
+    personas: List[Dict[str, Any]]
+) -> AsyncIterator[Dict[str, Any]]:
+    """Stream replies from several personas, interleaved as they arrive.
+    
+    Every persona gets the same prompt (built once by the caller) and its own
+    generation slot from the scheduler, so fan-out never exceeds the
+    process-wide generation limit.
+    
+    Args:
+        scheduler: Generation scheduler
+        generate_stream: Streaming generation function (``LLMRouter.generate_stream``)
+        prompt: Prompt shared by all personas
+        personas: One dict per persona with ``key``, ``system``,
+            ``options`` (``GenerationOptions``) and optional ``backend``
+    
+    Yields:
+        Events tagged with ``persona``: ``chunk`` (``content``), ``complete``
+        (``response``, ``ttft_ms``, ``duration_ms``) or ``error``
+        (``message``, optional ``retry_after``)
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+    started = time.perf_counter()
+    
+    async def run(persona: Dict[str, Any]) -> None:
+        key = persona["key"]
+        chunks: List[str] = []
+        ttft = None
+        try:
+            async for chunk in scheduler.stream(
+                generate_stream,
+                prompt=prompt,
+                system=persona["system"],
+                options=persona["options"],
+                backend=persona.get("backend")
+            ):
+                if ttft is None:
+                    ttft = time.perf_counter() - started
+                    metrics.TIME_TO_FIRST_TOKEN.labels(endpoint="fanout").observe(ttft)
+                chunks.append(chunk)
+                await queue.put({"persona": key, "type": "chunk", "content": chunk})
+            
+            await queue.put({
+                "persona": key,
+                "type": "complete",
+                "response": "".join(chunks),
+                "ttft_ms": round(ttft * 1000, 1) if ttft is not None else None,
+                "duration_ms": round((time.perf_counter() - started) * 1000, 1)
+            })
+        except CircuitOpenError as e:
+            await queue.put({"persona": key, "type": "error", "message": str(e), "retry_after": e.retry_after})
+        except Exception as e:
+            logger.error(f"Fan-out generation failed for persona {key}: {e}")
+            await queue.put({"persona": key, "type": "error", "message": str(e)})
+        finally:
+            await queue.put(_DONE)
+    
+    tasks = [asyncio.create_task(run(persona)) for persona in personas]
+    remaining = len(tasks)
+    try:
+        while remaining:
+            event = await queue.get()
+            if event is _DONE:
+                remaining -= 1
+                continue
+            yield event
+    finally:
+        # Client went away: stop generations that are still running
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        metrics.CHAT_LATENCY.labels(endpoint="fanout").observe(time.perf_counter() - started)
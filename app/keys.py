@@ -0,0 +1,158 @@
+"""Redis key schema for per-user data.
+
+Every per-user key is built here so that all of a user's keys can share a
+hash tag (``{user_id}``). With hash tags enabled, Redis Cluster places a
+user's keys in one slot and client-side sharding routes them to one node, so
+multi-key per-user commands and pipelines stay on a single server.
+"""
+from typing import List, Optional
+
+from config.config import settings
+
+
+def user_tag(user_id: str) -> str:
+    """Get the key fragment identifying a user.
+    
+    Args:
+        user_id: User identifier (or a glob pattern when scanning)
+    
+    Returns:
+        ``{user_id}`` when hash tags are enabled, otherwise ``user_id``
+    """
+    if settings.redis_use_hash_tags:
+        return f"{{{user_id}}}"
+    return user_id
+
+
+def history_key(user_id: str, backend: Optional[str] = None) -> str:
+    """Key of the user's conversation history.
+    
+    A list, or a stream with the ``stream`` memory backend; the two use
+    different names so switching ``MEMORY_BACKEND`` never hits a WRONGTYPE.
+    
+    Args:
+        user_id: User identifier (or a glob pattern when scanning)
+        backend: Memory backend (default MEMORY_BACKEND)
+    """
+    if (backend or settings.memory_backend) == "stream":
+        return f"chat:{user_tag(user_id)}:log"
+    return f"chat:{user_tag(user_id)}:history"
+
+
+def metadata_key(user_id: str) -> str:
+    """Key of the user's conversation metadata."""
+    return f"chat:{user_tag(user_id)}:metadata"
+
+
+def chat_session_key(user_id: str) -> str:
+    """Key of the user's chat-scoped session data."""
+    return f"chat:{user_tag(user_id)}:session"
+
+
+def session_key(user_id: str) -> str:
+    """Key of the user's session record."""
+    return f"session:{user_tag(user_id)}"
+
+
+def turn_lock_key(user_id: str) -> str:
+    """Key of the lock serializing the user's chat turns."""
+    return f"chat:{user_tag(user_id)}:turn"
+
+
+def turn_cancel_key(user_id: str) -> str:
+    """Key naming the user's turn that a newer message superseded."""
+    return f"chat:{user_tag(user_id)}:turn:cancel"
+
+
+def idempotency_key(user_id: str, key: str) -> str:
+    """Key of the stored reply for a client idempotency key."""
+    return f"chat:{user_tag(user_id)}:idempotency:{key}"
+
+
+def reply_stream_key(user_id: str, generation_id: str) -> str:
+    """Key of the Redis Stream holding one streamed reply."""
+    return f"chat:{user_tag(user_id)}:reply:{generation_id}"
+
+
+def latest_reply_key(user_id: str) -> str:
+    """Key naming the user's most recent streamed reply."""
+    return f"chat:{user_tag(user_id)}:reply:latest"
+
+
+def rate_limit_key(user_id: str) -> str:
+    """Key of the user's rate limit token bucket."""
+    return f"chat:{user_tag(user_id)}:ratelimit"
+
+
+def token_quota_key(user_id: str, day: str, persona: Optional[str] = None) -> str:
+    """Key counting the user's generated tokens on a UTC day (``YYYYMMDD``).
+    
+    Args:
+        user_id: User identifier
+        day: UTC date the counter covers
+        persona: Persona key for a per-persona counter
+    """
+    key = f"chat:{user_tag(user_id)}:quota:{day}"
+    return f"{key}:{persona}" if persona else key
+
+
+def key_type(key) -> str:
+    """Classify a key by the schema above, e.g. for memory reports.
+    
+    Args:
+        key: Redis key (str or bytes)
+    
+    Returns:
+        Key type such as ``history`` or ``session``; ``other`` for keys not
+        built here
+    """
+    if isinstance(key, bytes):
+        key = key.decode(errors="replace")
+    if key.startswith("session:"):
+        return "session"
+    if not key.startswith("chat:"):
+        return "other"
+    if ":idempotency:" in key:
+        return "idempotency"
+    if ":reply:" in key:
+        return "reply_stream"
+    if ":quota:" in key:
+        return "quota"
+    for suffix, name in (
+        (":history", "history"),
+        (":log", "history_stream"),
+        (":metadata", "metadata"),
+        (":session", "chat_session"),
+        (":turn", "turn_lock"),
+        (":turn:cancel", "turn_lock"),
+        (":ratelimit", "rate_limit"),
+    ):
+        if key.endswith(suffix):
+            return name
+    return "other"
+
+
+def user_keys(user_id: str) -> List[str]:
+    """All keys owned by a user (same slot when hash tags are enabled)."""
+    return [
+        history_key(user_id),
+        metadata_key(user_id),
+        chat_session_key(user_id),
+        session_key(user_id)
+    ]
+
+
+def user_id_from_key(key, pattern: str) -> str:
+    """Extract the user id from a key matched by a ``*`` pattern.
+    
+    Args:
+        key: Key returned by SCAN (str or bytes)
+        pattern: Key pattern built with ``"*"`` as user id, e.g. ``session_key("*")``
+    
+    Returns:
+        User identifier
+    """
+    if isinstance(key, bytes):
+        key = key.decode()
+    prefix, _, suffix = pattern.partition("*")
+    return key[len(prefix):len(key) - len(suffix)]
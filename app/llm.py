@@ -0,0 +1,106 @@
+"""LLM backend interface and generation options shared by all providers."""
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field, fields
+from typing import Any, Dict, Iterator, List, Optional
+
+from app.circuit_breaker import CircuitBreaker
+
+# Prompts are "User: ... / Assistant: ..." transcripts; without these the model
+# tends to carry on and write the user's next turn itself
+DEFAULT_STOP = ["\nUser:", "\nAssistant:"]
+
+
+@dataclass
+class GenerationOptions:
+    """Per-request generation settings.
+    
+    ``None`` means "use the backend's default, or else the model's". Field
+    names follow Ollama's ``options``; other providers map the ones they
+    support and ignore the rest.
+    """
+    
+    temperature: float = 0.7
+    num_predict: int = 500  # Maximum tokens generated
+    num_ctx: Optional[int] = None  # Context window in tokens
+    stop: List[str] = field(default_factory=lambda: list(DEFAULT_STOP))
+    num_thread: Optional[int] = None
+    seed: Optional[int] = None
+    keep_alive: Optional[str] = None  # How long the model stays loaded, e.g. "10m"
+    
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "GenerationOptions":
+        """Build options from a persona-style mapping.
+        
+        Args:
+            config: Mapping using option names, with ``max_tokens`` accepted
+                as an alias for ``num_predict``; unknown keys are ignored
+        
+        Returns:
+            Generation options
+        """
+        names = {f.name for f in fields(cls)}
+        values = {key: value for key, value in config.items() if key in names}
+        if "max_tokens" in config and "num_predict" not in values:
+            values["num_predict"] = config["max_tokens"]
+        return cls(**values)
+    
+    def to_options(self) -> Dict[str, Any]:
+        """Get the Ollama ``options`` object (unset values and keep_alive omitted)."""
+        return {
+            f.name: getattr(self, f.name)
+            for f in fields(self)
+            if f.name != "keep_alive" and getattr(self, f.name) is not None
+        }
+
+
+class LLMBackend(ABC):
+    """A text generation provider.
+    
+    Implementations are synchronous (they are run in the generation
+    scheduler's threadpool) and guard their calls with ``breaker``, raising
+    ``CircuitOpenError`` while it is open.
+    """
+    
+    name: str
+    model: str
+    breaker: CircuitBreaker
+    
+    @abstractmethod
+    def health_check(self) -> bool:
+        """Check whether the backend is reachable."""
+    
+    @abstractmethod
+    def generate(
+        self,
+        prompt: str,
+        system: Optional[str] = None,
+        options: Optional[GenerationOptions] = None
+    ) -> str:
+        """Generate a complete response.
+        
+        Args:
+            prompt: Input prompt
+            system: Optional system prompt
+            options: Generation options (defaults if omitted)
+        
+        Returns:
+            Generated text
+        """
+    
+    @abstractmethod
+    def generate_stream(
+        self,
+        prompt: str,
+        system: Optional[str] = None,
+        options: Optional[GenerationOptions] = None
+    ) -> Iterator[str]:
+        """Generate a response as a stream of text chunks.
+        
+        Args:
+            prompt: Input prompt
+            system: Optional system prompt
+            options: Generation options (defaults if omitted)
+        
+        Yields:
+            Response chunks as they are generated
+        """
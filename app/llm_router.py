@@ -0,0 +1,232 @@
+"""Routing of generations across LLM backends with ordered failover."""
+import logging
+import time
+from typing import Dict, Iterator, List, Optional
+
+from app import metrics
+from app.circuit_breaker import CircuitBreaker, CircuitOpenError
+from app.llm import GenerationOptions, LLMBackend
+from app.ollama_client import OllamaLLM
+from app.openai_client import OpenAICompatibleLLM
+
+logger = logging.getLogger(__name__)
+
+
+class LLMRouter:
+    """Sends each generation to a backend chain, failing over in order.
+    
+    The chain for a request is its preferred backend (the persona's, or the
+    cascade's ``small`` model), then the default backend, then the configured
+    fallbacks. A backend that errors, times out or has an open circuit (e.g.
+    after repeated slow calls) is skipped and the next one is tried. Streams only fail over before their first chunk; a
+    reply that has started streaming is never mixed from two backends.
+    """
+    
+    def __init__(self, backends: Dict[str, LLMBackend], default: str, fallbacks: Optional[List[str]] = None):
+        """Initialize router.
+        
+        Args:
+            backends: Backends by name
+            default: Backend used when a persona does not name one
+            fallbacks: Backends tried in order after the primary fails
+        
+        Raises:
+            ValueError: If ``default`` or a fallback is not a known backend
+        """
+        unknown = [name for name in [default, *(fallbacks or [])] if name not in backends]
+        if unknown:
+            raise ValueError(f"Unknown LLM backend: {', '.join(unknown)}")
+        self.backends = backends
+        self.default = default
+        self.fallbacks = fallbacks or []
+    
+    def chain(self, backend: Optional[str] = None) -> List[LLMBackend]:
+        """Get the backends to try, in order.
+        
+        Args:
+            backend: Preferred backend name; unknown names fall back to the default
+        
+        Returns:
+            Preferred backend, the default backend, then the fallbacks
+        """
+        if backend and backend not in self.backends:
+            logger.warning(f"Unknown LLM backend {backend}, using {self.default}")
+            backend = None
+        names = list(dict.fromkeys([backend or self.default, self.default, *self.fallbacks]))
+        return [self.backends[name] for name in names]
+    
+    def generate(
+        self,
+        prompt: str,
+        system: Optional[str] = None,
+        options: Optional[GenerationOptions] = None,
+        backend: Optional[str] = None
+    ) -> str:
+        """Generate a complete response, failing over between backends.
+        
+        Args:
+            prompt: Input prompt
+            system: Optional system prompt
+            options: Generation options
+            backend: Preferred backend name (e.g. from the persona)
+        
+        Returns:
+            Generated text
+        
+        Raises:
+            CircuitOpenError: If every backend's circuit is open
+            Exception: The last backend error if every backend failed
+        """
+        errors: List[Exception] = []
+        for llm in self.chain(backend):
+            started = time.perf_counter()
+            try:
+                result = llm.generate(prompt, system=system, options=options)
+            except Exception as e:
+                errors.append(e)
+                self._record_failover(llm, e)
+                continue
+            self._record_generation(llm, started)
+            return result
+        raise _combined_error(errors)
+    
+    def generate_stream(
+        self,
+        prompt: str,
+        system: Optional[str] = None,
+        options: Optional[GenerationOptions] = None,
+        backend: Optional[str] = None
+    ) -> Iterator[str]:
+        """Stream a response, failing over between backends until the first chunk.
+        
+        Args:
+            prompt: Input prompt
+            system: Optional system prompt
+            options: Generation options
+            backend: Preferred backend name (e.g. from the persona)
+        
+        Yields:
+            Response chunks from the first backend that produces output
+        
+        Raises:
+            CircuitOpenError: If every backend's circuit is open
+            Exception: The last backend error if every backend failed, or the
+                error of a backend that failed mid-stream
+        """
+        errors: List[Exception] = []
+        for llm in self.chain(backend):
+            started = time.perf_counter()
+            stream = llm.generate_stream(prompt, system=system, options=options)
+            streaming = False
+            try:
+                for chunk in stream:
+                    streaming = True
+                    yield chunk
+            except Exception as e:
+                if streaming:
+                    raise
+                errors.append(e)
+                self._record_failover(llm, e)
+                continue
+            finally:
+                stream.close()
+            self._record_generation(llm, started)
+            return
+        raise _combined_error(errors)
+    
+    def health_check(self) -> bool:
+        """Whether any backend of the default chain is reachable."""
+        return any(llm.health_check() for llm in self.chain())
+    
+    def snapshot(self) -> Dict[str, Dict]:
+        """Get each backend's circuit breaker state.
+        
+        Returns:
+            Breaker snapshots by backend name
+        """
+        return {name: llm.breaker.snapshot() for name, llm in self.backends.items()}
+    
+    def _record_generation(self, llm: LLMBackend, started: float) -> None:
+        """Count a completed generation and its duration."""
+        metrics.LLM_GENERATIONS.labels(backend=llm.name).inc()
+        metrics.LLM_GENERATION_LATENCY.labels(backend=llm.name).observe(time.perf_counter() - started)
+    
+    def _record_failover(self, llm: LLMBackend, error: Exception) -> None:
+        """Log and count a backend being skipped."""
+        metrics.LLM_FAILOVERS.labels(backend=llm.name).inc()
+        if isinstance(error, CircuitOpenError):
+            logger.info(f"Skipping {llm.name}: {error}")
+        else:
+            logger.warning(f"{llm.name} failed, trying next backend: {error}")
+
+
+def _combined_error(errors: List[Exception]) -> Exception:
+    """Pick the error to raise once every backend has failed.
+    
+    If all circuits were open the caller gets a ``CircuitOpenError`` with the
+    soonest retry time, so it can answer 503 with ``Retry-After``.
+    """
+    if errors and all(isinstance(e, CircuitOpenError) for e in errors):
+        return CircuitOpenError(
+            ", ".join(e.name for e in errors),
+            min(e.retry_after for e in errors)
+        )
+    return errors[-1]
+
+
+def create_llm_router(settings) -> LLMRouter:
+    """Build the router and its backends from settings.
+    
+    An ``ollama`` backend is always configured. An ``openai`` backend (any
+    OpenAI-compatible API) is added when ``OPENAI_BASE_URL`` is set, and a
+    ``small`` backend (the cascade's small model on the same Ollama server)
+    when ``SMALL_MODEL_NAME`` is set.
+    
+    Args:
+        settings: Application settings
+    
+    Returns:
+        Configured router
+    """
+    def breaker(name: str) -> CircuitBreaker:
+        return CircuitBreaker(
+            name,
+            failure_threshold=settings.circuit_failure_threshold,
+            recovery_timeout=settings.circuit_recovery_timeout,
+            slow_call_threshold=settings.circuit_slow_call_threshold,
+            half_open_max_calls=settings.circuit_half_open_max_calls
+        )
+    
+    backends: Dict[str, LLMBackend] = {
+        "ollama": OllamaLLM(
+            settings.ollama_host,
+            settings.model_name,
+            timeout=settings.ollama_timeout,
+            connect_timeout=settings.ollama_connect_timeout,
+            breaker=breaker("ollama"),
+            default_options=settings.ollama_default_options,
+            keep_alive=settings.ollama_keep_alive or None
+        )
+    }
+    if settings.small_model_name:
+        backends["small"] = OllamaLLM(
+            settings.ollama_host,
+            settings.small_model_name,
+            timeout=settings.ollama_timeout,
+            connect_timeout=settings.ollama_connect_timeout,
+            breaker=breaker("small"),
+            default_options=settings.ollama_default_options,
+            keep_alive=settings.ollama_keep_alive or None,
+            name="small"
+        )
+    if settings.openai_base_url:
+        backends["openai"] = OpenAICompatibleLLM(
+            settings.openai_base_url,
+            settings.openai_model,
+            api_key=settings.openai_api_key,
+            timeout=settings.openai_timeout,
+            connect_timeout=settings.ollama_connect_timeout,
+            breaker=breaker("openai")
+        )
+    
+    return LLMRouter(backends, settings.llm_backend, settings.llm_fallback_list)
@@ -1,22 +1,49 @@
 """FastAPI application and route handlers."""
+import asyncio
 import logging
 import json
+import secrets
+import time
+import uuid
+from contextlib import AsyncExitStack
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
-from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi import BackgroundTasks, Depends, FastAPI, Header, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, PlainTextResponse, Response, StreamingResponse
+from starlette.background import BackgroundTask
 from pydantic import BaseModel
 from redis import Redis
 import os
 
 from config.config import settings
-from app.ollama_client import OllamaLLM
+from app import metrics, tracing
+from app.profiling import AllocationTracker, ProfilingMiddleware, RuntimeProfiler
+from app.redis_client import create_redis_client, pool_stats
+from app.llm_router import LLMRouter, create_llm_router
+from app.circuit_breaker import CircuitOpenError
+from app.batch import BatchRunner, parse_items
+from app.cascade import create_cascade
+from app.degradation import create_degradation_controller
+from app.fanout import fan_out
 from app.memory import ChatMemoryManager
+from app.retention import MemoryReaper, memory_report
+from app.rate_limit import RateLimiter, RateLimitResult, create_rate_limiter, estimate_tokens
+from app.write_behind import DURABILITY_MODES, WriteBehindBuffer
 from app.session import SessionManager
 from app.persona import PersonaManager
+from app.scheduler import GenerationScheduler
+from app.reply_stream import ReplyNotFound, ReplyPublisher, latest_generation, read_reply, reply_exists
+from app.turns import (
+    MAX_IDEMPOTENCY_KEY_LENGTH,
+    IdempotencyStore,
+    Turn,
+    TurnCancelled,
+    UserBusyError,
+    UserTurnLock
+)
 
 # Configure logging
 logging.basicConfig(
@@ -41,6 +68,14 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Runtime profiling (toggled via /admin/profiling endpoints)
+profiler = RuntimeProfiler()
+app.add_middleware(ProfilingMiddleware, profiler=profiler)
+
+# Request tracing with Server-Timing summary
+tracing.configure_from_settings(settings)
+app.add_middleware(tracing.ServerTimingMiddleware, enabled=settings.server_timing_enabled)
+
 # Mount static files
 public_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "public")
 if os.path.exists(public_dir):
@@ -48,9 +83,17 @@ if os.path.exists(public_dir):
 
 # Initialize services
 redis_client: Optional[Redis] = None
-ollama_client: Optional[OllamaLLM] = None
+llm_router: Optional[LLMRouter] = None
 session_manager: Optional[SessionManager] = None
 persona_manager: Optional[PersonaManager] = None
+scheduler = GenerationScheduler(settings.max_concurrent_generations)
+cascade = create_cascade(settings)
+degradation = create_degradation_controller(settings, scheduler)
+reaper_task: Optional[asyncio.Task] = None
+metrics_task: Optional[asyncio.Task] = None
+write_buffer: Optional[WriteBehindBuffer] = None
+rate_limiter: Optional[RateLimiter] = None
+_initialized_pid: Optional[int] = None
 
 
 # ============================================================================
@@ -59,12 +102,22 @@ persona_manager: Optional[PersonaManager] = None
 
 @app.on_event("startup")
 async def startup_event():
-    """Initialize services on application startup."""
-    global redis_client, ollama_client, session_manager, persona_manager
+    """Initialize services on application startup.
+    
+    Idempotent per process: a repeated startup in the same worker is a
+    no-op, while a forked worker that inherited initialized globals builds
+    its own clients instead of sharing the parent's connections.
+    """
+    global redis_client, llm_router, session_manager, persona_manager, reaper_task, metrics_task
+    global write_buffer, rate_limiter, _initialized_pid
+    
+    if _initialized_pid == os.getpid():
+        logger.debug("Services already initialized in this worker")
+        return
     
     try:
         # Connect to Redis
-        redis_client = Redis.from_url(settings.redis_url, decode_responses=True)
+        redis_client = create_redis_client(settings)
         redis_client.ping()
         logger.info("Connected to Redis")
     except Exception as e:
@@ -72,14 +125,15 @@ async def startup_event():
         raise
     
     try:
-        # Initialize Ollama client
-        ollama_client = OllamaLLM(settings.ollama_host, settings.model_name)
-        if not ollama_client.health_check():
-            logger.warning("Ollama service not responding, but continuing startup")
-        else:
-            logger.info(f"Connected to Ollama: {settings.model_name}")
+        # Initialize LLM backends
+        llm_router = create_llm_router(settings)
+        for name, backend in llm_router.backends.items():
+            if not backend.health_check():
+                logger.warning(f"LLM backend {name} not responding, but continuing startup")
+            else:
+                logger.info(f"Connected to LLM backend {name}: {backend.model}")
     except Exception as e:
-        logger.error(f"Failed to initialize Ollama: {e}")
+        logger.error(f"Failed to initialize LLM backends: {e}")
         raise
     
     # Initialize session manager
@@ -89,14 +143,62 @@ async def startup_event():
     # Initialize persona manager
     persona_manager = PersonaManager("config/personas.yaml")
     logger.info(f"Loaded {len(persona_manager.list_personas())} personas")
+    
+    # Store replies before responding, or through the write-behind buffer
+    if settings.write_durability not in DURABILITY_MODES:
+        raise ValueError(f"Unknown WRITE_DURABILITY: {settings.write_durability}")
+    if settings.write_durability == "buffered":
+        write_buffer = WriteBehindBuffer(
+            redis_client,
+            session_manager,
+            interval=settings.write_behind_interval,
+            max_batch=settings.write_behind_max_batch
+        )
+        write_buffer.start()
+        logger.info(f"Write-behind enabled (flush every {settings.write_behind_interval}s)")
+    
+    # Per-user rate limits and token quotas
+    rate_limiter = create_rate_limiter(settings, redis_client)
+    
+    # Give conversation keys written without a TTL the idle TTL
+    if settings.memory_idle_ttl > 0 and settings.memory_reaper_interval > 0:
+        reaper = MemoryReaper(redis_client, settings.memory_idle_ttl)
+        reaper_task = asyncio.ensure_future(reaper.run(settings.memory_reaper_interval))
+    
+    # Share this worker's metrics with the others (gunicorn sets the directory)
+    if metrics.multiprocess_dir():
+        metrics_task = asyncio.ensure_future(metrics.dump_forever(metrics.multiprocess_dir()))
+    
+    _initialized_pid = os.getpid()
+    logger.info(f"Worker {_initialized_pid} ready")
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
-    """Cleanup on application shutdown."""
+    """Drain in-flight generations, flush buffered writes, then release connections."""
+    global reaper_task, metrics_task, write_buffer, _initialized_pid
+    
+    if reaper_task:
+        reaper_task.cancel()
+        reaper_task = None
+    
+    if not await scheduler.drain(settings.shutdown_grace_period):
+        logger.warning(f"Shutting down with generations still running: {scheduler.snapshot()}")
+    
+    if write_buffer:
+        await write_buffer.close()
+        write_buffer = None
+    
+    if metrics_task:
+        # Final values, kept after this worker exits
+        metrics_task.cancel()
+        metrics_task = None
+        metrics.REGISTRY.dump(metrics.multiprocess_dir())
+    
     if redis_client:
         redis_client.close()
         logger.info("Closed Redis connection")
+    _initialized_pid = None
 
 
 # ============================================================================
@@ -122,6 +224,13 @@ class ChatRequestAPI(BaseModel):
     persona_name: str = "default"
 
 
+class FanoutRequest(BaseModel):
+    """Multi-persona chat request."""
+    user_id: str
+    message: str
+    personas: List[str]
+
+
 class ChatResponseAPI(BaseModel):
     """Chat response to web interface."""
     response: str
@@ -151,6 +260,9 @@ class HealthCheckResponse(BaseModel):
     redis: bool
     ollama: bool
     timestamp: str
+    redis_pool: Optional[dict] = None
+    circuits: Optional[dict] = None
+    degradation: Optional[dict] = None
 
 
 # ============================================================================
@@ -186,94 +298,279 @@ async def create_session(request: SessionCreateRequest) -> SessionCreateResponse
     )
 
 
+def _select_backend(message: str, persona_key: str) -> Optional[str]:
+    """Get the LLM backend for a turn: the persona's, or the cascade's choice."""
+    pinned = persona_manager.get_backend(persona_key)
+    if cascade is None:
+        return pinned
+    return cascade.select_backend(message, persona_key, pinned)
+
+
+def _turn_lock() -> UserTurnLock:
+    """Get the per-user turn lock on the shared Redis client."""
+    return UserTurnLock(
+        redis_client,
+        ttl=settings.chat_lock_ttl,
+        wait_timeout=settings.chat_lock_wait_timeout
+    )
+
+
+def _flush_pending(user_id: str) -> None:
+    """Write the user's buffered reply.
+    
+    Called before the user's history is read and before their turn lock is
+    released, so the next turn, on any worker, sees the reply.
+    """
+    if write_buffer:
+        write_buffer.flush_user(user_id)
+
+
+async def _flush_and_release(user_id: str, lock: AsyncExitStack) -> None:
+    """Write the user's buffered reply, then release their turn lock.
+    
+    Runs as a background task once the response has been sent.
+    """
+    async with lock:
+        _flush_pending(user_id)
+
+
+def _store_reply(memory: ChatMemoryManager, response_text: str, update_session: bool = True) -> None:
+    """Store an assistant reply and the session's message count.
+    
+    With ``WRITE_DURABILITY=buffered`` both are queued for the next
+    write-behind flush instead of written before the reply is returned.
+    """
+    if write_buffer:
+        write_buffer.add_message(memory, "assistant", response_text)
+        if update_session:
+            write_buffer.update_session(memory.user_id, count_messages=memory)
+        return
+    
+    memory.add_message("assistant", response_text)
+    if update_session:
+        session_manager.update_session(memory.user_id, {
+            "message_count": memory.message_count() // 2
+        })
+
+
+def _check_rate_limit(user_id: str, persona_key: str) -> Optional[RateLimitResult]:
+    """Take one message from the user's rate limit (None when limits are off)."""
+    if not rate_limiter:
+        return None
+    return rate_limiter.check(user_id, persona_key)
+
+
+def _charge_reply(user_id: str, persona_key: str, response_text: str) -> None:
+    """Count a generated reply against the user's daily token quotas."""
+    if rate_limiter:
+        rate_limiter.charge(user_id, persona_key, estimate_tokens(response_text))
+
+
+async def _collect_reply(turn: Turn, **kwargs) -> str:
+    """Generate a full reply by streaming, stopping early if the turn is superseded.
+    
+    Streaming lets a superseded turn close its upstream request at the next
+    chunk instead of waiting for the complete reply.
+    
+    Raises:
+        TurnCancelled: If a newer message superseded the turn
+    """
+    chunks = []
+    stream = scheduler.stream(llm_router.generate_stream, **kwargs)
+    try:
+        async for chunk in stream:
+            turn.check()
+            chunks.append(chunk)
+    finally:
+        await stream.aclose()
+    return "".join(chunks)
+
+
 @app.post("/api/chat", response_model=ChatResponseAPI)
-async def chat_api(request: ChatRequestAPI) -> ChatResponseAPI:
-    """Send message and get response via web interface."""
-    if not session_manager or not redis_client or not ollama_client or not persona_manager:
+async def chat_api(
+    request: ChatRequestAPI,
+    http_response: Response,
+    background_tasks: BackgroundTasks,
+    idempotency_key: Optional[str] = Header(None, max_length=MAX_IDEMPOTENCY_KEY_LENGTH)
+) -> ChatResponseAPI:
+    """Send message and get response via web interface.
+    
+    A user's turns run one at a time. A retry carrying the same
+    ``Idempotency-Key`` header as an earlier request gets that request's
+    reply instead of a new generation. Messages over the user's rate limit
+    or daily token quota get a 429 with ``Retry-After``. With buffered
+    writes the reply is written after the response is sent, before the
+    turn lock is released.
+    """
+    if not session_manager or not redis_client or not llm_router or not persona_manager:
         raise HTTPException(status_code=503, detail="Service unavailable")
     
+    started = time.perf_counter()
+    
     # Extract user_id from session_id for memory management
     user_id = request.session_id.split("_")[1] if "_" in request.session_id else "default_user"
     
+    replies = IdempotencyStore(redis_client, settings.idempotency_ttl)
+    if idempotency_key:
+        stored = replies.get(user_id, idempotency_key)
+        if stored:
+            metrics.IDEMPOTENT_REPLAYS.labels(endpoint="api_chat").inc()
+            http_response.headers["Idempotent-Replayed"] = "true"
+            return ChatResponseAPI(**stored)
+    
     # Get or create session
     session_data = session_manager.get_session(user_id)
     if not session_data:
         session_data = session_manager.create_session(user_id, "default")
     
     persona_key = "default"
-    persona_info = persona_manager.get_persona_info(persona_key) or {
-        "name": "Default",
-        "temperature": 0.7,
-        "max_tokens": 500
-    }
-    system_prompt = persona_manager.get_system_prompt(persona_key) or "You are a helpful assistant."
+    limit = _check_rate_limit(user_id, persona_key)
+    if limit:
+        if not limit.allowed:
+            raise HTTPException(status_code=429, detail=limit.message, headers=limit.headers())
+        http_response.headers.update(limit.headers())
     
-    # Get memory
-    memory = ChatMemoryManager(redis_client, user_id)
-    memory.add_message("user", request.user_message)
-    
-    # Build context
-    context = memory.get_context_window()
-    
-    # Prepare prompt
-    if context:
-        full_prompt = f"{context}\n\nUser: {request.user_message}\nAssistant:"
-    else:
-        full_prompt = f"User: {request.user_message}\nAssistant:"
+    degradation.update()
+    options = degradation.apply(persona_manager.get_generation_options(persona_key))
+    system_prompt = persona_manager.get_system_prompt(persona_key) or "You are a helpful assistant."
     
     try:
-        # Generate response
-        response_text = ollama_client.generate(
-            prompt=full_prompt,
-            system=system_prompt,
-            temperature=persona_info.get("temperature", 0.7),
-            max_tokens=persona_info.get("max_tokens", 500)
-        )
-        
-        # Store response
-        memory.add_message("assistant", response_text)
-        
-        # Update session
-        session_manager.update_session(user_id, {
-            "message_count": memory.redis.llen(memory.history_key) // 2
-        })
-        
-        return ChatResponseAPI(
-            response=response_text,
-            session_id=request.session_id,
-            timestamp=datetime.utcnow().isoformat()
-        )
+        async with AsyncExitStack() as lock:
+            turn = await lock.enter_async_context(_turn_lock().hold(
+                user_id,
+                supersede=settings.chat_cancel_previous,
+                owner=idempotency_key or ""
+            ))
+            # A retry that waited for the original request gets its reply
+            stored = replies.get(user_id, idempotency_key) if idempotency_key else None
+            if stored:
+                metrics.IDEMPOTENT_REPLAYS.labels(endpoint="api_chat").inc()
+                http_response.headers["Idempotent-Replayed"] = "true"
+                return ChatResponseAPI(**stored)
+            
+            # Get memory
+            _flush_pending(user_id)
+            memory = ChatMemoryManager(redis_client, user_id)
+            memory.add_message("user", request.user_message)
+            
+            # Build context
+            context = memory.get_context_window(degradation.context_limit(settings.max_context_messages))
+            
+            # Prepare prompt
+            with tracing.span("prompt.build"):
+                if context:
+                    full_prompt = f"{context}\n\nUser: {request.user_message}\nAssistant:"
+                else:
+                    full_prompt = f"User: {request.user_message}\nAssistant:"
+            
+            # Generate response
+            generation = dict(
+                prompt=full_prompt,
+                system=system_prompt,
+                options=options,
+                backend=_select_backend(request.user_message, persona_key)
+            )
+            if settings.chat_cancel_previous:
+                response_text = await _collect_reply(turn, **generation)
+            else:
+                response_text = await scheduler.run(llm_router.generate, **generation)
+            
+            # Store response and update session
+            _store_reply(memory, response_text)
+            _charge_reply(user_id, persona_key, response_text)
+            
+            result = ChatResponseAPI(
+                response=response_text,
+                session_id=request.session_id,
+                timestamp=datetime.utcnow().isoformat()
+            )
+            if idempotency_key:
+                replies.put(user_id, idempotency_key, result.model_dump())
+            if write_buffer:
+                # Respond first; the lock is released once the reply is written
+                background_tasks.add_task(_flush_and_release, user_id, lock.pop_all())
+            return result
     
+    except UserBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e), headers={"Retry-After": "5"})
+    except TurnCancelled:
+        logger.info(f"Chat turn for {user_id} superseded by a newer message")
+        raise HTTPException(status_code=409, detail="Superseded by a newer message")
+    except CircuitOpenError as e:
+        logger.warning(f"Fast-failing chat for {user_id}: {e}")
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(max(int(e.retry_after), 1))}
+        )
     except Exception as e:
         logger.error(f"Error generating response: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to generate response: {str(e)}")
+    finally:
+        metrics.CHAT_LATENCY.labels(endpoint="api_chat").observe(time.perf_counter() - started)
 
 @app.get("/health", response_model=HealthCheckResponse)
 async def health_check() -> HealthCheckResponse:
     """Health check endpoint for all services."""
     redis_ok = False
     ollama_ok = False
+    redis_pool = None
     
     try:
         if redis_client:
             redis_client.ping()
             redis_ok = True
+            redis_pool = pool_stats(redis_client)
     except Exception as e:
         logger.warning(f"Redis health check failed: {e}")
     
+    circuits = None
     try:
-        if ollama_client:
-            ollama_ok = ollama_client.health_check()
+        if llm_router:
+            ollama_ok = llm_router.health_check()
+            circuits = llm_router.snapshot()
     except Exception as e:
-        logger.warning(f"Ollama health check failed: {e}")
+        logger.warning(f"LLM health check failed: {e}")
     
     status = "healthy" if (redis_ok and ollama_ok) else "degraded"
+    degradation.update()
     
     return HealthCheckResponse(
         status=status,
         redis=redis_ok,
         ollama=ollama_ok,
-        timestamp=datetime.utcnow().isoformat()
+        timestamp=datetime.utcnow().isoformat(),
+        redis_pool=redis_pool,
+        circuits=circuits,
+        degradation=degradation.snapshot()
+    )
+
+
+def _collect_runtime_metrics() -> None:
+    """Refresh gauges that are sampled at scrape time."""
+    degradation.update()
+    if redis_client:
+        try:
+            for state, count in pool_stats(redis_client).items():
+                metrics.REDIS_POOL_CONNECTIONS.labels(state=state).set(count)
+        except Exception as e:
+            logger.debug(f"Could not read Redis pool stats: {e}")
+    if llm_router:
+        for name, backend in llm_router.backends.items():
+            metrics.CIRCUIT_OPEN.labels(backend=name).set(
+                0 if backend.breaker.state == "closed" else 1
+            )
+
+
+metrics.REGISTRY.add_collector(_collect_runtime_metrics)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint() -> PlainTextResponse:
+    """Prometheus metrics endpoint."""
+    return PlainTextResponse(
+        metrics.render_all(),
+        media_type="text/plain; version=0.0.4"
     )
 
 
@@ -314,24 +611,179 @@ async def start_session(request: SessionStart) -> SessionInfo:
 
 
 @app.post("/chat")
-async def chat_legacy(request: ChatRequestAPI):
+async def chat_legacy(
+    request: ChatRequestAPI,
+    http_response: Response,
+    background_tasks: BackgroundTasks,
+    idempotency_key: Optional[str] = Header(None, max_length=MAX_IDEMPOTENCY_KEY_LENGTH)
+):
     """Legacy chat endpoint - redirects to /api/chat."""
-    return await chat_api(request)
+    return await chat_api(request, http_response, background_tasks, idempotency_key)
+
+
+@app.post("/api/chat/fanout")
+async def chat_fanout(request: FanoutRequest):
+    """Answer one message with several personas at once, streamed as NDJSON.
+    
+    The conversation history is read once and shared by every persona.
+    Nothing is written to memory: this is for comparing answers, the user
+    continues the conversation with one persona through the normal chat API.
+    Each persona counts as one message against the user's rate limit, and
+    its reply against the user's (and persona's) token quotas. The user's
+    turn lock is held until every persona has finished.
+    """
+    if not redis_client or not llm_router or not persona_manager:
+        raise HTTPException(status_code=503, detail="Service unavailable")
+    
+    persona_keys = list(dict.fromkeys(request.personas))
+    if not persona_keys:
+        raise HTTPException(status_code=400, detail="At least one persona is required")
+    if len(persona_keys) > settings.fanout_max_personas:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.fanout_max_personas} personas per request"
+        )
+    unknown = [key for key in persona_keys if not persona_manager.get_persona(key)]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown persona: {', '.join(unknown)}")
+    
+    headers = {}
+    for key in persona_keys:
+        limit = _check_rate_limit(request.user_id, key)
+        if limit and not limit.allowed:
+            raise HTTPException(status_code=429, detail=limit.message, headers=limit.headers())
+        if limit:
+            quota = headers.get("X-Quota-Remaining")
+            headers.update(limit.headers())
+            if quota is not None and "X-Quota-Remaining" in headers:
+                headers["X-Quota-Remaining"] = str(min(int(quota), int(headers["X-Quota-Remaining"])))
+    
+    degradation.update()
+    personas = []
+    for key in persona_keys:
+        personas.append({
+            "key": key,
+            "system": persona_manager.get_system_prompt(key),
+            "options": degradation.apply(persona_manager.get_generation_options(key)),
+            "backend": _select_backend(request.message, key)
+        })
+    
+    try:
+        async with AsyncExitStack() as stack:
+            await stack.enter_async_context(_turn_lock().hold(request.user_id))
+            _flush_pending(request.user_id)
+            memory = ChatMemoryManager(redis_client, request.user_id)
+            context = memory.get_context_window(degradation.context_limit(settings.max_context_messages))
+            # Released when the response stream ends (or never starts)
+            lock = stack.pop_all()
+    except UserBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e), headers={"Retry-After": "5"})
+    with tracing.span("prompt.build"):
+        if context:
+            full_prompt = f"{context}\n\nUser: {request.message}\nAssistant:"
+        else:
+            full_prompt = f"User: {request.message}\nAssistant:"
+    
+    async def event_lines():
+        async with lock:
+            async for event in fan_out(scheduler, llm_router.generate_stream, full_prompt, personas):
+                if event["type"] == "complete":
+                    _charge_reply(request.user_id, event["persona"], event["response"])
+                yield json.dumps(event) + "\n"
+        yield json.dumps({"type": "done"}) + "\n"
+    
+    return StreamingResponse(
+        event_lines(),
+        media_type="application/x-ndjson",
+        headers=headers,
+        background=BackgroundTask(lock.aclose)
+    )
+
+
+@app.get("/api/chat/replies/{user_id}/{generation_id}")
+async def resume_reply(
+    user_id: str,
+    generation_id: str,
+    offset: int = Query(0, ge=0),
+    last_event_id: Optional[str] = Header(None)
+):
+    """Resume a streamed reply as Server-Sent Events.
+    
+    Sends the reply's events after ``offset`` (or the ``Last-Event-ID``
+    header an EventSource sends when reconnecting), then follows the reply
+    until it completes. ``generation_id`` may be ``latest``. Any worker can
+    serve this; events are read from the reply's Redis Stream.
+    """
+    if not redis_client:
+        raise HTTPException(status_code=503, detail="Service unavailable")
+    
+    if generation_id == "latest":
+        generation_id = latest_generation(redis_client, user_id) or ""
+    if not generation_id or not reply_exists(redis_client, user_id, generation_id):
+        raise HTTPException(status_code=404, detail="Reply not found or expired")
+    if last_event_id and last_event_id.isdigit():
+        offset = int(last_event_id)
+    metrics.REPLY_RESUMES.labels(transport="sse").inc()
+    
+    async def events():
+        try:
+            async for event_offset, event in read_reply(redis_client, user_id, generation_id, after=offset):
+                data = json.dumps({**event, "generation_id": generation_id, "offset": event_offset})
+                yield f"id: {event_offset}\nevent: {event['type']}\ndata: {data}\n\n"
+        except ReplyNotFound as e:
+            yield f"event: error\ndata: {json.dumps({'type': 'error', 'message': str(e)})}\n\n"
+    
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+def _select_fields(message: dict, fields: Optional[List[str]]) -> dict:
+    """Project a history message onto the requested fields."""
+    if not fields:
+        return message
+    return {key: message[key] for key in fields if key in message}
 
 
 @app.get("/session/{user_id}/history")
-async def get_history(user_id: str):
-    """Get conversation history for user."""
+async def get_history(
+    user_id: str,
+    limit: int = Query(50, ge=1, le=500),
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+    fields: Optional[str] = None,
+    format: str = Query("json", pattern="^(json|ndjson)$")
+):
+    """Get conversation history for user.
+    
+    ``before``/``after`` accept a message id or ISO timestamp cursor and
+    ``fields`` is a comma-separated projection (e.g. ``role,content``).
+    ``format=ndjson`` streams the full matching history line by line.
+    """
     if not redis_client:
         raise HTTPException(status_code=503, detail="Service unavailable")
     
+    selected = [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+    _flush_pending(user_id)
     memory = ChatMemoryManager(redis_client, user_id)
-    messages = memory.get_messages()
+    
+    try:
+        if format == "ndjson":
+            messages = memory.iter_messages(before=before, after=after)
+            
+            def export_lines():
+                for message in messages:
+                    yield json.dumps(_select_fields(message, selected)) + "\n"
+            
+            return StreamingResponse(export_lines(), media_type="application/x-ndjson")
+        
+        messages, next_cursor = memory.get_messages_page(limit=limit, before=before, after=after)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
     return {
         "user_id": user_id,
         "message_count": len(messages),
-        "messages": messages
+        "messages": [_select_fields(m, selected) for m in messages],
+        "next_cursor": next_cursor
     }
 
 
@@ -375,83 +827,355 @@ async def list_active_sessions():
     return {"active_users": active_users, "count": len(active_users)}
 
 
+# ============================================================================
+# Admin Endpoints
+# ============================================================================
+
+async def require_admin(x_admin_token: Optional[str] = Header(None)) -> None:
+    """Allow the request only with a valid X-Admin-Token header."""
+    if not settings.admin_token:
+        raise HTTPException(status_code=404, detail="Not found")
+    if not x_admin_token or not secrets.compare_digest(x_admin_token, settings.admin_token):
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+
+@app.get("/admin/profiling", dependencies=[Depends(require_admin)])
+async def profiling_status():
+    """Show which profilers are running in this worker."""
+    return {"pid": os.getpid(), **profiler.status()}
+
+
+@app.post("/admin/profiling/start", dependencies=[Depends(require_admin)])
+async def start_profiling(
+    mode: str = Query("sampling", pattern="^(sampling|cprofile)$"),
+    interval_ms: float = Query(10.0, gt=0),
+    sample_rate: float = Query(0.1, gt=0, le=1)
+):
+    """Start CPU profiling: stack sampling or per-request cProfile."""
+    try:
+        profiler.start(mode, interval=interval_ms / 1000, sample_rate=sample_rate)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"status": "started", "mode": mode, "pid": os.getpid()}
+
+
+@app.post("/admin/profiling/stop", dependencies=[Depends(require_admin)])
+async def stop_profiling(format: str = Query("text", pattern="^(text|pstats)$")):
+    """Stop CPU profiling and return collapsed stacks or a pstats report.
+    
+    ``format=pstats`` returns the binary dump (cprofile mode) for
+    ``pstats.Stats`` / snakeviz.
+    """
+    try:
+        report = profiler.stop(raw=format == "pstats")
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if isinstance(report, bytes):
+        return Response(report, media_type="application/octet-stream")
+    return PlainTextResponse(report)
+
+
+@app.post("/admin/profiling/tracemalloc/start", dependencies=[Depends(require_admin)])
+async def start_tracemalloc(frames: int = Query(10, ge=1, le=100)):
+    """Start allocation tracking with a baseline snapshot."""
+    if profiler.allocations:
+        raise HTTPException(status_code=409, detail="Allocation tracking already running")
+    profiler.allocations = AllocationTracker(frames)
+    profiler.allocations.start()
+    return {"status": "started", "pid": os.getpid()}
+
+
+@app.get("/admin/profiling/tracemalloc", dependencies=[Depends(require_admin)])
+async def tracemalloc_report(limit: int = Query(20, ge=1, le=200)):
+    """Top allocation sites since the baseline and net allocation per endpoint."""
+    if not profiler.allocations:
+        raise HTTPException(status_code=409, detail="Allocation tracking not running")
+    return profiler.allocations.report(limit)
+
+
+@app.post("/admin/profiling/tracemalloc/stop", dependencies=[Depends(require_admin)])
+async def stop_tracemalloc(limit: int = Query(20, ge=1, le=200)):
+    """Stop allocation tracking and return the final report."""
+    if not profiler.allocations:
+        raise HTTPException(status_code=409, detail="Allocation tracking not running")
+    allocations, profiler.allocations = profiler.allocations, None
+    report = allocations.report(limit)
+    allocations.stop()
+    return report
+
+
+@app.get("/admin/memory", dependencies=[Depends(require_admin)])
+async def redis_memory_report(sample: int = Query(10000, ge=1, le=1000000)):
+    """Redis key counts, memory use and keys without a TTL by key type (sampled)."""
+    if not redis_client:
+        raise HTTPException(status_code=503, detail="Service unavailable")
+    return await asyncio.to_thread(memory_report, redis_client, sample)
+
+
+@app.post("/admin/batch", dependencies=[Depends(require_admin)])
+async def run_batch(
+    request: Request,
+    concurrency: int = Query(settings.batch_concurrency, ge=1),
+    memory: bool = Query(False)
+):
+    """Answer a JSONL batch of prompts, streaming JSONL results as they complete.
+    
+    Items share this worker's generation slots with interactive traffic;
+    ``concurrency`` caps how many of them a batch holds at once. Memory is
+    bypassed unless ``memory=true``. See ``app.batch`` for the formats.
+    """
+    if not llm_router or not persona_manager or (memory and not redis_client):
+        raise HTTPException(status_code=503, detail="Service unavailable")
+    
+    body = (await request.body()).decode("utf-8")
+    try:
+        items = list(parse_items(body.splitlines(), require_user_id=memory))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if len(items) > settings.batch_max_items:
+        raise HTTPException(status_code=413, detail=f"At most {settings.batch_max_items} items per request")
+    
+    runner = BatchRunner(
+        llm_router,
+        persona_manager,
+        scheduler,
+        concurrency=min(concurrency, scheduler.max_concurrent),
+        redis_client=redis_client if memory else None,
+        cascade=cascade,
+        write_buffer=write_buffer if memory else None
+    )
+    
+    async def result_lines():
+        async for result in runner.run(items):
+            yield json.dumps(result) + "\n"
+    
+    return StreamingResponse(result_lines(), media_type="application/x-ndjson")
+
+
 # ============================================================================
 # WebSocket Endpoints (Optional Streaming)
 # ============================================================================
 
-@app.websocket("/ws/chat/{user_id}")
-async def websocket_chat(websocket: WebSocket, user_id: str):
-    """WebSocket endpoint for streaming responses."""
-    if not session_manager or not redis_client or not ollama_client or not persona_manager:
-        await websocket.close(code=1008, reason="Service unavailable")
+async def _try_send(websocket: WebSocket, data: dict) -> bool:
+    """Send a JSON message, returning False if the client is gone."""
+    try:
+        await websocket.send_json(data)
+        return True
+    except (WebSocketDisconnect, RuntimeError, OSError):
+        return False
+
+
+async def _send_reply_event(
+    websocket: WebSocket,
+    publisher: ReplyPublisher,
+    event: dict,
+    connected: bool = True
+) -> bool:
+    """Publish a reply event for resuming, then send it if the client is connected.
+    
+    Returns:
+        Whether the client is still connected
+    """
+    offset = publisher.publish(event)
+    if not connected:
+        return False
+    return await _try_send(websocket, {**event, "generation_id": publisher.generation_id, "offset": offset})
+
+
+async def _websocket_turn(websocket: WebSocket, user_id: str, message: dict) -> None:
+    """Handle one chat message received over a WebSocket.
+    
+    A message may carry an ``idempotency_key``; resending it replays the
+    stored reply instead of generating again. Reply events carry a
+    ``generation_id`` and ``offset`` for resuming after a reconnect. A
+    message over the user's rate limit or token quota gets an ``error``
+    event with ``retry_after`` seconds.
+    """
+    started = time.perf_counter()
+    idempotency_key = str(message.get("idempotency_key") or "")[:MAX_IDEMPOTENCY_KEY_LENGTH]
+    replies = IdempotencyStore(redis_client, settings.idempotency_ttl)
+    
+    # Get session and memory
+    session_data = session_manager.get_session(user_id)
+    if not session_data:
+        await websocket.send_json({
+            "type": "error",
+            "message": "Session not found"
+        })
         return
     
-    await websocket.accept()
+    persona_key = session_data.get("persona", "mental_health_nurse")
+    degradation.update()
+    options = degradation.apply(persona_manager.get_generation_options(persona_key))
+    system_prompt = persona_manager.get_system_prompt(persona_key)
+    publisher = ReplyPublisher(redis_client, user_id, uuid.uuid4().hex, ttl=settings.reply_stream_ttl)
     
+    # Stream response, collecting the full text as it arrives. If the client
+    # goes away (or the worker is shutting down and closed the socket) the
+    # generation still runs to completion so the reply is stored in memory.
     try:
-        while True:
-            # Receive message
-            data = await websocket.receive_text()
-            message = json.loads(data)
+        async with _turn_lock().hold(
+            user_id,
+            supersede=settings.chat_cancel_previous,
+            owner=idempotency_key
+        ) as turn:
+            stored = replies.get(user_id, idempotency_key) if idempotency_key else None
+            if stored:
+                metrics.IDEMPOTENT_REPLAYS.labels(endpoint="ws_chat").inc()
+                await websocket.send_json({
+                    "type": "complete",
+                    "response": stored["response"],
+                    "replayed": True
+                })
+                return
             
-            # Get session and memory
-            session_data = session_manager.get_session(user_id)
-            if not session_data:
+            limit = _check_rate_limit(user_id, persona_key)
+            if limit and not limit.allowed:
                 await websocket.send_json({
                     "type": "error",
-                    "message": "Session not found"
+                    "message": limit.message,
+                    "retry_after": limit.retry_after,
+                    "remaining_tokens": limit.remaining_tokens
                 })
-                continue
-            
-            persona_key = session_data.get("persona", "mental_health_nurse")
-            persona_info = persona_manager.get_persona_info(persona_key)
-            system_prompt = persona_manager.get_system_prompt(persona_key)
+                return
             
+            _flush_pending(user_id)
             memory = ChatMemoryManager(redis_client, user_id)
             memory.add_message("user", message.get("text", ""))
             
             # Build context
-            context = memory.get_context_window()
-            if context:
-                full_prompt = f"{context}\n\nUser: {message.get('text', '')}\nAssistant:"
-            else:
-                full_prompt = f"User: {message.get('text', '')}\nAssistant:"
+            context = memory.get_context_window(degradation.context_limit(settings.max_context_messages))
+            with tracing.span("prompt.build"):
+                if context:
+                    full_prompt = f"{context}\n\nUser: {message.get('text', '')}\nAssistant:"
+                else:
+                    full_prompt = f"User: {message.get('text', '')}\nAssistant:"
             
-            # Stream response
+            chunks = []
+            connected = True
+            stream = scheduler.stream(
+                llm_router.generate_stream,
+                prompt=full_prompt,
+                system=system_prompt,
+                options=options,
+                backend=_select_backend(message.get("text", ""), persona_key)
+            )
             try:
-                for chunk in ollama_client.generate_stream(
-                    prompt=full_prompt,
-                    system=system_prompt,
-                    temperature=persona_info.get("temperature", 0.7),
-                    max_tokens=persona_info.get("max_tokens", 500)
-                ):
-                    await websocket.send_json({
+                async for chunk in stream:
+                    turn.check()
+                    if not chunks:
+                        metrics.TIME_TO_FIRST_TOKEN.labels(endpoint="ws_chat").observe(
+                            time.perf_counter() - started
+                        )
+                    chunks.append(chunk)
+                    connected = await _send_reply_event(websocket, publisher, {
                         "type": "chunk",
                         "content": chunk
-                    })
-                
-                # Collect full response
-                response_text = ""
-                for chunk in ollama_client.generate_stream(
-                    prompt=full_prompt,
-                    system=system_prompt,
-                    temperature=persona_info.get("temperature", 0.7),
-                    max_tokens=persona_info.get("max_tokens", 500)
-                ):
-                    response_text += chunk
-                
-                memory.add_message("assistant", response_text)
-                
-                await websocket.send_json({
-                    "type": "complete",
-                    "response": response_text
-                })
+                    }, connected)
+            finally:
+                await stream.aclose()
             
-            except Exception as e:
-                await websocket.send_json({
-                    "type": "error",
-                    "message": str(e)
-                })
+            response_text = "".join(chunks)
+            _store_reply(memory, response_text, update_session=False)
+            _charge_reply(user_id, persona_key, response_text)
+            if idempotency_key:
+                replies.put(user_id, idempotency_key, {"response": response_text})
+            
+            connected = await _send_reply_event(websocket, publisher, {
+                "type": "complete",
+                "response": response_text
+            }, connected)
+            _flush_pending(user_id)
+            if not connected:
+                logger.info(f"WebSocket for {user_id} closed mid-stream; reply stored in history")
+    
+    except TurnCancelled:
+        logger.info(f"Chat turn for {user_id} superseded by a newer message")
+        await _send_reply_event(websocket, publisher, {
+            "type": "cancelled",
+            "message": "Superseded by a newer message"
+        })
+    except UserBusyError as e:
+        await _try_send(websocket, {
+            "type": "error",
+            "message": str(e)
+        })
+    except CircuitOpenError as e:
+        await _send_reply_event(websocket, publisher, {
+            "type": "error",
+            "message": str(e),
+            "retry_after": e.retry_after
+        })
+    except Exception as e:
+        await _send_reply_event(websocket, publisher, {
+            "type": "error",
+            "message": str(e)
+        })
+    finally:
+        metrics.CHAT_LATENCY.labels(endpoint="ws_chat").observe(time.perf_counter() - started)
+
+
+async def _websocket_resume(websocket: WebSocket, user_id: str, message: dict) -> None:
+    """Replay a streamed reply after the client's last-seen offset.
+    
+    The message is ``{"resume": generation_id, "offset": n}``; ``"latest"``
+    resumes the user's most recent reply. Events still being generated are
+    forwarded as they arrive.
+    """
+    generation_id = message.get("resume")
+    if generation_id == "latest":
+        generation_id = latest_generation(redis_client, user_id)
+    metrics.REPLY_RESUMES.labels(transport="websocket").inc()
+    
+    try:
+        if not generation_id:
+            raise ReplyNotFound("No reply to resume")
+        async for offset, event in read_reply(redis_client, user_id, generation_id, after=int(message.get("offset") or 0)):
+            if not await _try_send(websocket, {**event, "generation_id": generation_id, "offset": offset}):
+                return
+    except (ReplyNotFound, ValueError) as e:
+        await _try_send(websocket, {
+            "type": "error",
+            "message": str(e)
+        })
+
+
+async def _traced_websocket_turn(websocket: WebSocket, user_id: str, message: dict) -> None:
+    """Handle a WebSocket chat message inside a trace span."""
+    with tracing.span("ws.chat_turn", **{"user.id": user_id}):
+        await _websocket_turn(websocket, user_id, message)
+
+
+@app.websocket("/ws/chat/{user_id}")
+async def websocket_chat(websocket: WebSocket, user_id: str):
+    """WebSocket endpoint for streaming responses.
+    
+    A ``{"resume": generation_id, "offset": n}`` message replays a reply
+    from its Redis Stream, e.g. after reconnecting. Messages are normally
+    handled one after another. With
+    ``CHAT_CANCEL_PREVIOUS`` enabled, they are handled as they arrive so a
+    new message can supersede the reply still being streamed.
+    """
+    if not session_manager or not redis_client or not llm_router or not persona_manager:
+        await websocket.close(code=1008, reason="Service unavailable")
+        return
+    
+    await websocket.accept()
+    metrics.ACTIVE_WEBSOCKETS.inc()
+    running = set()
+    
+    try:
+        while True:
+            # Receive message
+            data = await websocket.receive_text()
+            message = json.loads(data)
+            handler = _websocket_resume if "resume" in message else _traced_websocket_turn
+            if settings.chat_cancel_previous:
+                task = asyncio.ensure_future(handler(websocket, user_id, message))
+                running.add(task)
+                task.add_done_callback(running.discard)
+            else:
+                await handler(websocket, user_id, message)
     
     except WebSocketDisconnect:
         logger.info(f"WebSocket disconnected for user {user_id}")
@@ -461,6 +1185,11 @@ async def websocket_chat(websocket: WebSocket, user_id: str):
             await websocket.close(code=1011, reason="Internal server error")
         except:
             pass
+    finally:
+        # Turns still running finish and store their replies
+        if running:
+            await asyncio.gather(*running, return_exceptions=True)
+        metrics.ACTIVE_WEBSOCKETS.dec()
 
 
 if __name__ == "__main__":
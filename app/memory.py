@@ -1,34 +1,75 @@
-"""Memory management with LangChain and Redis."""
+"""Conversation memory management with Redis."""
 import json
 import logging
+import os
+import threading
+import time
 from datetime import datetime
-from typing import List, Dict, Any, Optional
+from typing import TYPE_CHECKING, List, Dict, Any, Optional, Iterator, Tuple
 from redis import Redis
-from langchain.schema import HumanMessage, AIMessage, BaseMessage
+
+from app import keys
+from app.metrics import timed_redis
+from app.stream_history import MESSAGE_ID_CLOCK_DIGITS, StreamHistory
+from app.tracing import traced
+from config.config import settings
+
+if TYPE_CHECKING:
+    from langchain.schema import BaseMessage
 
 logger = logging.getLogger(__name__)
 
+# History storage backends (MEMORY_BACKEND)
+MEMORY_BACKENDS = ("list", "stream")
+
+# Last clock value used for a message id in this process
+_last_id_ns = 0
+_id_lock = threading.Lock()
+
 
 class ChatMemoryManager:
     """Manages conversation history and context using Redis."""
     
-    def __init__(self, redis_client: Redis, user_id: str, max_messages: int = 10):
+    def __init__(
+        self,
+        redis_client: Redis,
+        user_id: str,
+        max_messages: int = 10,
+        backend: Optional[str] = None,
+        idle_ttl: Optional[int] = None
+    ):
         """Initialize memory manager for a user.
         
         Args:
             redis_client: Redis client instance
             user_id: Unique user identifier
             max_messages: Maximum number of messages to keep in buffer
+            backend: History storage, ``list`` or ``stream`` (default MEMORY_BACKEND)
+            idle_ttl: Seconds the user's history and metadata survive without
+                activity, 0 for no expiry (default MEMORY_IDLE_TTL)
+        
+        Raises:
+            ValueError: If the backend is unknown
         """
         self.redis = redis_client
         self.user_id = user_id
         self.max_messages = max_messages
+        self.idle_ttl = settings.memory_idle_ttl if idle_ttl is None else idle_ttl
+        self.backend = backend or settings.memory_backend
+        if self.backend not in MEMORY_BACKENDS:
+            raise ValueError(f"Unknown memory backend: {self.backend}")
         
-        # Redis key prefixes
-        self.history_key = f"chat:{user_id}:history"
-        self.metadata_key = f"chat:{user_id}:metadata"
-        self.session_key = f"chat:{user_id}:session"
+        # Redis keys (share a hash tag per user when enabled)
+        self.history_key = keys.history_key(user_id, self.backend)
+        self.metadata_key = keys.metadata_key(user_id)
+        self.session_key = keys.chat_session_key(user_id)
+        
+        self.stream = None
+        if self.backend == "stream":
+            self.stream = StreamHistory(redis_client, self.history_key, max_messages)
     
+    @traced("memory.add_message")
+    @timed_redis("memory.add_message")
     def add_message(self, role: str, content: str, metadata: Optional[Dict[str, Any]] = None) -> None:
         """Add a message to conversation history.
         
@@ -37,53 +78,253 @@ class ChatMemoryManager:
             content: Message content
             metadata: Optional metadata about the message
         """
-        message = {
+        # Append, trim to max messages and refresh the idle TTL atomically
+        pipe = self.redis.pipeline()
+        self.queue_message(pipe, self.new_message(role, content, metadata))
+        pipe.execute()
+    
+    def new_message(self, role: str, content: str, metadata: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Build a message for ``add_message`` or ``queue_message``."""
+        return {
+            "id": self._new_message_id(),
             "role": role,
             "content": content,
             "timestamp": datetime.utcnow().isoformat(),
             "metadata": metadata or {}
         }
+    
+    def queue_message(self, pipe, message: Dict[str, Any]) -> None:
+        """Queue appending a message (with trimming and TTL refresh) on a pipeline.
         
-        # Store as JSON in Redis list
-        self.redis.rpush(self.history_key, json.dumps(message))
+        Lets several messages, possibly of different users, be written in
+        one round trip.
         
-        # Trim to max messages
-        list_length = self.redis.llen(self.history_key)
-        if list_length > self.max_messages:
-            self.redis.ltrim(self.history_key, list_length - self.max_messages, -1)
+        Args:
+            pipe: Redis pipeline
+            message: Message built by ``new_message``
+        """
+        if self.stream is not None:
+            self.stream.append(message, pipe)
+        else:
+            pipe.rpush(self.history_key, json.dumps(message))
+            pipe.ltrim(self.history_key, -self.max_messages, -1)
+        self._refresh_ttl(pipe)
     
+    def queue_restore(
+        self,
+        pipe,
+        messages: List[Dict[str, Any]],
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> None:
+        """Queue writing imported history and metadata on a pipeline.
+        
+        The history is capped at ``max_messages`` and the keys get the idle
+        TTL, as with ``add_message``. Existing keys should be deleted first.
+        
+        Args:
+            pipe: Redis pipeline
+            messages: Messages oldest-first, as exported
+            metadata: Conversation metadata
+        """
+        if messages and self.stream is not None:
+            for entry_id, message in zip(StreamHistory.entry_ids(messages), messages):
+                pipe.xadd(self.history_key, StreamHistory.encode(message), id=entry_id)
+            pipe.xtrim(self.history_key, maxlen=self.max_messages, approximate=True)
+        elif messages:
+            pipe.rpush(self.history_key, *(json.dumps(m) for m in messages))
+            pipe.ltrim(self.history_key, -self.max_messages, -1)
+        if metadata:
+            pipe.set(self.metadata_key, json.dumps(metadata))
+        self._refresh_ttl(pipe)
+    
+    def queue_count(self, pipe) -> None:
+        """Queue reading the number of stored messages on a pipeline."""
+        if self.stream is not None:
+            pipe.xlen(self.history_key)
+        else:
+            pipe.llen(self.history_key)
+    
+    @traced("memory.get_messages")
+    @timed_redis("memory.get_messages")
     def get_messages(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
         """Retrieve recent messages from history.
         
         Args:
             limit: Maximum number of messages to retrieve
-            
+        
         Returns:
             List of message dictionaries
         """
         count = limit or self.max_messages
+        if self.stream is not None:
+            return self.stream.recent(count)
         
         messages_raw = self.redis.lrange(self.history_key, -count, -1)
-        messages = []
+        return self._decode_messages(messages_raw)
+    
+    def iter_messages(
+        self,
+        batch_size: int = 100,
+        before: Optional[str] = None,
+        after: Optional[str] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """Iterate over the full history oldest-first, one batch at a time.
         
-        for msg_json in messages_raw:
-            try:
-                msg = json.loads(msg_json)
-                messages.append(msg)
-            except json.JSONDecodeError as e:
-                logger.warning(f"Failed to decode message: {e}")
+        Only ``batch_size`` raw entries are held in memory at once, so this
+        is safe to use for exports of arbitrarily long histories.
         
-        return messages
+        Args:
+            batch_size: Number of entries fetched per LRANGE/XRANGE call
+            before: Only yield messages older than this cursor
+            after: Only yield messages newer than this cursor
+        
+        Returns:
+            Iterator of message dictionaries
+        
+        Raises:
+            ValueError: If a cursor is not a message id or ISO timestamp
+        """
+        if self.stream is not None:
+            return self.stream.iter_messages(batch_size, before, after)
+        self._check_cursor(before)
+        self._check_cursor(after)
+        return self._iter_list(batch_size, before, after)
+    
+    def _iter_list(
+        self,
+        batch_size: int,
+        before: Optional[str],
+        after: Optional[str]
+    ) -> Iterator[Dict[str, Any]]:
+        """Iterate over the history list oldest-first.
+        
+        Batches are fetched by offset, each with the last message of the
+        previous batch in front. If that is no longer the message last
+        yielded, a concurrent LTRIM shifted the list and iteration resumes
+        after that message's id, so nothing is skipped or repeated.
+        """
+        start = 0
+        last_id = None
+        while True:
+            overlap = 1 if last_id is not None and start > 0 else 0
+            raw = self.redis.lrange(self.history_key, start - overlap, start + batch_size - 1)
+            if overlap:
+                head, raw = raw[:1], raw[1:]
+                if [msg.get("id") for msg in self._decode_messages(head)] != [last_id]:
+                    start = self._resume_position(start, last_id, batch_size)
+                    continue
+            if not raw:
+                return
+            
+            for msg in self._decode_messages(raw):
+                if last_id is not None and msg.get("id", "") <= last_id:
+                    continue
+                if after is not None and not self._cursor_value(msg, after) > after:
+                    continue
+                if before is not None and not self._cursor_value(msg, before) < before:
+                    return
+                last_id = msg.get("id") or last_id
+                yield msg
+            
+            if len(raw) < batch_size:
+                return
+            start += batch_size
+    
+    def _resume_position(self, start: int, last_id: str, batch_size: int) -> int:
+        """Offset just after the message ``last_id``, which was at ``start - 1``.
+        
+        Trimming only removes the oldest messages, so the message can only
+        have moved towards the head. If it is gone, iteration restarts from
+        the head; already yielded messages are skipped by id.
+        """
+        low = max(start - batch_size, 0)
+        window = self._decode_messages(self.redis.lrange(self.history_key, low, start - 1))
+        for index in range(len(window) - 1, -1, -1):
+            if window[index].get("id") == last_id:
+                return low + index + 1
+        return 0
     
-    def get_langchain_messages(self, limit: Optional[int] = None) -> List[BaseMessage]:
+    @traced("memory.get_messages_page")
+    @timed_redis("memory.get_messages_page")
+    def get_messages_page(
+        self,
+        limit: int = 50,
+        before: Optional[str] = None,
+        after: Optional[str] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Retrieve one page of history using a message id or timestamp cursor.
+        
+        Without ``after`` the page is the newest ``limit`` messages older than
+        ``before`` (or the newest overall), and the returned cursor points at
+        the next older page. With ``after`` the page is the oldest ``limit``
+        messages newer than the cursor, and the returned cursor points at the
+        next newer page.
+        
+        Args:
+            limit: Maximum number of messages in the page
+            before: Message id or ISO timestamp to page backwards from
+            after: Message id or ISO timestamp to page forwards from
+        
+        Returns:
+            Tuple of (messages oldest-first, cursor for the next page or None)
+        
+        Raises:
+            ValueError: If a cursor is not a message id or ISO timestamp
+        """
+        if self.stream is not None:
+            return self.stream.page(limit, before, after)
+        self._check_cursor(before)
+        self._check_cursor(after)
+        
+        if after is not None:
+            page = []
+            for msg in self.iter_messages(batch_size=max(limit, 1) + 1, before=before, after=after):
+                if len(page) == limit:
+                    return page, page[-1].get("id") or page[-1].get("timestamp")
+                page.append(msg)
+            return page, None
+        
+        page = []
+        batch_size = max(limit, 1) + 1
+        end = -1
+        while len(page) <= limit:
+            raw = self.redis.lrange(self.history_key, end - batch_size + 1, end)
+            if not raw:
+                break
+            for msg in reversed(self._decode_messages(raw)):
+                if before is not None and not self._cursor_value(msg, before) < before:
+                    continue
+                # Appends shift negative offsets; skip messages already taken
+                if page and page[-1].get("id") and msg.get("id", "") >= page[-1]["id"]:
+                    continue
+                page.append(msg)
+                if len(page) > limit:
+                    break
+            if len(raw) < batch_size:
+                break
+            end -= batch_size
+        
+        has_more = len(page) > limit
+        page = list(reversed(page[:limit]))
+        next_cursor = None
+        if has_more and page:
+            next_cursor = page[0].get("id") or page[0].get("timestamp")
+        return page, next_cursor
+    
+    def get_langchain_messages(self, limit: Optional[int] = None) -> List["BaseMessage"]:
         """Get messages in LangChain format.
         
+        LangChain is an optional dependency (``requirements-langchain.txt``)
+        and is only imported here, keeping it out of worker start-up.
+        
         Args:
             limit: Maximum number of messages to retrieve
-            
+        
         Returns:
             List of LangChain Message objects
         """
+        from langchain.schema import AIMessage, HumanMessage
+        
         messages = self.get_messages(limit)
         langchain_messages = []
         
@@ -95,18 +336,31 @@ class ChatMemoryManager:
         
         return langchain_messages
     
+    @timed_redis("memory.message_count")
+    def message_count(self) -> int:
+        """Number of messages currently stored in history."""
+        if self.stream is not None:
+            return self.stream.count()
+        return self.redis.llen(self.history_key)
+    
+    @traced("memory.clear_history")
+    @timed_redis("memory.clear_history")
     def clear_history(self) -> None:
         """Clear all conversation history for user."""
         self.redis.delete(self.history_key)
         logger.info(f"Cleared conversation history for user: {self.user_id}")
     
-    def get_context_window(self) -> str:
+    @traced("memory.get_context_window")
+    def get_context_window(self, limit: Optional[int] = None) -> str:
         """Get formatted context window for LLM prompt.
         
+        Args:
+            limit: Maximum number of messages to include (default max_messages)
+        
         Returns:
             Formatted string with recent conversation history
         """
-        messages = self.get_messages()
+        messages = self.get_messages(limit)
         if not messages:
             return ""
         
@@ -117,6 +371,65 @@ class ChatMemoryManager:
         
         return "\n".join(context_lines)
     
+    def _refresh_ttl(self, pipe) -> None:
+        """Queue idle TTL refreshes of the user's conversation keys."""
+        if self.idle_ttl > 0:
+            for key in (self.history_key, self.metadata_key, self.session_key):
+                pipe.expire(key, self.idle_ttl)
+    
+    @staticmethod
+    def _new_message_id() -> str:
+        """Generate a unique, sortable message id.
+        
+        A zero-padded nanosecond clock value, strictly increasing within the
+        process, followed by the process id. Two workers appending in the same
+        clock tick (coarse clocks) therefore still get different ids, and ids
+        stay all digits so they remain valid cursors.
+        """
+        global _last_id_ns
+        with _id_lock:
+            _last_id_ns = max(time.time_ns(), _last_id_ns + 1)
+            clock = _last_id_ns
+        return f"{clock:0{MESSAGE_ID_CLOCK_DIGITS}d}{os.getpid():07d}"
+    
+    @staticmethod
+    def _check_cursor(cursor: Optional[str]) -> None:
+        """Reject a cursor that is neither a message id nor an ISO timestamp.
+        
+        Raises:
+            ValueError: If the cursor is invalid
+        """
+        if cursor is None or cursor.isdigit():
+            return
+        try:
+            datetime.fromisoformat(cursor)
+        except ValueError:
+            raise ValueError(f"Invalid history cursor: {cursor!r}") from None
+    
+    @staticmethod
+    def _cursor_value(message: Dict[str, Any], cursor: str) -> str:
+        """Return the message field a cursor should be compared against.
+        
+        Numeric cursors are message ids, anything else is treated as an ISO
+        timestamp. Both sort lexicographically in chronological order.
+        """
+        if cursor.isdigit():
+            return message.get("id", "")
+        return message.get("timestamp", "")
+    
+    @staticmethod
+    def _decode_messages(messages_raw: List[str]) -> List[Dict[str, Any]]:
+        """Decode raw JSON history entries, skipping malformed ones."""
+        messages = []
+        for msg_json in messages_raw:
+            try:
+                messages.append(json.loads(msg_json))
+            except json.JSONDecodeError as e:
+                logger.warning(f"Failed to decode message: {e}")
+        return messages
+    
+    @traced("memory.set_metadata")
+    @timed_redis("memory.set_metadata")
     def set_metadata(self, metadata: Dict[str, Any]) -> None:
         """Store session metadata.
         
@@ -125,8 +438,10 @@ class ChatMemoryManager:
         """
         current = self.get_metadata()
         current.update(metadata)
-        self.redis.set(self.metadata_key, json.dumps(current))
+        self.redis.set(self.metadata_key, json.dumps(current), ex=self.idle_ttl or None)
     
+    @traced("memory.get_metadata")
+    @timed_redis("memory.get_metadata")
     def get_metadata(self) -> Dict[str, Any]:
         """Retrieve session metadata.
         
@@ -141,6 +456,8 @@ class ChatMemoryManager:
                 return {}
         return {}
     
+    @traced("memory.get_session_info")
+    @timed_redis("memory.get_session_info")
     def get_session_info(self) -> Dict[str, Any]:
         """Get complete session information.
         
@@ -151,12 +468,12 @@ class ChatMemoryManager:
             "user_id": self.user_id,
             "messages": self.get_messages(),
             "metadata": self.get_metadata(),
-            "message_count": self.redis.llen(self.history_key)
+            "message_count": self.message_count()
         }
     
+    @traced("memory.delete_session")
+    @timed_redis("memory.delete_session")
     def delete_session(self) -> None:
         """Delete all session data for user."""
-        self.redis.delete(self.history_key)
-        self.redis.delete(self.metadata_key)
-        self.redis.delete(self.session_key)
+        self.redis.delete(self.history_key, self.metadata_key, self.session_key)
         logger.info(f"Deleted session for user: {self.user_id}")
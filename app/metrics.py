@@ -0,0 +1,498 @@
+"""Lightweight Prometheus-compatible metrics.
+
+Counters, gauges and histograms are plain Python objects whose hot-path
+updates are simple attribute arithmetic with no locks. Under the GIL an
+increment racing with another thread can very rarely be lost, which is an
+acceptable trade-off for monitoring data and keeps ``observe()`` cheap enough
+to call on every request and Redis operation. ``REGISTRY.render()`` produces
+the Prometheus text exposition format served by ``/metrics``.
+
+Under gunicorn every worker has its own registry, so a scrape would only see
+whichever worker served it. With ``PROMETHEUS_MULTIPROC_DIR`` set (as
+``gunicorn.conf.py`` does), each worker writes its values to a file in that
+directory every ``MULTIPROCESS_DUMP_INTERVAL`` seconds and ``render_all()``
+merges the files of all workers: counters and histograms are summed, gauges
+get a ``pid`` label. Files of exited workers keep their counters and
+histograms, so totals never go backwards, and lose their gauges
+(``mark_process_dead``).
+"""
+import asyncio
+import bisect
+import functools
+import glob
+import json
+import os
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+# Seconds between a worker's metric file writes in multiprocess mode
+MULTIPROCESS_DUMP_INTERVAL = 1.0
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+REDIS_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5)
+RATE_BUCKETS = (1, 2, 5, 10, 20, 30, 50, 75, 100, 150, 250)
+
+
+class _Metric:
+    """Base class handling names, labels and registration."""
+    
+    kind = ""
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), registry=None):
+        """Initialize metric.
+        
+        Args:
+            name: Metric name
+            documentation: Help text
+            labelnames: Label names, values are passed to ``labels()``
+            registry: Registry to add the metric to (defaults to REGISTRY)
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        (registry if registry is not None else REGISTRY).register(self)
+    
+    def labels(self, *values, **kwargs):
+        """Get the child for a label combination, creating it on first use."""
+        if kwargs:
+            values = tuple(kwargs[name] for name in self.labelnames)
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            child = self._children.setdefault(key, self._new_child())
+        return child
+    
+    def _new_child(self):
+        raise NotImplementedError
+    
+    def _default(self):
+        """Child used when the metric has no labels."""
+        return self.labels()
+    
+    def _label_str(self, key: Tuple[str, ...], extra: str = "") -> str:
+        pairs = [f'{n}="{_escape(v)}"' for n, v in zip(self.labelnames, key)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+    
+    def render(self) -> List[str]:
+        """Render the metric in text exposition format."""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for key, child in list(self._children.items()):
+            lines.extend(self._render_child(key, child))
+        return lines
+    
+    def _render_child(self, key, child) -> List[str]:
+        return [f"{self.name}{self._label_str(key)} {_num(child.value)}"]
+
+
+class _Value:
+    """Single numeric value."""
+    
+    __slots__ = ("value",)
+    
+    def __init__(self):
+        self.value = 0.0
+    
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+    
+    def dec(self, amount: float = 1.0) -> None:
+        self.value -= amount
+    
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class Counter(_Metric):
+    """Monotonically increasing counter."""
+    
+    kind = "counter"
+    
+    def _new_child(self):
+        return _Value()
+    
+    def inc(self, amount: float = 1.0) -> None:
+        """Increment the unlabelled counter."""
+        self._default().inc(amount)
+
+
+class Gauge(_Metric):
+    """Value that can go up and down."""
+    
+    kind = "gauge"
+    
+    def _new_child(self):
+        return _Value()
+    
+    def inc(self, amount: float = 1.0) -> None:
+        """Increment the unlabelled gauge."""
+        self._default().inc(amount)
+    
+    def dec(self, amount: float = 1.0) -> None:
+        """Decrement the unlabelled gauge."""
+        self._default().dec(amount)
+    
+    def set(self, value: float) -> None:
+        """Set the unlabelled gauge."""
+        self._default().set(value)
+
+
+class _HistogramValue:
+    """Bucket counts, sum and count for one label combination."""
+    
+    __slots__ = ("bounds", "counts", "sum", "count")
+    
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+    
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Histogram(_Metric):
+    """Cumulative histogram with fixed buckets."""
+    
+    kind = "histogram"
+    
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+        registry=None
+    ):
+        """Initialize histogram.
+        
+        Args:
+            name: Metric name
+            documentation: Help text
+            labelnames: Label names
+            buckets: Upper bounds of the buckets (``+Inf`` is implicit)
+            registry: Registry to add the metric to (defaults to REGISTRY)
+        """
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+    
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+    
+    def observe(self, value: float) -> None:
+        """Observe a value on the unlabelled histogram."""
+        self._default().observe(value)
+    
+    def time(self, *label_values, **label_kwargs) -> Callable:
+        """Decorator timing a function into this histogram.
+        
+        Args:
+            *label_values: Label values
+            **label_kwargs: Label values by name
+        
+        Returns:
+            Decorator
+        """
+        child = self.labels(*label_values, **label_kwargs)
+        
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    child.observe(time.perf_counter() - started)
+            return wrapper
+        return decorator
+    
+    def _render_child(self, key, child) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, child.counts):
+            cumulative += count
+            le = 'le="' + _num(bound) + '"'
+            lines.append(f"{self.name}_bucket{self._label_str(key, le)} {cumulative}")
+        le = 'le="+Inf"'
+        lines.append(f"{self.name}_bucket{self._label_str(key, le)} {child.count}")
+        lines.append(f"{self.name}_sum{self._label_str(key)} {_num(child.sum)}")
+        lines.append(f"{self.name}_count{self._label_str(key)} {child.count}")
+        return lines
+
+
+class Registry:
+    """Collection of metrics rendered together."""
+    
+    def __init__(self):
+        """Initialize empty registry."""
+        self._metrics: List[_Metric] = []
+        self._collectors: List[Callable[[], None]] = []
+    
+    def register(self, metric: _Metric) -> None:
+        """Add a metric."""
+        self._metrics.append(metric)
+    
+    def add_collector(self, collector: Callable[[], None]) -> None:
+        """Add a callback run before each render to refresh gauges."""
+        self._collectors.append(collector)
+    
+    def render(self) -> str:
+        """Render all metrics in Prometheus text exposition format."""
+        self.collect()
+        return self._render_metrics()
+    
+    def collect(self) -> None:
+        """Run the collectors refreshing sampled gauges."""
+        for collector in self._collectors:
+            collector()
+    
+    def _render_metrics(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+    
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """Current values of all metrics, as JSON-serializable data."""
+        snapshot = []
+        for metric in self._metrics:
+            entry = {
+                "name": metric.name,
+                "kind": metric.kind,
+                "help": metric.documentation,
+                "labelnames": list(metric.labelnames),
+                "samples": []
+            }
+            if isinstance(metric, Histogram):
+                entry["buckets"] = list(metric.buckets)
+            for key, child in list(metric._children.items()):
+                if isinstance(child, _HistogramValue):
+                    entry["samples"].append([list(key), list(child.counts), child.sum, child.count])
+                else:
+                    entry["samples"].append([list(key), child.value])
+            snapshot.append(entry)
+        return snapshot
+    
+    def dump(self, directory: str) -> None:
+        """Write this process's values to its file in a multiprocess directory."""
+        path = _process_file(directory, os.getpid())
+        with open(f"{path}.tmp", "w") as f:
+            json.dump(self.snapshot(), f)
+        os.replace(f"{path}.tmp", path)
+
+
+def multiprocess_dir() -> Optional[str]:
+    """Directory shared by all workers' metric files, if multiprocess mode is on."""
+    return os.environ.get("PROMETHEUS_MULTIPROC_DIR") or None
+
+
+def render_all(registry: Optional[Registry] = None) -> str:
+    """Render metrics for ``/metrics``: all workers' in multiprocess mode, else this process's."""
+    registry = registry or REGISTRY
+    directory = multiprocess_dir()
+    if not directory:
+        return registry.render()
+    
+    registry.collect()
+    registry.dump(directory)
+    return merge_files(directory)
+
+
+def merge_files(directory: str) -> str:
+    """Merge every worker's metric file into one exposition."""
+    merged = Registry()
+    metrics: Dict[str, _Metric] = {}
+    for path in sorted(glob.glob(os.path.join(directory, "metrics_*.json"))):
+        pid = os.path.basename(path)[len("metrics_"):-len(".json")]
+        try:
+            with open(path) as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            # Being replaced by its worker right now; its next write is merged next time
+            continue
+        for entry in snapshot:
+            metric = metrics.get(entry["name"])
+            if metric is None:
+                metric = metrics[entry["name"]] = _rebuild(entry, merged)
+            for sample in entry["samples"]:
+                if entry["kind"] == "histogram":
+                    child = metric.labels(*sample[0])
+                    child.counts = [a + b for a, b in zip(child.counts, sample[1])]
+                    child.sum += sample[2]
+                    child.count += sample[3]
+                elif entry["kind"] == "gauge":
+                    metric.labels(*sample[0], pid).set(sample[1])
+                else:
+                    metric.labels(*sample[0]).inc(sample[1])
+    return merged._render_metrics()
+
+
+async def dump_forever(directory: str, interval: float = MULTIPROCESS_DUMP_INTERVAL, registry: Optional[Registry] = None) -> None:
+    """Refresh and write this worker's metric file every ``interval`` seconds until cancelled."""
+    registry = registry or REGISTRY
+    while True:
+        registry.collect()
+        registry.dump(directory)
+        await asyncio.sleep(interval)
+
+
+def mark_process_dead(pid: int, directory: Optional[str] = None) -> None:
+    """Drop an exited worker's gauges, keeping its counters and histograms."""
+    directory = directory or multiprocess_dir()
+    if not directory:
+        return
+    path = _process_file(directory, pid)
+    try:
+        with open(path) as f:
+            snapshot = json.load(f)
+    except (OSError, ValueError):
+        return
+    with open(f"{path}.tmp", "w") as f:
+        json.dump([entry for entry in snapshot if entry["kind"] != "gauge"], f)
+    os.replace(f"{path}.tmp", path)
+
+
+def _rebuild(entry: Dict[str, Any], registry: Registry) -> _Metric:
+    """Create an empty metric matching a snapshot entry."""
+    if entry["kind"] == "histogram":
+        return Histogram(entry["name"], entry["help"], entry["labelnames"], entry["buckets"], registry=registry)
+    if entry["kind"] == "gauge":
+        return Gauge(entry["name"], entry["help"], entry["labelnames"] + ["pid"], registry=registry)
+    return Counter(entry["name"], entry["help"], entry["labelnames"], registry=registry)
+
+
+def _process_file(directory: str, pid: int) -> str:
+    return os.path.join(directory, f"metrics_{pid}.json")
+
+
+def _num(value: float) -> str:
+    """Format a number the way Prometheus expects."""
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+REGISTRY = Registry()
+
+# ----------------------------------------------------------------------------
+# Application metrics
+# ----------------------------------------------------------------------------
+
+CHAT_LATENCY = Histogram(
+    "nono_chat_latency_seconds", "End-to-end chat turn latency", ["endpoint"]
+)
+TIME_TO_FIRST_TOKEN = Histogram(
+    "nono_time_to_first_token_seconds", "Time from receiving a message to the first streamed token", ["endpoint"]
+)
+TOKENS_PER_SECOND = Histogram(
+    "nono_tokens_per_second", "Generation speed reported by the LLM backend", buckets=RATE_BUCKETS
+)
+OLLAMA_PROMPT_EVAL = Histogram(
+    "nono_ollama_prompt_eval_seconds", "Ollama prompt evaluation duration"
+)
+OLLAMA_EVAL = Histogram(
+    "nono_ollama_eval_seconds", "Ollama token generation duration"
+)
+GENERATED_TOKENS = Counter(
+    "nono_generated_tokens_total", "Tokens generated by the LLM backend"
+)
+REDIS_LATENCY = Histogram(
+    "nono_redis_operation_seconds", "Redis round-trip time per memory/session operation",
+    ["operation"], buckets=REDIS_BUCKETS
+)
+QUEUE_WAIT = Histogram(
+    "nono_generation_queue_wait_seconds", "Time waiting for a generation slot"
+)
+QUEUE_DEPTH = Gauge(
+    "nono_generation_queue_depth", "Generations waiting for a slot"
+)
+GENERATIONS_IN_FLIGHT = Gauge(
+    "nono_generations_in_flight", "Generations currently running"
+)
+TURN_LOCK_WAIT = Histogram(
+    "nono_turn_lock_wait_seconds", "Time a chat turn waited for the user's previous turn"
+)
+TURNS_SUPERSEDED = Counter(
+    "nono_turns_superseded_total", "Chat turns cancelled by a newer message from the same user"
+)
+IDEMPOTENT_REPLAYS = Counter(
+    "nono_idempotent_replays_total", "Retried requests answered with the stored reply", ["endpoint"]
+)
+REPLY_RESUMES = Counter(
+    "nono_reply_resumes_total", "Streamed replies resumed after a reconnect", ["transport"]
+)
+DEGRADATION_LEVEL = Gauge(
+    "nono_degradation_level", "Load degradation level (0 normal, 1 reduced, 2 minimal)"
+)
+DEGRADATION_CHANGES = Counter(
+    "nono_degradation_changes_total", "Degradation level changes, by level entered", ["level"]
+)
+ACTIVE_WEBSOCKETS = Gauge(
+    "nono_active_websockets", "Open WebSocket chat connections"
+)
+REDIS_POOL_CONNECTIONS = Gauge(
+    "nono_redis_pool_connections", "Redis connection pool utilization", ["state"]
+)
+CIRCUIT_OPEN = Gauge(
+    "nono_circuit_open", "1 when the backend circuit breaker is not closed", ["backend"]
+)
+LLM_GENERATIONS = Counter(
+    "nono_llm_generations_total", "Generations completed per LLM backend", ["backend"]
+)
+LLM_FAILOVERS = Counter(
+    "nono_llm_failovers_total", "Generations moved past a failing or unavailable LLM backend", ["backend"]
+)
+LLM_GENERATION_LATENCY = Histogram(
+    "nono_llm_generation_seconds", "Generation time per LLM backend (full reply, streams included)", ["backend"]
+)
+CASCADE_ROUTES = Counter(
+    "nono_cascade_routes_total", "Cascade routing decisions", ["route", "reason"]
+)
+WRITE_BEHIND_PENDING = Gauge(
+    "nono_write_behind_pending", "History and session writes queued for the next write-behind flush"
+)
+WRITE_BEHIND_FLUSHES = Counter(
+    "nono_write_behind_flushes_total", "Write-behind flushes", ["result"]
+)
+MEMORY_KEYS_REAPED = Counter(
+    "nono_memory_keys_reaped_total", "Conversation keys without a TTL given the idle TTL by the reaper", ["type"]
+)
+RATE_LIMITED = Counter(
+    "nono_rate_limited_total", "Chat messages refused by the per-user rate limit or token quota", ["reason"]
+)
+
+
+def observe_ollama_stats(data: Dict) -> None:
+    """Record timing fields from a final Ollama ``/api/generate`` response.
+    
+    Args:
+        data: Final (``done``) response object; durations are in nanoseconds
+    """
+    prompt_eval = data.get("prompt_eval_duration")
+    if prompt_eval:
+        OLLAMA_PROMPT_EVAL.observe(prompt_eval / 1e9)
+    
+    eval_duration = data.get("eval_duration")
+    eval_count = data.get("eval_count")
+    if eval_duration:
+        OLLAMA_EVAL.observe(eval_duration / 1e9)
+        if eval_count:
+            TOKENS_PER_SECOND.observe(eval_count / (eval_duration / 1e9))
+    if eval_count:
+        GENERATED_TOKENS.inc(eval_count)
+
+
+def timed_redis(operation: str) -> Callable:
+    """Decorator recording a memory/session method's Redis round-trip time."""
+    return REDIS_LATENCY.time(operation=operation)
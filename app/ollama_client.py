@@ -1,27 +1,55 @@
 """Ollama LLM integration module."""
+import json
 import logging
+import time
 import requests
-from typing import Optional, List
+from typing import Any, Dict, Optional, List
 from datetime import datetime
 
+from app import metrics, tracing
+from app.circuit_breaker import CircuitBreaker
+from app.llm import GenerationOptions, LLMBackend
+
 logger = logging.getLogger(__name__)
 
 
-class OllamaLLM:
+class OllamaLLM(LLMBackend):
     """Interface for interacting with Ollama local LLM."""
     
-    def __init__(self, host: str, model: str):
+    def __init__(
+        self,
+        host: str,
+        model: str,
+        timeout: float = 120.0,
+        connect_timeout: float = 5.0,
+        breaker: Optional[CircuitBreaker] = None,
+        default_options: Optional[Dict[str, Any]] = None,
+        keep_alive: Optional[str] = None,
+        name: str = "ollama"
+    ):
         """Initialize Ollama LLM client.
         
         Args:
             host: URL of Ollama service (e.g., http://localhost:11434)
             model: Name of the model to use (e.g., llama2, mistral)
+            timeout: Read timeout in seconds (gap between streamed chunks)
+            connect_timeout: Connect timeout in seconds
+            breaker: Circuit breaker guarding generation calls
+            default_options: Ollama options applied to every request unless
+                the request's own options set them (e.g. ``num_ctx``)
+            keep_alive: Default keep_alive for generation requests
+            name: Backend name used in routing, logs and metrics
         """
+        self.name = name
         self.host = host.rstrip('/')
         self.model = model
         self.generate_endpoint = f"{self.host}/api/generate"
         self.embed_endpoint = f"{self.host}/api/embed"
-        
+        self.timeout = (connect_timeout, timeout)
+        self.breaker = breaker or CircuitBreaker(name)
+        self.default_options = default_options or {}
+        self.keep_alive = keep_alive
+    
     def health_check(self) -> bool:
         """Check if Ollama service is available."""
         try:
@@ -31,12 +59,12 @@ class OllamaLLM:
             logger.error(f"Ollama health check failed: {e}")
             return False
     
+    @tracing.traced("llm.generate")
     def generate(
         self,
         prompt: str,
         system: Optional[str] = None,
-        temperature: float = 0.7,
-        max_tokens: int = 500,
+        options: Optional[GenerationOptions] = None,
         stream: bool = False
     ) -> str:
         """Generate text response from the model.
@@ -44,100 +72,134 @@ class OllamaLLM:
         Args:
             prompt: Input prompt for the model
             system: Optional system prompt/instructions
-            temperature: Sampling temperature (0-1)
-            max_tokens: Maximum tokens to generate
+            options: Generation options (defaults if omitted)
             stream: Whether to stream the response
-            
+        
         Returns:
             Generated text response
         """
-        payload = {
-            "model": self.model,
-            "prompt": prompt,
-            "temperature": temperature,
-            "num_predict": max_tokens,
-            "stream": stream
-        }
+        payload = self._build_payload(prompt, system, options, stream)
         
-        if system:
-            payload["system"] = system
+        self.breaker.before_call()
+        started = time.monotonic()
         
         try:
             response = requests.post(
                 self.generate_endpoint,
                 json=payload,
-                timeout=120
+                timeout=self.timeout
             )
             response.raise_for_status()
             
             if stream:
-                return response.text
+                result = response.text
             else:
                 data = response.json()
-                return data.get("response", "").strip()
-                
-        except requests.exceptions.RequestException as e:
+                metrics.observe_ollama_stats(data)
+                result = data.get("response", "").strip()
+        
+        except Exception as e:
+            # Any error (not only transport ones) must settle a half-open probe
+            self.breaker.record_failure()
             logger.error(f"Error calling Ollama generate: {e}")
             raise
+        
+        self.breaker.record_success(time.monotonic() - started)
+        return result
     
     def generate_stream(
         self,
         prompt: str,
         system: Optional[str] = None,
-        temperature: float = 0.7,
-        max_tokens: int = 500
+        options: Optional[GenerationOptions] = None
     ):
         """Generate text response as a stream.
         
         Args:
             prompt: Input prompt for the model
             system: Optional system prompt/instructions
-            temperature: Sampling temperature (0-1)
-            max_tokens: Maximum tokens to generate
-            
+            options: Generation options (defaults if omitted)
+        
         Yields:
             Response chunks as they are generated
         """
-        payload = {
-            "model": self.model,
-            "prompt": prompt,
-            "temperature": temperature,
-            "num_predict": max_tokens,
-            "stream": True
-        }
+        payload = self._build_payload(prompt, system, options, True)
         
-        if system:
-            payload["system"] = system
+        self.breaker.before_call()
+        started = time.monotonic()
+        time_to_first_chunk = None
+        failed = False
+        # Not made current: the generator is resumed from different threads
+        trace_span = tracing.start_span("llm.generate_stream", model=self.model)
         
         try:
-            response = requests.post(
+            with requests.post(
                 self.generate_endpoint,
                 json=payload,
                 stream=True,
-                timeout=120
-            )
-            response.raise_for_status()
-            
-            for line in response.iter_lines():
-                if line:
-                    import json
-                    try:
-                        data = json.loads(line)
-                        if "response" in data:
+                timeout=self.timeout
+            ) as response:
+                response.raise_for_status()
+                
+                for line in response.iter_lines():
+                    if line:
+                        try:
+                            data = json.loads(line)
+                        except json.JSONDecodeError:
+                            continue
+                        if data.get("done"):
+                            metrics.observe_ollama_stats(data)
+                        if data.get("response"):
+                            if time_to_first_chunk is None:
+                                time_to_first_chunk = time.monotonic() - started
                             yield data["response"]
-                    except json.JSONDecodeError:
-                        continue
-                        
-        except requests.exceptions.RequestException as e:
+        
+        except Exception as e:
+            failed = True
+            self.breaker.record_failure()
+            trace_span.record_error(e)
             logger.error(f"Error calling Ollama generate stream: {e}")
             raise
+        finally:
+            if time_to_first_chunk is not None:
+                trace_span.set_attribute("llm.time_to_first_chunk_ms", round(time_to_first_chunk * 1000, 1))
+            trace_span.end()
+            # Slow-call detection for streams uses time to first chunk
+            if not failed:
+                self.breaker.record_success(
+                    time_to_first_chunk if time_to_first_chunk is not None
+                    else time.monotonic() - started
+                )
+    
+    def _build_payload(
+        self,
+        prompt: str,
+        system: Optional[str],
+        options: Optional[GenerationOptions],
+        stream: bool
+    ) -> Dict[str, Any]:
+        """Assemble an ``/api/generate`` request body."""
+        options = options or GenerationOptions()
+        payload = {
+            "model": self.model,
+            "prompt": prompt,
+            "options": {**self.default_options, **options.to_options()},
+            "stream": stream
+        }
+        
+        if system:
+            payload["system"] = system
+        keep_alive = options.keep_alive or self.keep_alive
+        if keep_alive:
+            payload["keep_alive"] = keep_alive
+        return payload
     
     def embed(self, text: str) -> List[float]:
         """Generate embeddings for text.
         
         Args:
             text: Text to embed
-            
+        
         Returns:
             Embedding vector
         """
@@ -160,7 +222,7 @@ class OllamaLLM:
                 return data["embeddings"][0]
             
             raise ValueError("No embeddings returned from Ollama")
-            
+        
         except requests.exceptions.RequestException as e:
             logger.error(f"Error calling Ollama embed: {e}")
             raise
@@ -174,7 +236,7 @@ class OllamaLLM:
             data = response.json()
             models = [model["name"] for model in data.get("models", [])]
             return models
-            
+        
         except requests.exceptions.RequestException as e:
             logger.error(f"Error listing Ollama models: {e}")
             return []
@@ -184,7 +246,7 @@ class OllamaLLM:
         
         Args:
             model: Model name to pull
-            
+        
         Returns:
             True if successful, False otherwise
         """
@@ -199,7 +261,7 @@ class OllamaLLM:
             response.raise_for_status()
             logger.info(f"Successfully pulled model: {model}")
             return True
-            
+        
         except requests.exceptions.RequestException as e:
             logger.error(f"Error pulling Ollama model {model}: {e}")
             return False
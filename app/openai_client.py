@@ -0,0 +1,213 @@
+"""OpenAI-compatible chat completions backend.
+
+Works with any server exposing ``/v1/chat/completions`` and ``/v1/models``:
+Groq, vLLM, the llama.cpp server, LM Studio, OpenAI itself.
+"""
+import json
+import logging
+import time
+import requests
+from typing import Any, Dict, Iterator, List, Optional
+
+from app import metrics, tracing
+from app.circuit_breaker import CircuitBreaker
+from app.llm import GenerationOptions, LLMBackend
+
+logger = logging.getLogger(__name__)
+
+# The OpenAI API rejects requests with more stop sequences than this
+MAX_STOP_SEQUENCES = 4
+
+
+class OpenAICompatibleLLM(LLMBackend):
+    """Client for an OpenAI-compatible chat completions API."""
+    
+    def __init__(
+        self,
+        base_url: str,
+        model: str,
+        api_key: str = "",
+        timeout: float = 60.0,
+        connect_timeout: float = 5.0,
+        breaker: Optional[CircuitBreaker] = None,
+        name: str = "openai"
+    ):
+        """Initialize client.
+        
+        Args:
+            base_url: API base URL including the version prefix
+                (e.g. https://api.groq.com/openai/v1, http://vllm:8000/v1)
+            model: Model name
+            api_key: Bearer token; empty for local servers without auth
+            timeout: Read timeout in seconds (gap between streamed chunks)
+            connect_timeout: Connect timeout in seconds
+            breaker: Circuit breaker guarding generation calls
+            name: Backend name used in routing, logs and metrics
+        """
+        self.name = name
+        self.base_url = base_url.rstrip('/')
+        self.model = model
+        self.completions_endpoint = f"{self.base_url}/chat/completions"
+        self.timeout = (connect_timeout, timeout)
+        self.breaker = breaker or CircuitBreaker(name)
+        self.session = requests.Session()
+        if api_key:
+            self.session.headers["Authorization"] = f"Bearer {api_key}"
+    
+    def health_check(self) -> bool:
+        """Check if the API is available."""
+        try:
+            response = self.session.get(f"{self.base_url}/models", timeout=5)
+            return response.status_code == 200
+        except Exception as e:
+            logger.error(f"{self.name} health check failed: {e}")
+            return False
+    
+    @tracing.traced("llm.generate")
+    def generate(
+        self,
+        prompt: str,
+        system: Optional[str] = None,
+        options: Optional[GenerationOptions] = None
+    ) -> str:
+        """Generate a complete response.
+        
+        Args:
+            prompt: Input prompt (the conversation transcript)
+            system: Optional system prompt
+            options: Generation options (defaults if omitted)
+        
+        Returns:
+            Generated text
+        """
+        payload = self._build_payload(prompt, system, options, stream=False)
+        
+        self.breaker.before_call()
+        started = time.monotonic()
+        
+        try:
+            response = self.session.post(self.completions_endpoint, json=payload, timeout=self.timeout)
+            response.raise_for_status()
+            data = response.json()
+            result = (data["choices"][0]["message"].get("content") or "").strip()
+        except Exception as e:
+            self.breaker.record_failure()
+            logger.error(f"Error calling {self.name} chat completions: {e}")
+            raise
+        
+        self.breaker.record_success(time.monotonic() - started)
+        _observe_usage(data.get("usage"), time.monotonic() - started)
+        return result
+    
+    def generate_stream(
+        self,
+        prompt: str,
+        system: Optional[str] = None,
+        options: Optional[GenerationOptions] = None
+    ) -> Iterator[str]:
+        """Generate a response as a stream of text chunks.
+        
+        Args:
+            prompt: Input prompt (the conversation transcript)
+            system: Optional system prompt
+            options: Generation options (defaults if omitted)
+        
+        Yields:
+            Response chunks as they are generated
+        """
+        payload = self._build_payload(prompt, system, options, stream=True)
+        
+        self.breaker.before_call()
+        started = time.monotonic()
+        time_to_first_chunk = None
+        failed = False
+        # Not made current: the generator is resumed from different threads
+        trace_span = tracing.start_span("llm.generate_stream", model=self.model, backend=self.name)
+        
+        try:
+            with self.session.post(
+                self.completions_endpoint,
+                json=payload,
+                stream=True,
+                timeout=self.timeout
+            ) as response:
+                response.raise_for_status()
+                
+                for line in response.iter_lines():
+                    if not line.startswith(b"data:"):
+                        continue
+                    data = line[5:].strip()
+                    if data == b"[DONE]":
+                        break
+                    try:
+                        event = json.loads(data)
+                    except json.JSONDecodeError:
+                        continue
+                    if event.get("usage"):
+                        _observe_usage(event["usage"], time.monotonic() - started)
+                    for choice in event.get("choices", []):
+                        content = (choice.get("delta") or {}).get("content")
+                        if content:
+                            if time_to_first_chunk is None:
+                                time_to_first_chunk = time.monotonic() - started
+                            yield content
+        
+        except Exception as e:
+            failed = True
+            self.breaker.record_failure()
+            trace_span.record_error(e)
+            logger.error(f"Error calling {self.name} chat completions stream: {e}")
+            raise
+        finally:
+            if time_to_first_chunk is not None:
+                trace_span.set_attribute("llm.time_to_first_chunk_ms", round(time_to_first_chunk * 1000, 1))
+            trace_span.end()
+            # Slow-call detection for streams uses time to first chunk
+            if not failed:
+                self.breaker.record_success(
+                    time_to_first_chunk if time_to_first_chunk is not None
+                    else time.monotonic() - started
+                )
+    
+    def _build_payload(
+        self,
+        prompt: str,
+        system: Optional[str],
+        options: Optional[GenerationOptions],
+        stream: bool
+    ) -> Dict[str, Any]:
+        """Assemble a chat completions request body.
+        
+        The prompt is already a formatted transcript, so it is sent as a
+        single user message. ``num_ctx``, ``num_thread`` and ``keep_alive``
+        are server-side settings for these APIs and are not sent.
+        """
+        options = options or GenerationOptions()
+        messages: List[Dict[str, str]] = []
+        if system:
+            messages.append({"role": "system", "content": system})
+        messages.append({"role": "user", "content": prompt})
+        
+        payload: Dict[str, Any] = {
+            "model": self.model,
+            "messages": messages,
+            "temperature": options.temperature,
+            "max_tokens": options.num_predict,
+            "stream": stream
+        }
+        if options.stop:
+            payload["stop"] = options.stop[:MAX_STOP_SEQUENCES]
+        if options.seed is not None:
+            payload["seed"] = options.seed
+        return payload
+
+
+def _observe_usage(usage: Optional[Dict[str, Any]], duration: float) -> None:
+    """Record generated tokens and speed from a response's ``usage`` block."""
+    if not usage:
+        return
+    completion_tokens = usage.get("completion_tokens")
+    if completion_tokens:
+        metrics.GENERATED_TOKENS.inc(completion_tokens)
+        if duration > 0:
+            metrics.TOKENS_PER_SECOND.observe(completion_tokens / duration)
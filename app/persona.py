@@ -1,9 +1,11 @@
 """Persona and system prompt management."""
 import logging
-import yaml
 from typing import Optional, Dict, Any
 from pathlib import Path
 
+from app.llm import GenerationOptions
+from app.tracing import traced
+
 logger = logging.getLogger(__name__)
 
 
@@ -22,6 +24,8 @@ class PersonaManager:
     
     def _load_personas(self) -> None:
         """Load personas from YAML file."""
+        import yaml  # only needed at start-up, keep it off the import path
+        
         try:
             personas_path = Path(self.personas_file)
             if not personas_path.exists():
@@ -47,6 +51,7 @@ class PersonaManager:
         """
         return self.personas.get(persona_key)
     
+    @traced("persona.get_system_prompt")
     def get_system_prompt(self, persona_key: str) -> str:
         """Get system prompt for persona.
         
@@ -63,6 +68,7 @@ class PersonaManager:
         
         return persona.get("system_prompt", "")
     
+    @traced("persona.get_persona_info")
     def get_persona_info(self, persona_key: str) -> Dict[str, Any]:
         """Get full persona information.
         
@@ -85,6 +91,33 @@ class PersonaManager:
             "tags": persona.get("system_tags", [])
         }
     
+    def get_generation_options(self, persona_key: str) -> GenerationOptions:
+        """Get generation options for persona.
+        
+        Uses the persona's ``temperature`` and ``max_tokens`` plus any of
+        ``num_ctx``, ``stop``, ``num_thread``, ``seed`` and ``keep_alive``
+        it sets; the rest keep their defaults.
+        
+        Args:
+            persona_key: Persona identifier
+            
+        Returns:
+            Generation options (defaults for an unknown persona)
+        """
+        return GenerationOptions.from_config(self.get_persona(persona_key) or {})
+    
+    def get_backend(self, persona_key: str) -> Optional[str]:
+        """Get the LLM backend a persona is pinned to.
+        
+        Args:
+            persona_key: Persona identifier
+            
+        Returns:
+            Backend name, or None to use the default backend
+        """
+        persona = self.get_persona(persona_key) or {}
+        return persona.get("backend")
+    
     def list_personas(self) -> list:
         """List all available personas.
         
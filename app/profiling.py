@@ -0,0 +1,315 @@
+"""Runtime profiling hooks for the running worker process.
+
+Three independent tools, all toggled at runtime through admin endpoints:
+
+- a stack sampler (stdlib only) that snapshots every thread's stack at a
+  fixed interval and reports collapsed stacks for flame graphs
+- cProfile around a sampled fraction of HTTP requests, reported as pstats
+- tracemalloc allocation tracking with top allocation sites and net
+  allocation per endpoint
+
+State is per process; with several workers each one is profiled separately.
+"""
+import cProfile
+import io
+import logging
+import os
+import pstats
+import random
+import sys
+import tempfile
+import threading
+import tracemalloc
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class StackSampler:
+    """Samples all thread stacks periodically into collapsed-stack counts."""
+    
+    def __init__(self, interval: float = 0.01):
+        """Initialize sampler.
+        
+        Args:
+            interval: Seconds between samples
+        """
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+    
+    @property
+    def running(self) -> bool:
+        """Whether the sampler thread is active."""
+        return self._thread is not None and self._thread.is_alive()
+    
+    def start(self) -> None:
+        """Start sampling in a daemon thread."""
+        self.samples.clear()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+    
+    def stop(self) -> str:
+        """Stop sampling.
+        
+        Returns:
+            Collapsed stacks (``frame;frame;frame count`` per line)
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        return self.collapsed()
+    
+    def collapsed(self) -> str:
+        """Render collected samples in collapsed-stack format."""
+        return "\n".join(f"{stack} {count}" for stack, count in self.samples.most_common()) + "\n"
+    
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                self.samples[_collapse(frame)] += 1
+
+
+class RequestProfiler:
+    """Runs cProfile around a sampled fraction of requests.
+    
+    Only one request is profiled at a time. Because the profiler hooks the
+    event loop thread, other coroutines that run while the sampled request
+    is awaiting are included as well.
+    """
+    
+    def __init__(self, sample_rate: float = 0.1):
+        """Initialize request profiler.
+        
+        Args:
+            sample_rate: Fraction of requests to profile (0-1)
+        """
+        self.sample_rate = sample_rate
+        self.profile = cProfile.Profile()
+        self.profiled_requests = 0
+        self._busy = threading.Lock()
+    
+    def should_profile(self) -> bool:
+        """Decide whether to profile the next request and reserve the profiler."""
+        if random.random() >= self.sample_rate:
+            return False
+        return self._busy.acquire(blocking=False)
+    
+    def enable(self) -> None:
+        """Start profiling the reserved request."""
+        self.profile.enable()
+    
+    def disable(self) -> None:
+        """Stop profiling and release the profiler."""
+        self.profile.disable()
+        self.profiled_requests += 1
+        self._busy.release()
+    
+    def report(self, limit: int = 50, sort: str = "cumulative") -> str:
+        """Get a pstats text report.
+        
+        Args:
+            limit: Number of functions to list
+            sort: pstats sort key
+        
+        Returns:
+            Report text
+        """
+        out = io.StringIO()
+        try:
+            stats = pstats.Stats(self.profile, stream=out)
+        except TypeError:
+            return "No requests profiled\n"
+        stats.sort_stats(sort).print_stats(limit)
+        return f"Profiled requests: {self.profiled_requests}\n" + out.getvalue()
+    
+    def dump(self) -> bytes:
+        """Get raw pstats data loadable with ``pstats.Stats(path)``."""
+        fd, path = tempfile.mkstemp(suffix=".pstats")
+        os.close(fd)
+        try:
+            self.profile.dump_stats(path)
+            with open(path, "rb") as f:
+                return f.read()
+        finally:
+            os.unlink(path)
+
+
+class AllocationTracker:
+    """tracemalloc snapshots plus net allocation per endpoint."""
+    
+    def __init__(self, frames: int = 10):
+        """Initialize tracker.
+        
+        Args:
+            frames: Stack depth recorded per allocation
+        """
+        self.frames = frames
+        self.baseline: Optional[tracemalloc.Snapshot] = None
+        self.endpoints: Dict[str, Dict[str, float]] = {}
+    
+    def start(self) -> None:
+        """Start tracing allocations and take a baseline snapshot."""
+        tracemalloc.start(self.frames)
+        self.baseline = tracemalloc.take_snapshot()
+        self.endpoints.clear()
+    
+    def stop(self) -> None:
+        """Stop tracing allocations."""
+        tracemalloc.stop()
+        self.baseline = None
+    
+    def record(self, endpoint: str, allocated: int) -> None:
+        """Add a request's net allocation to its endpoint's totals."""
+        stats = self.endpoints.setdefault(endpoint, {"requests": 0, "net_bytes": 0})
+        stats["requests"] += 1
+        stats["net_bytes"] += allocated
+    
+    def report(self, limit: int = 20) -> Dict[str, Any]:
+        """Get top allocation sites (vs. the baseline) and per-endpoint totals.
+        
+        Args:
+            limit: Number of allocation sites to return
+        
+        Returns:
+            Report dictionary
+        """
+        snapshot = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+        ])
+        if self.baseline is not None:
+            stats = snapshot.compare_to(self.baseline, "lineno")
+            top = [
+                {"site": str(s.traceback), "size_diff": s.size_diff, "count_diff": s.count_diff}
+                for s in stats[:limit]
+            ]
+        else:
+            top = [
+                {"site": str(s.traceback), "size": s.size, "count": s.count}
+                for s in snapshot.statistics("lineno")[:limit]
+            ]
+        
+        current, peak = tracemalloc.get_traced_memory()
+        endpoints = {
+            name: {
+                "requests": stats["requests"],
+                "avg_net_bytes": round(stats["net_bytes"] / max(stats["requests"], 1))
+            }
+            for name, stats in sorted(self.endpoints.items())
+        }
+        return {"traced_bytes": current, "peak_bytes": peak, "top": top, "endpoints": endpoints}
+
+
+class RuntimeProfiler:
+    """Holds this process's profiling state."""
+    
+    def __init__(self):
+        """Initialize with all profiling off."""
+        self.sampler: Optional[StackSampler] = None
+        self.requests: Optional[RequestProfiler] = None
+        self.allocations: Optional[AllocationTracker] = None
+    
+    def start(self, mode: str, interval: float = 0.01, sample_rate: float = 0.1) -> None:
+        """Start CPU profiling.
+        
+        Args:
+            mode: ``sampling`` (stack sampler) or ``cprofile`` (per-request)
+            interval: Sampler interval in seconds
+            sample_rate: Fraction of requests profiled in cprofile mode
+        
+        Raises:
+            ValueError: For an unknown mode
+            RuntimeError: If CPU profiling is already running
+        """
+        if self.sampler or self.requests:
+            raise RuntimeError("Profiling already running")
+        if mode == "sampling":
+            self.sampler = StackSampler(interval)
+            self.sampler.start()
+        elif mode == "cprofile":
+            self.requests = RequestProfiler(sample_rate)
+        else:
+            raise ValueError(f"Unknown profiling mode: {mode}")
+        logger.info(f"Started {mode} profiling")
+    
+    def stop(self, raw: bool = False):
+        """Stop CPU profiling and return its report.
+        
+        Args:
+            raw: Return binary pstats data instead of text (cprofile mode)
+        
+        Returns:
+            Collapsed stacks, pstats text, or pstats bytes
+        
+        Raises:
+            RuntimeError: If CPU profiling is not running
+        """
+        if self.sampler:
+            sampler, self.sampler = self.sampler, None
+            return sampler.stop()
+        if self.requests:
+            requests, self.requests = self.requests, None
+            return requests.dump() if raw else requests.report()
+        raise RuntimeError("Profiling not running")
+    
+    def status(self) -> Dict[str, Any]:
+        """Get which profilers are active."""
+        return {
+            "sampling": self.sampler is not None,
+            "cprofile": self.requests is not None,
+            "tracemalloc": self.allocations is not None
+        }
+
+
+class ProfilingMiddleware:
+    """ASGI middleware applying request profiling and allocation tracking."""
+    
+    def __init__(self, app, profiler: RuntimeProfiler):
+        """Initialize middleware.
+        
+        Args:
+            app: Wrapped ASGI application
+            profiler: Process profiling state
+        """
+        self.app = app
+        self.profiler = profiler
+    
+    async def __call__(self, scope, receive, send):
+        requests = self.profiler.requests
+        allocations = self.profiler.allocations
+        
+        if scope["type"] != "http" or (requests is None and allocations is None):
+            await self.app(scope, receive, send)
+            return
+        
+        profiled = requests is not None and requests.should_profile()
+        before = tracemalloc.get_traced_memory()[0] if allocations is not None else 0
+        if profiled:
+            requests.enable()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            if profiled:
+                requests.disable()
+            if allocations is not None and tracemalloc.is_tracing():
+                endpoint = scope.get("endpoint")
+                name = getattr(endpoint, "__name__", scope["path"])
+                allocations.record(name, tracemalloc.get_traced_memory()[0] - before)
+
+
+def _collapse(frame) -> str:
+    """Render a frame's stack root-first as ``file:function`` entries."""
+    entries: List[str] = []
+    while frame is not None:
+        code = frame.f_code
+        entries.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(entries))
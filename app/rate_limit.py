@@ -0,0 +1,232 @@
+"""Per-user rate limiting and daily generated-token quotas.
+
+Before a chat turn, ``RateLimiter.check`` runs one Lua script atomically in
+Redis:
+
+- Daily quotas: tokens generated today (UTC) for the user
+  (``DAILY_TOKEN_QUOTA``), and for the user with the turn's persona
+  (``PERSONA_DAILY_TOKEN_QUOTAS``). A used-up quota refuses turns until
+  midnight UTC.
+- Token bucket: each user can send ``RATE_LIMIT_BURST`` messages at once,
+  refilled at ``RATE_LIMIT_PER_MINUTE``. A turn takes one.
+
+After the reply, ``RateLimiter.charge`` adds its tokens to the quotas. A
+user's turns run one at a time, so a quota is overshot by at most one reply.
+All keys carry the user's hash tag, so the script touches a single slot.
+"""
+import logging
+import math
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+from redis import Redis
+from redis.exceptions import RedisError
+
+from app import keys, metrics
+from app.redis_client import node_for_key, register_script
+
+logger = logging.getLogger(__name__)
+
+# Backends do not report token counts per call, so replies are charged by length
+CHARS_PER_TOKEN = 4
+
+# KEYS: bucket, then quota counters. ARGV: now, refill rate (per second),
+# burst, then one limit per quota counter.
+# Returns {allowed, reason, requests left, retry after, used per quota...}
+CHECK_SCRIPT = """
+local now = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local burst = tonumber(ARGV[3])
+
+local used = {}
+local exhausted = false
+for i = 2, #KEYS do
+    used[i - 1] = tonumber(redis.call('GET', KEYS[i]) or '0')
+    if used[i - 1] >= tonumber(ARGV[i + 2]) then
+        exhausted = true
+    end
+end
+if exhausted then
+    return {0, 'quota', '0', '0', unpack(used)}
+end
+
+local tokens = burst
+if rate > 0 then
+    local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+    tokens = tonumber(state[1]) or burst
+    local elapsed = math.max(0, now - (tonumber(state[2]) or now))
+    tokens = math.min(burst, tokens + elapsed * rate)
+    if tokens < 1 then
+        return {0, 'rate', tostring(tokens), tostring((1 - tokens) / rate), unpack(used)}
+    end
+    tokens = tokens - 1
+    redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+    redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+end
+return {1, '', tostring(tokens), '0', unpack(used)}
+"""
+
+
+@dataclass
+class RateLimitResult:
+    """Outcome of a rate limit and quota check."""
+    
+    allowed: bool
+    reason: str = ""  # "rate" or "quota" when refused
+    retry_after: float = 0.0
+    remaining_requests: Optional[int] = None
+    remaining_tokens: Optional[int] = None  # Smallest remaining daily quota
+    
+    def headers(self) -> Dict[str, str]:
+        """Response headers describing the remaining allowance."""
+        headers = {}
+        if self.remaining_requests is not None:
+            headers["X-RateLimit-Remaining"] = str(self.remaining_requests)
+        if self.remaining_tokens is not None:
+            headers["X-Quota-Remaining"] = str(self.remaining_tokens)
+        if not self.allowed:
+            headers["Retry-After"] = str(max(math.ceil(self.retry_after), 1))
+        return headers
+    
+    @property
+    def message(self) -> str:
+        """Human-readable reason for a refusal."""
+        if self.reason == "quota":
+            return "Daily token quota exhausted"
+        return "Too many messages, slow down"
+
+
+class RateLimiter:
+    """Token-bucket rate limiting and daily token quotas per user."""
+    
+    def __init__(
+        self,
+        redis_client: Redis,
+        per_minute: float = 30.0,
+        burst: int = 10,
+        daily_tokens: int = 0,
+        persona_tokens: Optional[Dict[str, int]] = None,
+        clock: Callable[[], float] = time.time
+    ):
+        """Initialize rate limiter.
+        
+        Args:
+            redis_client: Redis client instance
+            per_minute: Messages per user per minute; 0 disables rate limiting
+            burst: Messages a user may send at once
+            daily_tokens: Generated tokens per user per UTC day; 0 for no quota
+            persona_tokens: Generated tokens per user per UTC day by persona
+            clock: Wall clock in seconds (for tests)
+        """
+        self.redis = redis_client
+        self.rate = per_minute / 60.0
+        self.burst = burst
+        self.daily_tokens = daily_tokens
+        self.persona_tokens = persona_tokens or {}
+        self.clock = clock
+        self._script = register_script(redis_client, CHECK_SCRIPT)
+    
+    def check(self, user_id: str, persona: Optional[str] = None) -> RateLimitResult:
+        """Take a message from the user's bucket unless a limit is reached.
+        
+        Redis errors are logged and the message is allowed.
+        
+        Args:
+            user_id: User identifier
+            persona: Persona the turn uses, for persona quotas
+        
+        Returns:
+            Whether the turn may run, and the remaining allowance
+        """
+        now = self.clock()
+        quotas = self._quotas(user_id, persona, now)
+        if self.rate <= 0 and not quotas:
+            return RateLimitResult(True)
+        
+        bucket_key = keys.rate_limit_key(user_id)
+        try:
+            values = self._script(
+                keys=[bucket_key] + [key for key, _ in quotas],
+                args=[now, self.rate, self.burst] + [limit for _, limit in quotas],
+                client=node_for_key(self.redis, bucket_key)
+            )
+        except RedisError as e:
+            logger.warning(f"Rate limit check failed for {user_id}, allowing: {e}")
+            return RateLimitResult(True)
+        
+        allowed, reason, requests_left, retry_after = values[0], _text(values[1]), values[2], values[3]
+        used = values[4:]
+        result = RateLimitResult(
+            allowed=bool(allowed),
+            reason=reason,
+            retry_after=float(retry_after),
+            remaining_requests=int(float(requests_left)) if self.rate > 0 else None,
+            remaining_tokens=min(max(limit - int(spent), 0) for (_, limit), spent in zip(quotas, used)) if quotas else None
+        )
+        if reason == "quota":
+            result.retry_after = _seconds_to_midnight(now)
+        if not result.allowed:
+            metrics.RATE_LIMITED.labels(reason=reason).inc()
+        return result
+    
+    def charge(self, user_id: str, persona: Optional[str], tokens: int) -> None:
+        """Add generated tokens to the user's daily quotas.
+        
+        Args:
+            user_id: User identifier
+            persona: Persona the reply was generated with
+            tokens: Tokens generated
+        """
+        now = self.clock()
+        quotas = self._quotas(user_id, persona, now)
+        if not quotas or tokens <= 0:
+            return
+        
+        ttl = int(_seconds_to_midnight(now)) + 3600
+        try:
+            pipe = node_for_key(self.redis, quotas[0][0]).pipeline()
+            for key, _ in quotas:
+                pipe.incrby(key, tokens)
+                pipe.expire(key, ttl)
+            pipe.execute()
+        except RedisError as e:
+            logger.warning(f"Could not charge {tokens} tokens to {user_id}: {e}")
+    
+    def _quotas(self, user_id: str, persona: Optional[str], now: float) -> List[Tuple[str, int]]:
+        """Quota counter keys and limits that apply to a turn."""
+        day = time.strftime("%Y%m%d", time.gmtime(now))
+        quotas = []
+        if self.daily_tokens > 0:
+            quotas.append((keys.token_quota_key(user_id, day), self.daily_tokens))
+        if persona and self.persona_tokens.get(persona, 0) > 0:
+            quotas.append((keys.token_quota_key(user_id, day, persona), self.persona_tokens[persona]))
+        return quotas
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate the number of tokens in generated text."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def create_rate_limiter(settings, redis_client: Redis) -> Optional[RateLimiter]:
+    """Build the rate limiter from settings, or None if every limit is off."""
+    persona_tokens = settings.persona_daily_token_quota_map
+    if settings.rate_limit_per_minute <= 0 and settings.daily_token_quota <= 0 and not persona_tokens:
+        return None
+    return RateLimiter(
+        redis_client,
+        per_minute=settings.rate_limit_per_minute,
+        burst=settings.rate_limit_burst,
+        daily_tokens=settings.daily_token_quota,
+        persona_tokens=persona_tokens
+    )
+
+
+def _seconds_to_midnight(now: float) -> float:
+    """Seconds until the next UTC midnight."""
+    return 86400 - now % 86400
+
+
+def _text(value) -> str:
+    return value.decode() if isinstance(value, bytes) else value
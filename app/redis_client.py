@@ -0,0 +1,338 @@
+"""Redis client construction for standalone, cluster and sharded layouts."""
+import bisect
+import hashlib
+import logging
+from typing import Any, Dict, Iterator, List
+
+from redis import BlockingConnectionPool, Redis
+from redis.backoff import ExponentialBackoff
+from redis.cluster import RedisCluster
+from redis.commands.core import Script
+from redis.exceptions import ConnectionError, TimeoutError
+from redis.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+
+def create_redis_client(settings) -> Any:
+    """Create the Redis client described by the settings.
+    
+    - ``redis_cluster=True``: a ``RedisCluster`` seeded from the first URL
+    - several ``redis_urls``: a ``ShardedRedis`` using consistent hashing
+    - otherwise: a plain ``Redis`` client
+    
+    Args:
+        settings: Application settings
+    
+    Returns:
+        Redis-compatible client
+    """
+    urls = settings.redis_url_list
+    options = _connection_options(settings)
+    
+    if settings.redis_cluster:
+        logger.info(f"Using Redis Cluster via {urls[0]}")
+        return RedisCluster.from_url(
+            urls[0],
+            max_connections=settings.redis_max_connections,
+            **options
+        )
+    
+    clients = [
+        Redis(connection_pool=BlockingConnectionPool.from_url(
+            url,
+            max_connections=settings.redis_max_connections,
+            timeout=settings.redis_pool_timeout,
+            retry_on_error=[ConnectionError, TimeoutError],
+            **options
+        ))
+        for url in urls
+    ]
+    
+    if len(clients) > 1:
+        logger.info(f"Using client-side sharding across {len(clients)} Redis instances")
+        return ShardedRedis(clients)
+    
+    return clients[0]
+
+
+def _connection_options(settings) -> Dict[str, Any]:
+    """Connection keyword arguments shared by every client type."""
+    return {
+        "decode_responses": True,
+        "socket_timeout": settings.redis_socket_timeout,
+        "socket_connect_timeout": settings.redis_socket_connect_timeout,
+        "health_check_interval": settings.redis_health_check_interval,
+        "retry": Retry(
+            ExponentialBackoff(
+                cap=settings.redis_retry_backoff_cap,
+                base=settings.redis_retry_backoff_base
+            ),
+            settings.redis_retry_attempts
+        )
+    }
+
+
+def pool_stats(client) -> Dict[str, int]:
+    """Get connection pool utilization for a client.
+    
+    Sums over every node for sharded and cluster clients.
+    
+    Args:
+        client: Client returned by ``create_redis_client``
+    
+    Returns:
+        Dictionary with max, created, in_use and idle connection counts
+    """
+    stats = {"max": 0, "created": 0, "in_use": 0, "idle": 0}
+    
+    for pool in _connection_pools(client):
+        created, idle = _pool_counts(pool)
+        stats["max"] += pool.max_connections
+        stats["created"] += created
+        stats["idle"] += idle
+        stats["in_use"] += created - idle
+    
+    return stats
+
+
+def _connection_pools(client) -> List[Any]:
+    """Collect the connection pools behind a client."""
+    if isinstance(client, ShardedRedis):
+        return [node.connection_pool for node in client.nodes]
+    if isinstance(client, RedisCluster):
+        return [
+            node.redis_connection.connection_pool
+            for node in client.get_nodes()
+            if node.redis_connection is not None
+        ]
+    return [client.connection_pool]
+
+
+def _pool_counts(pool) -> tuple:
+    """Return (created, idle) connection counts for a pool."""
+    if isinstance(pool, BlockingConnectionPool):
+        created = len(pool._connections)
+        idle = sum(1 for conn in list(pool.pool.queue) if conn is not None)
+        return created, idle
+    return pool._created_connections, len(pool._available_connections)
+
+
+def hash_slot_key(key: str) -> str:
+    """Get the part of a key that decides its placement.
+    
+    Follows the Redis Cluster rule: if the key contains ``{...}`` with a
+    non-empty body, only that body is hashed.
+    
+    Args:
+        key: Redis key
+    
+    Returns:
+        Hash tag body, or the whole key
+    """
+    start = key.find("{")
+    if start != -1:
+        end = key.find("}", start + 1)
+        if end > start + 1:
+            return key[start + 1:end]
+    return key
+
+
+# Commands whose first argument is their only key
+KEY_COMMANDS = frozenset({
+    "get", "set", "setex", "setnx", "psetex", "getset", "getdel", "getex",
+    "incr", "incrby", "incrbyfloat", "decr", "decrby", "append", "strlen",
+    "expire", "pexpire", "expireat", "pexpireat", "ttl", "pttl", "persist", "type",
+    "lpush", "rpush", "lpop", "rpop", "lrange", "llen", "ltrim", "lindex", "lset", "lrem",
+    "hset", "hget", "hmget", "hgetall", "hdel", "hincrby", "hexists", "hlen", "hkeys", "hvals",
+    "sadd", "srem", "smembers", "sismember", "scard",
+    "zadd", "zrem", "zrange", "zrevrange", "zrangebyscore", "zscore", "zcard", "zincrby",
+    "zremrangebyscore",
+    "xadd", "xrange", "xrevrange", "xlen", "xtrim", "xdel",
+    "memory_usage",
+})
+
+# Commands whose positional arguments are all keys; the keys must share a node
+MULTI_KEY_COMMANDS = frozenset({"delete", "unlink", "exists", "touch", "mget"})
+
+
+class ShardedRedis:
+    """Client-side consistent hashing across several Redis instances.
+    
+    Single-key commands (and multi-key commands whose keys share a hash tag)
+    are routed by their key. Pipelines are split per node and results are
+    returned in command order. SCAN, PING and CLOSE fan out to all nodes.
+    
+    Anything else (scripts, WATCH/MULTI, XREAD, server commands) raises a
+    ``TypeError``; run it on ``get_node(key)`` instead.
+    """
+    
+    def __init__(self, nodes: List[Redis], replicas: int = 160):
+        """Initialize sharded client.
+        
+        Args:
+            nodes: One client per Redis instance
+            replicas: Virtual nodes per instance on the hash ring
+        """
+        if not nodes:
+            raise ValueError("ShardedRedis needs at least one node")
+        
+        self.nodes = nodes
+        self._ring: List[int] = []
+        self._ring_nodes: Dict[int, Redis] = {}
+        
+        for index, node in enumerate(nodes):
+            for replica in range(replicas):
+                point = self._hash(f"node-{index}-{replica}")
+                self._ring_nodes[point] = node
+                bisect.insort(self._ring, point)
+    
+    @staticmethod
+    def _hash(value: str) -> int:
+        """Map a string onto the hash ring."""
+        return int.from_bytes(hashlib.md5(value.encode()).digest()[:8], "big")
+    
+    def get_node(self, key) -> Redis:
+        """Get the node owning a key.
+        
+        Args:
+            key: Redis key (str or bytes)
+        
+        Returns:
+            Client for the owning node
+        """
+        if isinstance(key, bytes):
+            key = key.decode()
+        point = self._hash(hash_slot_key(key))
+        index = bisect.bisect(self._ring, point) % len(self._ring)
+        return self._ring_nodes[self._ring[index]]
+    
+    def route(self, name: str, args: tuple) -> Redis:
+        """Get the node a command must run on.
+        
+        Args:
+            name: Command (client method) name
+            args: Positional arguments of the command
+        
+        Returns:
+            Client for the node owning the command's keys
+        
+        Raises:
+            TypeError: If the command has no key to route by, or its keys
+                live on different nodes
+        """
+        if name not in KEY_COMMANDS and name not in MULTI_KEY_COMMANDS:
+            raise TypeError(f"ShardedRedis cannot shard '{name}'; run it on get_node(key)")
+        if not args:
+            raise TypeError(f"ShardedRedis cannot route '{name}' without a key")
+        
+        node = self.get_node(args[0])
+        if name in MULTI_KEY_COMMANDS and any(self.get_node(key) is not node for key in args[1:]):
+            raise TypeError(f"ShardedRedis cannot run '{name}' on keys owned by different nodes")
+        return node
+    
+    def __getattr__(self, name: str):
+        """Route a key command by its key argument."""
+        if name.startswith("_"):
+            raise AttributeError(name)
+        
+        def command(*args, **kwargs):
+            return getattr(self.route(name, args), name)(*args, **kwargs)
+        return command
+    
+    def pipeline(self, transaction: bool = True) -> "ShardedPipeline":
+        """Create a pipeline that is split per node on execute."""
+        return ShardedPipeline(self, transaction)
+    
+    def scan_iter(self, match: str = None, count: int = None, **kwargs) -> Iterator[str]:
+        """Iterate over matching keys on every node."""
+        for node in self.nodes:
+            yield from node.scan_iter(match=match, count=count, **kwargs)
+    
+    def ping(self) -> bool:
+        """Ping every node."""
+        return all(node.ping() for node in self.nodes)
+    
+    def close(self) -> None:
+        """Close every node's connections."""
+        for node in self.nodes:
+            node.close()
+
+
+def node_for_key(client: Any, key) -> Any:
+    """Get the client that can run any command on a key.
+    
+    For ``ShardedRedis`` that is the node owning the key; plain and cluster
+    clients run everything themselves. Use it for scripts and transactions
+    on one user's (hash-tagged) keys.
+    """
+    if isinstance(client, ShardedRedis):
+        return client.get_node(key)
+    return client
+
+
+def register_script(client: Any, script: str) -> Script:
+    """Register a Lua script; run it with ``client=node_for_key(client, key)``."""
+    if isinstance(client, ShardedRedis):
+        return client.nodes[0].register_script(script)
+    return client.register_script(script)
+
+
+class ShardedPipeline:
+    """Pipeline over ShardedRedis that batches commands per node."""
+    
+    def __init__(self, client: ShardedRedis, transaction: bool = True):
+        """Initialize pipeline.
+        
+        Args:
+            client: Sharded client used for routing
+            transaction: Wrap each node's batch in MULTI/EXEC
+        """
+        self.client = client
+        self.transaction = transaction
+        self._commands: List[tuple] = []
+    
+    def __getattr__(self, name: str):
+        """Queue a key command routed by its key argument.
+        
+        There is no WATCH/MULTI across nodes; use ``get_node(key).pipeline()``
+        or a script for optimistic transactions on one user's keys.
+        """
+        if name.startswith("_"):
+            raise AttributeError(name)
+        
+        def command(*args, **kwargs):
+            self._commands.append((self.client.route(name, args), name, args, kwargs))
+            return self
+        return command
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self._commands = []
+    
+    def execute(self) -> List[Any]:
+        """Execute queued commands, one round trip per node.
+        
+        Returns:
+            Results in the order commands were queued
+        """
+        by_node: Dict[int, List[int]] = {}
+        pipes: Dict[int, Any] = {}
+        
+        for position, (node, name, args, kwargs) in enumerate(self._commands):
+            node_id = id(node)
+            if node_id not in pipes:
+                pipes[node_id] = node.pipeline(transaction=self.transaction)
+                by_node[node_id] = []
+            getattr(pipes[node_id], name)(*args, **kwargs)
+            by_node[node_id].append(position)
+        
+        results: List[Any] = [None] * len(self._commands)
+        for node_id, pipe in pipes.items():
+            for position, result in zip(by_node[node_id], pipe.execute()):
+                results[position] = result
+        
+        self._commands = []
+        return results
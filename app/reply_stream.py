@@ -0,0 +1,138 @@
+"""Resumable streamed replies backed by Redis Streams.
+
+Every event of a streamed reply (chunks, then ``complete``, ``error`` or
+``cancelled``) is appended to a per-generation Redis Stream as well as sent
+to the client. Entry ids are ``0-<offset>`` with offsets counting from 1, so
+a client only has to remember the ``offset`` of the last event it saw. After
+reconnecting, to any worker, it reads the remaining events, including those
+produced while it was away since generation continues server-side.
+
+Streams expire ``ttl`` seconds after their last event. The id of each user's
+latest generation is kept too, for clients that lost it.
+"""
+import asyncio
+import json
+import logging
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+
+from redis import Redis
+from redis.exceptions import RedisError
+
+from app import keys
+
+logger = logging.getLogger(__name__)
+
+# Event types after which a reply stream receives nothing more
+TERMINAL_EVENTS = {"complete", "error", "cancelled"}
+
+
+class ReplyNotFound(Exception):
+    """Raised when a reply stream does not exist or expired before it finished."""
+
+
+class ReplyPublisher:
+    """Appends the events of one streamed reply to its Redis Stream."""
+    
+    def __init__(self, redis_client: Redis, user_id: str, generation_id: str, ttl: int = 300):
+        """Initialize publisher.
+        
+        Args:
+            redis_client: Redis client instance
+            user_id: User the reply is for
+            generation_id: Unique id of the generation
+            ttl: Seconds the stream stays readable after its last event; 0
+                disables publishing
+        """
+        self.redis = redis_client
+        self.user_id = user_id
+        self.generation_id = generation_id
+        self.ttl = ttl
+        self.enabled = ttl > 0
+        self.offset = 0
+        self.key = keys.reply_stream_key(user_id, generation_id)
+    
+    def publish(self, event: Dict[str, Any]) -> int:
+        """Append an event.
+        
+        Publishing failures are logged and stop further publishing; they
+        never interrupt the live reply.
+        
+        Args:
+            event: Event sent to the client (must have a ``type``)
+        
+        Returns:
+            Offset of the event
+        """
+        self.offset += 1
+        if not self.enabled:
+            return self.offset
+        
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.xadd(self.key, {"event": json.dumps(event)}, id=f"0-{self.offset}")
+            pipe.expire(self.key, self.ttl)
+            if self.offset == 1:
+                pipe.set(keys.latest_reply_key(self.user_id), self.generation_id, ex=self.ttl)
+            elif event.get("type") in TERMINAL_EVENTS:
+                pipe.expire(keys.latest_reply_key(self.user_id), self.ttl)
+            pipe.execute()
+        except RedisError as e:
+            logger.warning(f"Could not publish reply {self.generation_id}, it will not be resumable: {e}")
+            self.enabled = False
+        return self.offset
+
+
+def latest_generation(redis_client: Redis, user_id: str) -> Optional[str]:
+    """Get the id of the user's most recent streamed reply, if still stored."""
+    return redis_client.get(keys.latest_reply_key(user_id))
+
+
+def reply_exists(redis_client: Redis, user_id: str, generation_id: str) -> bool:
+    """Whether a reply stream is still stored."""
+    return bool(redis_client.exists(keys.reply_stream_key(user_id, generation_id)))
+
+
+async def read_reply(
+    redis_client: Redis,
+    user_id: str,
+    generation_id: str,
+    after: int = 0,
+    poll_interval: float = 0.1
+) -> AsyncIterator[Tuple[int, Dict[str, Any]]]:
+    """Read a reply's events after an offset, following it until it ends.
+    
+    Args:
+        redis_client: Redis client instance
+        user_id: User the reply is for
+        generation_id: Id of the generation
+        after: Offset of the last event already seen (0 for all)
+        poll_interval: Seconds between reads while waiting for new events
+    
+    Yields:
+        ``(offset, event)`` pairs, ending with a terminal event
+    
+    Raises:
+        ReplyNotFound: If the stream does not exist or expires before its
+            terminal event (e.g. the generating worker died)
+    """
+    key = keys.reply_stream_key(user_id, generation_id)
+    last_id = f"0-{max(after, 0)}"
+    
+    while True:
+        entries = redis_client.xrange(key, min=f"({last_id}", count=100)
+        if not entries:
+            tail = redis_client.xrevrange(key, count=1)
+            if not tail:
+                raise ReplyNotFound(f"Reply {generation_id} not found or expired")
+            if json.loads(tail[0][1]["event"]).get("type") in TERMINAL_EVENTS:
+                # Already ended and the caller has seen every event
+                return
+            await asyncio.sleep(poll_interval)
+            continue
+        
+        for entry_id, fields in entries:
+            last_id = entry_id
+            event = json.loads(fields["event"])
+            yield int(entry_id.split("-")[1]), event
+            if event.get("type") in TERMINAL_EVENTS:
+                return
@@ -0,0 +1,226 @@
+"""Idle expiry of per-user conversation keys and a Redis memory report.
+
+Conversation history, metadata and chat-scoped session keys expire after
+``MEMORY_IDLE_TTL`` seconds without activity. ``ChatMemoryManager`` refreshes
+all three in the same MULTI/EXEC transaction as every message it appends, so
+a user's keys stay or go together. Session records already expire after
+``SESSION_TIMEOUT``; turn locks, idempotency keys and reply streams have
+their own TTLs.
+
+``MemoryReaper`` periodically gives a TTL to conversation keys that have
+none: keys written before idle expiry was enabled, or restored by an
+import. Each pass is claimed with a Redis lock, so only one worker runs it
+per interval.
+
+``memory_report`` samples the keyspace and breaks key counts, memory use
+and keys without a TTL down by key type::
+
+    python -m app.retention report --sample 20000
+    python -m app.retention reap
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from redis import Redis
+from redis.exceptions import RedisError, ResponseError
+
+from app import keys, metrics
+from app.redis_client import create_redis_client
+from config.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Claimed by the worker running the current reaper pass
+REAPER_LOCK_KEY = "nono:reaper:lock"
+
+
+def expiring_patterns() -> List[Tuple[str, str]]:
+    """Key types that idle expiry applies to, with their SCAN patterns."""
+    return [
+        ("history", keys.history_key("*", "list")),
+        ("history_stream", keys.history_key("*", "stream")),
+        ("metadata", keys.metadata_key("*")),
+        ("chat_session", keys.chat_session_key("*")),
+    ]
+
+
+class MemoryReaper:
+    """Backfills the idle TTL on conversation keys that have none."""
+    
+    def __init__(self, redis_client: Redis, idle_ttl: int, batch_size: int = 500):
+        """Initialize reaper.
+        
+        Args:
+            redis_client: Redis client instance
+            idle_ttl: TTL in seconds given to keys without one
+            batch_size: Keys checked per pipeline round trip
+        """
+        self.redis = redis_client
+        self.idle_ttl = idle_ttl
+        self.batch_size = batch_size
+    
+    def reap_once(self) -> Dict[str, int]:
+        """Scan every conversation key once and set missing TTLs.
+        
+        Returns:
+            Number of keys given a TTL, per key type
+        """
+        counts = {}
+        for key_type, pattern in expiring_patterns():
+            counts[key_type] = 0
+            for batch in _batches(self.redis.scan_iter(match=pattern, count=self.batch_size), self.batch_size):
+                pipe = self.redis.pipeline(transaction=False)
+                for key in batch:
+                    pipe.ttl(key)
+                persistent = [key for key, ttl in zip(batch, pipe.execute()) if ttl == -1]
+                if not persistent:
+                    continue
+                
+                pipe = self.redis.pipeline(transaction=False)
+                for key in persistent:
+                    pipe.expire(key, self.idle_ttl)
+                pipe.execute()
+                counts[key_type] += len(persistent)
+                metrics.MEMORY_KEYS_REAPED.labels(type=key_type).inc(len(persistent))
+        return counts
+    
+    def claim(self, interval: float) -> bool:
+        """Claim the next pass; False if another worker ran one within ``interval``."""
+        return bool(self.redis.set(REAPER_LOCK_KEY, str(os.getpid()), nx=True, ex=max(int(interval), 1)))
+    
+    async def run(self, interval: float) -> None:
+        """Run a pass every ``interval`` seconds until cancelled.
+        
+        Passes run in a thread so scanning never blocks the event loop.
+        Failures are logged and retried at the next interval.
+        """
+        while True:
+            try:
+                if self.claim(interval):
+                    counts = await asyncio.to_thread(self.reap_once)
+                    logger.info(f"Memory reaper set idle TTLs: {counts}")
+            except RedisError as e:
+                logger.warning(f"Memory reaper pass failed: {e}")
+            await asyncio.sleep(interval)
+
+
+def memory_report(redis_client: Redis, sample_size: int = 10000, batch_size: int = 500) -> Dict[str, Any]:
+    """Break Redis memory use down by key type from a sample of keys.
+    
+    Keys are sampled in SCAN order, which is effectively random, and totals
+    are extrapolated from the sample to the whole keyspace.
+    
+    Args:
+        redis_client: Redis client instance
+        sample_size: Maximum number of keys inspected
+        batch_size: Keys inspected per pipeline round trip
+    
+    Returns:
+        Dictionary with keyspace totals and, per key type, the sampled key
+        count, bytes (None if MEMORY USAGE is unavailable), keys without a
+        TTL and estimates for the whole keyspace
+    """
+    nodes = getattr(redis_client, "nodes", [redis_client])
+    scanned = islice(redis_client.scan_iter(count=batch_size), sample_size)
+    
+    types: Dict[str, Dict[str, Any]] = {}
+    sampled = 0
+    with_usage = None
+    for batch in _batches(scanned, batch_size):
+        if with_usage is None:
+            with_usage = _memory_usage_supported(redis_client, batch[0])
+        
+        pipe = redis_client.pipeline(transaction=False)
+        for key in batch:
+            pipe.ttl(key)
+            if with_usage:
+                pipe.memory_usage(key)
+        results = pipe.execute()
+        step = 2 if with_usage else 1
+        
+        for i, key in enumerate(batch):
+            entry = types.setdefault(keys.key_type(key), {"keys": 0, "bytes": 0, "without_ttl": 0})
+            entry["keys"] += 1
+            if results[i * step] == -1:
+                entry["without_ttl"] += 1
+            if with_usage:
+                entry["bytes"] += results[i * step + 1] or 0
+        sampled += len(batch)
+    
+    total_keys = sum(node.dbsize() for node in nodes)
+    scale = total_keys / sampled if sampled else 0.0
+    for entry in types.values():
+        entry["estimated_keys"] = round(entry["keys"] * scale)
+        if with_usage:
+            entry["estimated_bytes"] = round(entry["bytes"] * scale)
+        else:
+            entry["bytes"] = entry["estimated_bytes"] = None
+    
+    order = "bytes" if with_usage else "keys"
+    return {
+        "total_keys": total_keys,
+        "sampled_keys": sampled,
+        "used_memory": _used_memory(nodes),
+        "types": dict(sorted(types.items(), key=lambda item: -item[1][order]))
+    }
+
+
+def _memory_usage_supported(redis_client: Redis, key: str) -> bool:
+    """Whether the server implements MEMORY USAGE."""
+    try:
+        redis_client.memory_usage(key)
+        return True
+    except ResponseError:
+        return False
+
+
+def _used_memory(nodes: List[Redis]) -> Optional[int]:
+    """Total ``used_memory`` from INFO, or None if INFO is unavailable."""
+    try:
+        return sum(node.info("memory")["used_memory"] for node in nodes)
+    except (ResponseError, KeyError):
+        return None
+
+
+def _batches(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    """Group an iterable into lists of ``size``."""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Redis memory report and idle-TTL backfill")
+    parser.add_argument("command", choices=["report", "reap"])
+    parser.add_argument("--sample", type=int, default=10000, help="Keys inspected by the report")
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args(argv)
+    
+    logging.basicConfig(
+        level=settings.log_level,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    redis_client = create_redis_client(settings)
+    
+    if args.command == "report":
+        result = memory_report(redis_client, args.sample, args.batch_size)
+    elif settings.memory_idle_ttl <= 0:
+        parser.error("MEMORY_IDLE_TTL is 0; idle expiry is disabled")
+    else:
+        result = MemoryReaper(redis_client, settings.memory_idle_ttl, args.batch_size).reap_once()
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""Bounded scheduling of blocking LLM generation calls."""
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Iterator, Optional
+
+import anyio
+from starlette.concurrency import run_in_threadpool
+
+from app import metrics
+
+logger = logging.getLogger(__name__)
+
+_END = object()
+
+
+class GenerationScheduler:
+    """Limits concurrent generations and runs them off the event loop.
+    
+    Backend clients are synchronous (``requests``), so calls are executed in
+    the threadpool. Requests beyond ``max_concurrent`` wait in FIFO order for
+    a slot; the wait is recorded as queue time. ``recent_latency`` is a moving
+    average of queue wait plus run time, used as a load signal.
+    """
+    
+    def __init__(self, max_concurrent: int = 4, latency_smoothing: float = 0.2):
+        """Initialize scheduler.
+        
+        Args:
+            max_concurrent: Maximum generations running at once in this process
+            latency_smoothing: Weight of the newest call in ``recent_latency`` (0-1)
+        """
+        self.max_concurrent = max_concurrent
+        self.latency_smoothing = latency_smoothing
+        self.waiting = 0
+        self.active = 0
+        self.recent_latency = 0.0
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+    
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """Hold a generation slot for the duration of the block."""
+        queued = time.perf_counter()
+        self.waiting += 1
+        metrics.QUEUE_DEPTH.inc()
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+            metrics.QUEUE_DEPTH.dec()
+        metrics.QUEUE_WAIT.observe(time.perf_counter() - queued)
+        
+        self.active += 1
+        metrics.GENERATIONS_IN_FLIGHT.inc()
+        try:
+            yield
+        finally:
+            self.active -= 1
+            metrics.GENERATIONS_IN_FLIGHT.dec()
+            self._semaphore.release()
+            self._observe_latency(time.perf_counter() - queued)
+    
+    def _observe_latency(self, seconds: float) -> None:
+        """Fold a finished call's total time into ``recent_latency``."""
+        if self.recent_latency == 0.0:
+            self.recent_latency = seconds
+        else:
+            self.recent_latency += self.latency_smoothing * (seconds - self.recent_latency)
+    
+    async def run(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run a blocking generation call in a slot.
+        
+        Args:
+            func: Blocking callable (e.g. ``OllamaLLM.generate``)
+            *args: Positional arguments for func
+            **kwargs: Keyword arguments for func
+        
+        Returns:
+            Result of func
+        """
+        async with self.slot():
+            return await run_in_threadpool(func, *args, **kwargs)
+    
+    async def stream(self, func: Callable[..., Iterator[Any]], *args, **kwargs) -> AsyncIterator[Any]:
+        """Iterate a blocking generator (e.g. ``generate_stream``) in a slot.
+        
+        If the consumer stops or is cancelled while a thread is inside
+        ``next()``, that call is allowed to return before the iterator is
+        closed (a running generator cannot be closed), and the slot is held
+        until the close has finished.
+        
+        Args:
+            func: Callable returning a blocking iterator
+            *args: Positional arguments for func
+            **kwargs: Keyword arguments for func
+        
+        Yields:
+            Items produced by the iterator
+        """
+        async with self.slot():
+            iterator = iter(func(*args, **kwargs))
+            pending = None
+            item = None
+            try:
+                while True:
+                    pending = asyncio.ensure_future(run_in_threadpool(next, iterator, _END))
+                    # Shielded from the framework's cancel scopes, as run_in_threadpool
+                    # is; cancelling the task still stops the wait
+                    with anyio.CancelScope(shield=True):
+                        item = await asyncio.shield(pending)
+                    pending = None
+                    if item is _END:
+                        return
+                    yield item
+            finally:
+                if item is not _END:
+                    await _uncancellable(_close_after(pending, iterator))
+    
+    async def drain(self, timeout: float) -> bool:
+        """Wait for queued and running generations to finish.
+        
+        Args:
+            timeout: Maximum seconds to wait
+        
+        Returns:
+            True if the scheduler is idle, False if the timeout expired
+        """
+        deadline = time.monotonic() + timeout
+        while self.active or self.waiting:
+            if time.monotonic() >= deadline:
+                return False
+            await asyncio.sleep(0.05)
+        return True
+    
+    def snapshot(self) -> dict:
+        """Get current queue state.
+        
+        Returns:
+            Dictionary with waiting, active and max_concurrent counts
+        """
+        return {
+            "waiting": self.waiting,
+            "active": self.active,
+            "max_concurrent": self.max_concurrent
+        }
+
+
+async def _close_after(pending: Optional[asyncio.Future], iterator: Iterator[Any]) -> None:
+    """Close a blocking iterator once its in-flight ``next()`` has returned."""
+    if pending is not None:
+        await asyncio.wait([pending])
+    close = getattr(iterator, "close", None)
+    if close:
+        await run_in_threadpool(close)
+
+
+async def _uncancellable(coro) -> None:
+    """Run a coroutine to completion, then re-raise any cancellation received meanwhile."""
+    task = asyncio.ensure_future(coro)
+    cancelled = False
+    with anyio.CancelScope(shield=True):
+        while not task.done():
+            try:
+                await asyncio.shield(task)
+            except asyncio.CancelledError:
+                if task.cancelled():
+                    raise
+                cancelled = True
+    task.result()
+    if cancelled:
+        raise asyncio.CancelledError()
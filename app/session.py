@@ -5,6 +5,10 @@ from datetime import datetime, timedelta
 from redis import Redis
 import json
 
+from app import keys
+from app.metrics import timed_redis
+from app.tracing import traced
+
 logger = logging.getLogger(__name__)
 
 
@@ -21,6 +25,20 @@ class SessionManager:
         self.redis = redis_client
         self.session_timeout = session_timeout
     
+    @staticmethod
+    def session_key(user_id: str) -> str:
+        """Get the Redis key holding a user's session.
+        
+        Args:
+            user_id: User identifier
+            
+        Returns:
+            Redis key name
+        """
+        return keys.session_key(user_id)
+    
+    @traced("session.create_session")
+    @timed_redis("session.create_session")
     def create_session(
         self,
         user_id: str,
@@ -46,7 +64,7 @@ class SessionManager:
             "metadata": metadata or {}
         }
         
-        session_key = f"session:{user_id}"
+        session_key = self.session_key(user_id)
         self.redis.setex(
             session_key,
             self.session_timeout,
@@ -56,6 +74,8 @@ class SessionManager:
         logger.info(f"Created session for user {user_id} with persona {persona}")
         return session_data
     
+    @traced("session.get_session")
+    @timed_redis("session.get_session")
     def get_session(self, user_id: str) -> Optional[Dict[str, Any]]:
         """Retrieve existing session.
         
@@ -65,7 +85,7 @@ class SessionManager:
         Returns:
             Session data or None if not found
         """
-        session_key = f"session:{user_id}"
+        session_key = self.session_key(user_id)
         session_data = self.redis.get(session_key)
         
         if session_data:
@@ -77,6 +97,8 @@ class SessionManager:
         
         return None
     
+    @traced("session.update_session")
+    @timed_redis("session.update_session")
     def update_session(self, user_id: str, updates: Dict[str, Any]) -> bool:
         """Update session data.
         
@@ -94,7 +116,7 @@ class SessionManager:
         session_data.update(updates)
         session_data["last_activity"] = datetime.utcnow().isoformat()
         
-        session_key = f"session:{user_id}"
+        session_key = self.session_key(user_id)
         self.redis.setex(
             session_key,
             self.session_timeout,
@@ -103,6 +125,46 @@ class SessionManager:
         
         return True
     
+    @traced("session.update_sessions")
+    @timed_redis("session.update_sessions")
+    def update_sessions(self, updates: Dict[str, Dict[str, Any]]) -> int:
+        """Update several users' sessions in two round trips.
+        
+        Args:
+            updates: Updates by user id
+            
+        Returns:
+            Number of sessions updated (missing sessions are skipped)
+        """
+        if not updates:
+            return 0
+        
+        pipe = self.redis.pipeline(transaction=False)
+        for user_id in updates:
+            pipe.get(self.session_key(user_id))
+        current = pipe.execute()
+        
+        now = datetime.utcnow().isoformat()
+        updated = 0
+        pipe = self.redis.pipeline(transaction=False)
+        for (user_id, changes), session_data in zip(updates.items(), current):
+            if not session_data:
+                continue
+            try:
+                session = json.loads(session_data)
+            except json.JSONDecodeError:
+                logger.error(f"Failed to decode session for user {user_id}")
+                continue
+            session.update(changes)
+            session["last_activity"] = now
+            pipe.setex(self.session_key(user_id), self.session_timeout, json.dumps(session))
+            updated += 1
+        if updated:
+            pipe.execute()
+        return updated
+    
+    @traced("session.extend_session")
+    @timed_redis("session.extend_session")
     def extend_session(self, user_id: str) -> bool:
         """Extend session expiry time.
         
@@ -112,20 +174,24 @@ class SessionManager:
         Returns:
             True if successful, False otherwise
         """
-        session_key = f"session:{user_id}"
+        session_key = self.session_key(user_id)
         session_exists = self.redis.expire(session_key, self.session_timeout)
         return session_exists > 0
     
+    @traced("session.delete_session")
+    @timed_redis("session.delete_session")
     def delete_session(self, user_id: str) -> None:
         """Delete user session.
         
         Args:
             user_id: User identifier
         """
-        session_key = f"session:{user_id}"
+        session_key = self.session_key(user_id)
         self.redis.delete(session_key)
         logger.info(f"Deleted session for user {user_id}")
     
+    @traced("session.get_session_ttl")
+    @timed_redis("session.get_session_ttl")
     def get_session_ttl(self, user_id: str) -> int:
         """Get remaining session TTL in seconds.
         
@@ -135,25 +201,19 @@ class SessionManager:
         Returns:
             TTL in seconds, -1 if not found, -2 if no expiry
         """
-        session_key = f"session:{user_id}"
+        session_key = self.session_key(user_id)
         return self.redis.ttl(session_key)
     
+    @traced("session.list_active_sessions")
+    @timed_redis("session.list_active_sessions")
     def list_active_sessions(self) -> list:
         """List all active sessions.
         
         Returns:
             List of user IDs with active sessions
         """
-        cursor = 0
-        active_users = []
-        
-        while True:
-            cursor, keys = self.redis.scan(cursor, match="session:*")
-            for key in keys:
-                user_id = key.decode().replace("session:", "")
-                active_users.append(user_id)
-            
-            if cursor == 0:
-                break
-        
-        return active_users
+        pattern = keys.session_key("*")
+        return [
+            keys.user_id_from_key(key, pattern)
+            for key in self.redis.scan_iter(match=pattern)
+        ]
@@ -0,0 +1,199 @@
+"""Conversation history stored in a Redis Stream (``MEMORY_BACKEND=stream``).
+
+Compared with the default list backend:
+
+- Messages are appended with ``XADD ... MAXLEN ~ max_messages``. Approximate
+  trimming only drops whole internal nodes of the stream, which is cheap, but
+  may keep somewhat more than ``max_messages`` entries.
+- A message's id is its stream entry id (``<milliseconds>-<sequence>``),
+  assigned by Redis and never changed by trimming, so ids can be used as
+  pagination and resumption cursors from any worker.
+- Reads seek by id: the context window is ``XREVRANGE ... COUNT n`` and
+  pages start at their cursor instead of scanning the history for it.
+
+Cursors may also be ISO timestamps or ids from the list backend (nanosecond
+clock values); both are converted to the stream id of that millisecond.
+"""
+import json
+import logging
+import re
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from redis import Redis
+
+logger = logging.getLogger(__name__)
+
+STREAM_ID_PATTERN = re.compile(r"^(\d+)-(\d+)$")
+
+# List-backend message ids: nanosecond clock, then a process suffix
+MESSAGE_ID_CLOCK_DIGITS = 20
+
+
+class StreamHistory:
+    """Append, read and page one user's history stream."""
+    
+    def __init__(self, redis_client: Redis, key: str, max_messages: int = 10):
+        """Initialize stream history.
+        
+        Args:
+            redis_client: Redis client instance
+            key: Key of the history stream
+            max_messages: Approximate number of messages to keep
+        """
+        self.redis = redis_client
+        self.key = key
+        self.max_messages = max_messages
+    
+    def append(self, message: Dict[str, Any], pipe=None) -> Optional[str]:
+        """Append a message, trimming old ones approximately.
+        
+        Args:
+            message: Message dictionary; any ``id`` is replaced by the entry id
+            pipe: Pipeline to queue the append on instead of sending it
+        
+        Returns:
+            Id of the new entry, or None when queued on a pipeline
+        """
+        client = pipe if pipe is not None else self.redis
+        entry_id = client.xadd(self.key, self.encode(message), maxlen=self.max_messages, approximate=True)
+        return entry_id if pipe is None else None
+    
+    def recent(self, count: int) -> List[Dict[str, Any]]:
+        """Get the newest ``count`` messages, oldest-first."""
+        return self.decode_entries(reversed(self.redis.xrevrange(self.key, count=count)))
+    
+    def count(self) -> int:
+        """Number of messages currently stored."""
+        return self.redis.xlen(self.key)
+    
+    def iter_messages(
+        self,
+        batch_size: int = 100,
+        before: Optional[str] = None,
+        after: Optional[str] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """Iterate over messages between two cursors, oldest-first.
+        
+        Cursors are validated before the iterator is returned.
+        
+        Args:
+            batch_size: Number of entries fetched per XRANGE call
+            before: Only yield messages older than this cursor
+            after: Only yield messages newer than this cursor
+        
+        Returns:
+            Iterator of message dictionaries
+        
+        Raises:
+            ValueError: If a cursor is not an id or ISO timestamp
+        """
+        low = f"({self.cursor_id(after)}" if after is not None else "-"
+        high = f"({self.cursor_id(before)}" if before is not None else "+"
+        
+        def iterate(low: str) -> Iterator[Dict[str, Any]]:
+            while True:
+                entries = self.redis.xrange(self.key, min=low, max=high, count=batch_size)
+                yield from self.decode_entries(entries)
+                if len(entries) < batch_size:
+                    return
+                low = f"({entries[-1][0]}"
+        
+        return iterate(low)
+    
+    def page(
+        self,
+        limit: int = 50,
+        before: Optional[str] = None,
+        after: Optional[str] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Get one page of messages (see ``ChatMemoryManager.get_messages_page``).
+        
+        Raises:
+            ValueError: If a cursor is not an id or ISO timestamp
+        """
+        high = f"({self.cursor_id(before)}" if before is not None else "+"
+        
+        if after is not None:
+            entries = self.redis.xrange(self.key, min=f"({self.cursor_id(after)}", max=high, count=limit + 1)
+            page = self.decode_entries(entries[:limit])
+            next_cursor = page[-1]["id"] if len(entries) > limit and page else None
+            return page, next_cursor
+        
+        entries = self.redis.xrevrange(self.key, max=high, min="-", count=limit + 1)
+        page = self.decode_entries(reversed(entries[:limit]))
+        next_cursor = page[0]["id"] if len(entries) > limit and page else None
+        return page, next_cursor
+    
+    @staticmethod
+    def encode(message: Dict[str, Any]) -> Dict[str, str]:
+        """Stream entry fields for a message (its id is the entry id)."""
+        return {"message": json.dumps({k: v for k, v in message.items() if k != "id"})}
+    
+    @staticmethod
+    def decode_entries(entries) -> List[Dict[str, Any]]:
+        """Decode ``(entry_id, fields)`` pairs, skipping malformed entries."""
+        messages = []
+        for entry_id, fields in entries:
+            try:
+                message = json.loads(fields["message"])
+            except (KeyError, json.JSONDecodeError) as e:
+                logger.warning(f"Failed to decode message {entry_id}: {e}")
+                continue
+            message["id"] = entry_id
+            messages.append(message)
+        return messages
+    
+    @staticmethod
+    def cursor_id(cursor: str) -> str:
+        """Convert a cursor to a stream id.
+        
+        Args:
+            cursor: Stream id, list-backend message id or ISO timestamp
+        
+        Returns:
+            Stream id
+        
+        Raises:
+            ValueError: If the cursor is none of these
+        """
+        ms, seq = _cursor_position(cursor)
+        return f"{ms}-{seq}"
+    
+    @staticmethod
+    def entry_ids(messages: List[Dict[str, Any]]) -> List[str]:
+        """Stream ids for importing messages, in order and strictly increasing.
+        
+        Ids are derived from each message's id or timestamp so that cursors
+        into imported history keep pointing at the same place. Messages with
+        neither, or out of order, get the next id after their predecessor.
+        """
+        ids = []
+        last = (0, 0)
+        for message in messages:
+            try:
+                position = _cursor_position(str(message.get("id") or message.get("timestamp") or ""))
+            except ValueError:
+                position = last
+            if position <= last:
+                position = (last[0], last[1] + 1)
+            ids.append(f"{position[0]}-{position[1]}")
+            last = position
+        return ids
+
+
+def _cursor_position(cursor: str) -> Tuple[int, int]:
+    """Parse a cursor into ``(milliseconds, sequence)``."""
+    match = STREAM_ID_PATTERN.match(cursor)
+    if match:
+        return int(match.group(1)), int(match.group(2))
+    if cursor.isdigit():
+        # List-backend ids start with a 20-digit nanosecond clock value
+        return int(cursor[:MESSAGE_ID_CLOCK_DIGITS]) // 1_000_000, 0
+    try:
+        moment = datetime.fromisoformat(cursor)
+    except ValueError:
+        raise ValueError(f"Invalid history cursor: {cursor!r}") from None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return int(moment.timestamp() * 1000), 0
@@ -0,0 +1,319 @@
+"""Lightweight request tracing.
+
+Spans follow the OpenTelemetry data model (trace/span ids, parent, start/end
+in unix nanoseconds, attributes) and are exported as OTLP-JSON-shaped
+objects, either appended to a local JSONL file or kept in memory for tests.
+Every span finished during an HTTP request is also collected so the
+``Server-Timing`` header can summarize where the time went.
+"""
+import contextvars
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar("current_span", default=None)
+_request_spans: contextvars.ContextVar = contextvars.ContextVar("request_spans", default=None)
+
+
+class Span:
+    """A timed operation within a trace."""
+    
+    __slots__ = ("name", "trace_id", "span_id", "parent_span_id", "attributes",
+                 "start_time_unix_nano", "end_time_unix_nano", "status", "_started")
+    
+    def __init__(self, name: str, parent: Optional["Span"] = None, attributes: Optional[Dict[str, Any]] = None):
+        """Start a span.
+        
+        Args:
+            name: Span name, ``category.operation`` (e.g. ``memory.add_message``)
+            parent: Parent span; a new trace is started when None
+            attributes: Initial attributes
+        """
+        self.name = name
+        self.trace_id = parent.trace_id if parent else os.urandom(16).hex()
+        self.span_id = os.urandom(8).hex()
+        self.parent_span_id = parent.span_id if parent else None
+        self.attributes = dict(attributes or {})
+        self.start_time_unix_nano = time.time_ns()
+        self.end_time_unix_nano: Optional[int] = None
+        self.status = "OK"
+        self._started = time.perf_counter()
+    
+    @property
+    def category(self) -> str:
+        """First component of the span name."""
+        return self.name.split(".", 1)[0]
+    
+    @property
+    def duration_ms(self) -> float:
+        """Span duration in milliseconds (so far, if still open)."""
+        if self.end_time_unix_nano is None:
+            return (time.perf_counter() - self._started) * 1000
+        return (self.end_time_unix_nano - self.start_time_unix_nano) / 1e6
+    
+    def set_attribute(self, key: str, value: Any) -> None:
+        """Set a span attribute."""
+        self.attributes[key] = value
+    
+    def record_error(self, error: BaseException) -> None:
+        """Mark the span as failed."""
+        self.status = "ERROR"
+        self.attributes["error.type"] = type(error).__name__
+        self.attributes["error.message"] = str(error)
+    
+    def end(self) -> None:
+        """Finish the span and hand it to the exporter and request collector."""
+        if self.end_time_unix_nano is not None:
+            return
+        self.end_time_unix_nano = self.start_time_unix_nano + int((time.perf_counter() - self._started) * 1e9)
+        
+        collected = _request_spans.get()
+        if collected is not None:
+            collected.append(self)
+        if _exporter is not None:
+            try:
+                _exporter.export(self)
+            except Exception as e:
+                logger.warning(f"Span export failed: {e}")
+    
+    def to_otlp(self) -> Dict[str, Any]:
+        """Convert to an OTLP JSON span object."""
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_span_id or "",
+            "name": self.name,
+            "startTimeUnixNano": str(self.start_time_unix_nano),
+            "endTimeUnixNano": str(self.end_time_unix_nano),
+            "attributes": [
+                {"key": key, "value": _otlp_value(value)} for key, value in self.attributes.items()
+            ],
+            "status": {"code": "STATUS_CODE_ERROR" if self.status == "ERROR" else "STATUS_CODE_OK"}
+        }
+
+
+class InMemorySpanExporter:
+    """Keeps finished spans in a list (for tests)."""
+    
+    def __init__(self):
+        """Initialize empty exporter."""
+        self.spans: List[Span] = []
+    
+    def export(self, span: Span) -> None:
+        """Store a finished span."""
+        self.spans.append(span)
+    
+    def names(self) -> List[str]:
+        """Names of all exported spans in finish order."""
+        return [span.name for span in self.spans]
+    
+    def clear(self) -> None:
+        """Drop all stored spans."""
+        self.spans.clear()
+
+
+class FileSpanExporter:
+    """Appends finished spans as OTLP JSON lines to a local file."""
+    
+    def __init__(self, path: str):
+        """Initialize exporter.
+        
+        Args:
+            path: JSONL file to append to
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, "a", encoding="utf-8")
+    
+    def export(self, span: Span) -> None:
+        """Write a finished span."""
+        line = json.dumps(span.to_otlp(), separators=(",", ":")) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+    
+    def close(self) -> None:
+        """Close the output file."""
+        with self._lock:
+            self._file.close()
+
+
+_exporter = None
+
+
+def configure(exporter) -> None:
+    """Set the span exporter (None disables export).
+    
+    Args:
+        exporter: Object with an ``export(span)`` method, or None
+    """
+    global _exporter
+    _exporter = exporter
+
+
+def configure_from_settings(settings) -> None:
+    """Configure the exporter from ``tracing_exporter``/``tracing_file`` settings."""
+    if settings.tracing_exporter == "file":
+        configure(FileSpanExporter(settings.tracing_file))
+        logger.info(f"Exporting trace spans to {settings.tracing_file}")
+    elif settings.tracing_exporter == "memory":
+        configure(InMemorySpanExporter())
+    else:
+        configure(None)
+
+
+def get_exporter():
+    """Get the configured exporter."""
+    return _exporter
+
+
+def start_span(name: str, **attributes) -> Span:
+    """Start a child of the current span without making it current.
+    
+    Use for work that crosses threads or generator boundaries; call
+    ``span.end()`` when done.
+    """
+    return Span(name, _current_span.get(), attributes)
+
+
+@contextmanager
+def span(name: str, **attributes) -> Iterator[Span]:
+    """Run a block inside a span that is current for nested spans.
+    
+    Args:
+        name: Span name
+        **attributes: Initial attributes
+    
+    Yields:
+        The active span
+    """
+    current = Span(name, _current_span.get(), attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.record_error(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        current.end()
+
+
+def traced(name: str) -> Callable:
+    """Decorator wrapping a function call in a span."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class RequestTrace:
+    """Root span of a request plus every span finished inside it."""
+    
+    def __init__(self, root: Span):
+        """Initialize trace.
+        
+        Args:
+            root: Root span of the request
+        """
+        self.root = root
+        self.spans: List[Span] = []
+    
+    def server_timing(self) -> str:
+        """Summarize the request as a ``Server-Timing`` header value.
+        
+        Durations are summed per span category. Spans nested inside a span
+        of the same category are skipped so time is not counted twice.
+        
+        Returns:
+            Header value such as ``memory;dur=1.2, llm;dur=840.0, total;dur=845.3``
+        """
+        by_id = {s.span_id: s for s in self.spans}
+        totals: Dict[str, float] = {}
+        
+        for s in self.spans:
+            if s is self.root:
+                continue
+            parent = by_id.get(s.parent_span_id)
+            if parent is not None and parent.category == s.category:
+                continue
+            totals[s.category] = totals.get(s.category, 0.0) + s.duration_ms
+        
+        parts = [f"{category};dur={duration:.1f}" for category, duration in totals.items()]
+        parts.append(f"total;dur={self.root.duration_ms:.1f}")
+        return ", ".join(parts)
+
+
+@contextmanager
+def request_trace(name: str, **attributes) -> Iterator[RequestTrace]:
+    """Trace one request, collecting every span finished inside it.
+    
+    Args:
+        name: Root span name
+        **attributes: Root span attributes
+    
+    Yields:
+        RequestTrace for the request
+    """
+    with span(name, **attributes) as root:
+        trace = RequestTrace(root)
+        token = _request_spans.set(trace.spans)
+        try:
+            yield trace
+        finally:
+            _request_spans.reset(token)
+
+
+class ServerTimingMiddleware:
+    """ASGI middleware tracing each HTTP request and adding ``Server-Timing``."""
+    
+    def __init__(self, app, enabled: bool = True):
+        """Initialize middleware.
+        
+        Args:
+            app: Wrapped ASGI application
+            enabled: Whether to add the ``Server-Timing`` header
+        """
+        self.app = app
+        self.enabled = enabled
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        with request_trace(
+            f"{scope['method']} {scope['path']}",
+            **{"http.method": scope["method"], "http.target": scope["path"]}
+        ) as trace:
+            async def send_with_timing(message):
+                if message["type"] == "http.response.start":
+                    trace.root.set_attribute("http.status_code", message["status"])
+                    if self.enabled:
+                        headers = list(message.get("headers", []))
+                        headers.append((b"server-timing", trace.server_timing().encode()))
+                        message = {**message, "headers": headers}
+                await send(message)
+            
+            await self.app(scope, receive, send_with_timing)
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    """Encode an attribute value as an OTLP AnyValue."""
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
@@ -0,0 +1,314 @@
+"""Bulk export and import of user conversations.
+
+Conversations are written as gzip-compressed NDJSON, one user per line::
+
+    {"user_id": "...", "messages": [...], "metadata": {...},
+     "session": {...}, "session_ttl": 3512}
+
+Users are processed in fixed-size batches using non-transactional Redis
+pipelines, so memory use is bounded by the batch size rather than the number
+of users in the keyspace.
+
+Usage::
+
+    python -m app.transfer export backup.ndjson.gz
+    python -m app.transfer import backup.ndjson.gz --batch-size 1000
+
+History is read from and written to the configured ``MEMORY_BACKEND``, so an
+export from one backend can be imported into the other.
+"""
+import argparse
+import gzip
+import json
+import logging
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+from redis import Redis
+
+from app import keys
+from app.redis_client import create_redis_client
+from app.memory import ChatMemoryManager
+from app.session import SessionManager
+from app.stream_history import StreamHistory
+from config.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class TransferStats:
+    """Running counters for an export or import."""
+    
+    def __init__(self):
+        """Initialize counters and start the clock."""
+        self.users = 0
+        self.messages = 0
+        self.started = time.perf_counter()
+    
+    @property
+    def elapsed(self) -> float:
+        """Seconds since the transfer started."""
+        return time.perf_counter() - self.started
+    
+    def summary(self) -> Dict[str, Any]:
+        """Get counters and throughput.
+        
+        Returns:
+            Dictionary with totals and per-second rates
+        """
+        elapsed = max(self.elapsed, 1e-9)
+        return {
+            "users": self.users,
+            "messages": self.messages,
+            "seconds": round(self.elapsed, 3),
+            "users_per_second": round(self.users / elapsed, 1),
+            "messages_per_second": round(self.messages / elapsed, 1)
+        }
+
+
+class ConversationTransfer:
+    """Streams conversations between Redis and compressed NDJSON files."""
+    
+    def __init__(
+        self,
+        redis_client: Redis,
+        session_manager: SessionManager,
+        batch_size: int = 500,
+        progress_every: int = 10000
+    ):
+        """Initialize transfer.
+        
+        Args:
+            redis_client: Redis client instance
+            session_manager: Session manager used for the default session timeout
+            batch_size: Number of users per pipeline round trip
+            progress_every: Log throughput every N users
+        """
+        self.redis = redis_client
+        self.session_manager = session_manager
+        self.batch_size = batch_size
+        self.progress_every = progress_every
+    
+    # ------------------------------------------------------------------
+    # Export
+    # ------------------------------------------------------------------
+    
+    def export(self, output_path: str, match: str = "*") -> Dict[str, Any]:
+        """Export all conversations to a gzip NDJSON file.
+        
+        Args:
+            output_path: Destination file path
+            match: Glob applied to user ids
+        
+        Returns:
+            Transfer summary with throughput
+        """
+        stats = TransferStats()
+        
+        with gzip.open(output_path, "wt", encoding="utf-8") as out:
+            for batch in self._batches(self.iter_user_ids(match)):
+                for record in self._fetch_batch(batch):
+                    out.write(json.dumps(record, separators=(",", ":")) + "\n")
+                    stats.users += 1
+                    stats.messages += len(record["messages"])
+                    self._report(stats, "Exported")
+        
+        summary = stats.summary()
+        logger.info(f"Export complete: {summary}")
+        return summary
+    
+    def iter_user_ids(self, match: str = "*") -> Iterator[str]:
+        """Yield every user id that has history, metadata or a session.
+        
+        History keys are scanned first. Metadata and session keys are then
+        scanned and only yielded for users not already covered, checked with
+        pipelined EXISTS calls so no global set of ids is kept in memory.
+        
+        Args:
+            match: Glob applied to user ids
+        
+        Yields:
+            User ids, each exactly once
+        """
+        for user_id in self._scan_user_ids(keys.history_key(match)):
+            yield user_id
+        
+        for pattern, covered_by in (
+            (keys.metadata_key(match), (keys.history_key,)),
+            (keys.session_key(match), (keys.history_key, keys.metadata_key)),
+        ):
+            for batch in self._batches(self._scan_user_ids(pattern)):
+                pipe = self.redis.pipeline(transaction=False)
+                for user_id in batch:
+                    pipe.exists(*(key_for(user_id) for key_for in covered_by))
+                for user_id, existing in zip(batch, pipe.execute()):
+                    if not existing:
+                        yield user_id
+    
+    def _scan_user_ids(self, pattern: str) -> Iterator[str]:
+        """Scan keys matching a per-user key pattern and extract user ids."""
+        for key in self.redis.scan_iter(match=pattern, count=self.batch_size):
+            yield keys.user_id_from_key(key, pattern)
+    
+    def _fetch_batch(self, user_ids: List[str]) -> List[Dict[str, Any]]:
+        """Read history, metadata and session for a batch in one round trip."""
+        pipe = self.redis.pipeline(transaction=False)
+        for user_id in user_ids:
+            session_key = keys.session_key(user_id)
+            if settings.memory_backend == "stream":
+                pipe.xrange(keys.history_key(user_id))
+            else:
+                pipe.lrange(keys.history_key(user_id), 0, -1)
+            pipe.get(keys.metadata_key(user_id))
+            pipe.get(session_key)
+            pipe.ttl(session_key)
+        results = pipe.execute()
+        
+        records = []
+        for i, user_id in enumerate(user_ids):
+            history, metadata, session, ttl = results[i * 4:i * 4 + 4]
+            records.append({
+                "user_id": user_id,
+                "messages": _decode_history(history or []),
+                "metadata": _loads(metadata) or {},
+                "session": _loads(session),
+                "session_ttl": ttl if ttl and ttl > 0 else None
+            })
+        return records
+    
+    # ------------------------------------------------------------------
+    # Import
+    # ------------------------------------------------------------------
+    
+    def import_(self, input_path: str, overwrite: bool = True) -> Dict[str, Any]:
+        """Import conversations from a gzip NDJSON file.
+        
+        Args:
+            input_path: Source file path
+            overwrite: Replace existing users; otherwise skip them
+        
+        Returns:
+            Transfer summary with throughput
+        """
+        stats = TransferStats()
+        
+        with gzip.open(input_path, "rt", encoding="utf-8") as src:
+            records = (json.loads(line) for line in src if line.strip())
+            for batch in self._batches(records):
+                if not overwrite:
+                    batch = self._without_existing(batch)
+                self._write_batch(batch)
+                for record in batch:
+                    stats.users += 1
+                    stats.messages += len(record.get("messages", []))
+                    self._report(stats, "Imported")
+        
+        summary = stats.summary()
+        logger.info(f"Import complete: {summary}")
+        return summary
+    
+    def _without_existing(self, batch: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Drop records whose user already has any stored data."""
+        pipe = self.redis.pipeline(transaction=False)
+        for record in batch:
+            pipe.exists(*keys.user_keys(record["user_id"]))
+        return [record for record, existing in zip(batch, pipe.execute()) if not existing]
+    
+    def _write_batch(self, batch: List[Dict[str, Any]]) -> None:
+        """Write a batch of records in one pipeline round trip.
+        
+        A record replaces everything stored for its user. History is capped
+        and expires when idle exactly as if written by the chat endpoints.
+        """
+        if not batch:
+            return
+        
+        pipe = self.redis.pipeline(transaction=False)
+        for record in batch:
+            user_id = record["user_id"]
+            pipe.delete(*keys.user_keys(user_id))
+            memory = ChatMemoryManager(self.redis, user_id)
+            memory.queue_restore(pipe, record.get("messages") or [], record.get("metadata"))
+            if record.get("session"):
+                pipe.setex(
+                    keys.session_key(user_id),
+                    record.get("session_ttl") or self.session_manager.session_timeout,
+                    json.dumps(record["session"])
+                )
+        pipe.execute()
+    
+    # ------------------------------------------------------------------
+    # Helpers
+    # ------------------------------------------------------------------
+    
+    def _batches(self, items) -> Iterator[List[Any]]:
+        """Group an iterable into lists of ``batch_size``."""
+        batch = []
+        for item in items:
+            batch.append(item)
+            if len(batch) >= self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+    
+    def _report(self, stats: TransferStats, verb: str) -> None:
+        """Log throughput every ``progress_every`` users."""
+        if self.progress_every and stats.users % self.progress_every == 0:
+            summary = stats.summary()
+            logger.info(
+                f"{verb} {summary['users']} users "
+                f"({summary['users_per_second']} users/s, "
+                f"{summary['messages_per_second']} messages/s)"
+            )
+
+
+def _decode_history(history: List[Any]) -> List[Dict[str, Any]]:
+    """Decode history read with LRANGE (list backend) or XRANGE (stream backend)."""
+    if settings.memory_backend == "stream":
+        return StreamHistory.decode_entries(history)
+    return ChatMemoryManager._decode_messages(history)
+
+
+def _loads(data: Optional[str]) -> Optional[Any]:
+    """Decode a JSON value, returning None for missing or malformed data."""
+    if not data:
+        return None
+    try:
+        return json.loads(data)
+    except json.JSONDecodeError:
+        return None
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Export or import Nono conversations")
+    parser.add_argument("command", choices=["export", "import"])
+    parser.add_argument("path", help="gzip NDJSON file to write or read")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--match", default="*", help="Glob applied to user ids (export only)")
+    parser.add_argument("--skip-existing", action="store_true", help="Do not overwrite existing users (import only)")
+    args = parser.parse_args(argv)
+    
+    logging.basicConfig(
+        level=settings.log_level,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    
+    redis_client = create_redis_client(settings)
+    transfer = ConversationTransfer(
+        redis_client,
+        SessionManager(redis_client, settings.session_timeout),
+        batch_size=args.batch_size
+    )
+    
+    if args.command == "export":
+        summary = transfer.export(args.path, match=args.match)
+    else:
+        summary = transfer.import_(args.path, overwrite=not args.skip_existing)
+    
+    print(json.dumps(summary))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""Per-user chat turn serialization, superseding and idempotent replies.
+
+A chat turn appends the user's message, generates a reply and appends the
+reply. Two turns for the same user running at once would interleave their
+messages in the history, so turns hold a per-user Redis lock shared by all
+workers and instances.
+
+- A turn arriving while another holds the lock waits for it. With
+  ``supersede`` it first asks the holder to stop; the holder notices within
+  ``poll_interval``, closes its upstream generation at the next chunk and
+  raises ``TurnCancelled``.
+- The lock expires after ``ttl`` unless renewed, so a crashed worker cannot
+  block a user for longer than that. Holders renew it while they run.
+- Replies to requests carrying an idempotency key are stored, so a client
+  retry gets the stored reply instead of a second generation. A retry never
+  supersedes the request it repeats.
+"""
+import asyncio
+import json
+import logging
+import time
+import uuid
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional
+
+from redis import Redis
+
+from app import keys, metrics
+from app.redis_client import node_for_key, register_script
+
+logger = logging.getLogger(__name__)
+
+# Longer keys are rejected rather than stored
+MAX_IDEMPOTENCY_KEY_LENGTH = 200
+
+# KEYS: lock, cancellation. ARGV: token of the releasing turn.
+# Deletes whichever of the two still names the turn.
+RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    redis.call('DEL', KEYS[1])
+end
+if redis.call('GET', KEYS[2]) == ARGV[1] then
+    redis.call('DEL', KEYS[2])
+end
+return 1
+"""
+
+
+class TurnCancelled(Exception):
+    """Raised in a turn that a newer message from the same user superseded."""
+
+
+class UserBusyError(Exception):
+    """Raised when a user's previous turn did not finish within the wait timeout."""
+    
+    def __init__(self, user_id: str, waited: float):
+        """Initialize error.
+        
+        Args:
+            user_id: User whose turn is still running
+            waited: Seconds spent waiting for it
+        """
+        super().__init__(f"A reply for {user_id} is still being generated (waited {waited:.0f}s)")
+        self.user_id = user_id
+        self.waited = waited
+
+
+class Turn:
+    """A held turn; ``cancelled`` is set when a newer message supersedes it."""
+    
+    def __init__(self, token: str):
+        self.token = token
+        self.cancelled = False
+    
+    def check(self) -> None:
+        """Raise ``TurnCancelled`` if the turn was superseded."""
+        if self.cancelled:
+            raise TurnCancelled()
+
+
+class UserTurnLock:
+    """Distributed per-user lock for chat turns."""
+    
+    def __init__(
+        self,
+        redis_client: Redis,
+        ttl: float = 30.0,
+        wait_timeout: float = 120.0,
+        poll_interval: float = 0.25
+    ):
+        """Initialize lock.
+        
+        Args:
+            redis_client: Redis client instance
+            ttl: Seconds the lock survives without renewal (e.g. if its worker dies)
+            wait_timeout: Seconds a turn waits for the previous one before giving up
+            poll_interval: Seconds between lock attempts and cancellation checks
+        """
+        self.redis = redis_client
+        self.ttl_ms = int(ttl * 1000)
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+        self._release_script = register_script(redis_client, RELEASE_SCRIPT)
+    
+    @asynccontextmanager
+    async def hold(self, user_id: str, supersede: bool = False, owner: str = "") -> AsyncIterator[Turn]:
+        """Hold the user's turn lock for the duration of the block.
+        
+        Args:
+            user_id: User identifier
+            supersede: Ask a running turn to stop instead of waiting for it to finish
+            owner: Idempotency key of the request, if any; a running turn
+                with the same owner is never superseded
+        
+        Yields:
+            The held turn
+        
+        Raises:
+            UserBusyError: If the lock was not acquired within ``wait_timeout``
+        """
+        lock_key = keys.turn_lock_key(user_id)
+        cancel_key = keys.turn_cancel_key(user_id)
+        token = f"{uuid.uuid4().hex}:{owner}"
+        
+        started = time.monotonic()
+        superseded = None
+        while not self.redis.set(lock_key, token, nx=True, px=self.ttl_ms):
+            waited = time.monotonic() - started
+            if waited >= self.wait_timeout:
+                raise UserBusyError(user_id, waited)
+            if supersede:
+                holder = self.redis.get(lock_key)
+                if holder and holder != superseded and not (owner and holder.endswith(f":{owner}")):
+                    self.redis.set(cancel_key, holder, px=self.ttl_ms)
+                    superseded = holder
+                    metrics.TURNS_SUPERSEDED.inc()
+                    logger.info(f"Superseding the running turn for {user_id}")
+            await asyncio.sleep(self.poll_interval)
+        metrics.TURN_LOCK_WAIT.observe(time.monotonic() - started)
+        
+        turn = Turn(token)
+        watcher = asyncio.ensure_future(self._watch(lock_key, cancel_key, turn))
+        try:
+            yield turn
+        finally:
+            watcher.cancel()
+            self._release(lock_key, cancel_key, token)
+    
+    async def _watch(self, lock_key: str, cancel_key: str, turn: Turn) -> None:
+        """Renew the lock while it is held and flag cancellation requests."""
+        renewed = time.monotonic()
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            values = self.redis.mget(lock_key, cancel_key)
+            holder, cancel = values[0], values[1]
+            if cancel == turn.token:
+                turn.cancelled = True
+                return
+            if holder != turn.token:
+                logger.warning(f"Lost turn lock {lock_key}; it expired while held")
+                return
+            if time.monotonic() - renewed >= self.ttl_ms / 3000:
+                self.redis.pexpire(lock_key, self.ttl_ms)
+                renewed = time.monotonic()
+    
+    def _release(self, lock_key: str, cancel_key: str, token: str) -> None:
+        """Delete the lock (and any cancellation aimed at it) if still ours.
+        
+        Compare and delete run in one script, so a lock another turn took
+        over after ours expired is never deleted.
+        """
+        self._release_script(
+            keys=[lock_key, cancel_key],
+            args=[token],
+            client=node_for_key(self.redis, lock_key)
+        )
+
+
+class IdempotencyStore:
+    """Stored replies by client idempotency key."""
+    
+    def __init__(self, redis_client: Redis, ttl: int = 86400):
+        """Initialize store.
+        
+        Args:
+            redis_client: Redis client instance
+            ttl: Seconds a reply stays available for retries
+        """
+        self.redis = redis_client
+        self.ttl = ttl
+    
+    def get(self, user_id: str, key: str) -> Optional[Dict[str, Any]]:
+        """Get the stored reply for a request.
+        
+        Args:
+            user_id: User identifier
+            key: Client idempotency key
+        
+        Returns:
+            The stored reply, or None if the request has not completed
+        """
+        data = self.redis.get(keys.idempotency_key(user_id, key))
+        return json.loads(data) if data else None
+    
+    def put(self, user_id: str, key: str, reply: Dict[str, Any]) -> None:
+        """Store the reply to a request.
+        
+        Args:
+            user_id: User identifier
+            key: Client idempotency key
+            reply: JSON-serializable reply
+        """
+        self.redis.setex(keys.idempotency_key(user_id, key), self.ttl, json.dumps(reply))
@@ -0,0 +1,248 @@
+"""Write-behind persistence of chat replies and session stats.
+
+With ``WRITE_DURABILITY=buffered`` a chat turn returns its reply as soon as it
+is generated. The assistant message and the session's ``message_count`` are
+queued here and written by a background task every
+``WRITE_BEHIND_INTERVAL`` seconds, or sooner once ``WRITE_BEHIND_MAX_BATCH``
+messages are waiting. A flush writes each user's queued messages and reads
+the updated history length in one MULTI/EXEC transaction per user. It then
+updates all touched sessions in two more round trips, however many turns it
+covers.
+
+Trade-offs against ``sync``:
+
+- Queued writes are lost if the process dies before the next flush. On a
+  normal shutdown the buffer is flushed after in-flight generations finish.
+- A turn flushes the user's queued reply before it releases the user's turn
+  lock, so the next turn, on any worker, sees it. The reply is sent first:
+  over HTTP the flush runs as a background task after the response, still
+  holding the lock. Only that user's writes are flushed; other users' wait
+  for the periodic flush.
+- A failed flush is retried at the next interval. Each user's writes are one
+  transaction, so a partly failed flush never writes a message twice.
+  Session updates for the same user are merged.
+"""
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from redis import Redis
+from redis.exceptions import RedisError
+
+from app import metrics
+from app.memory import ChatMemoryManager
+from app.session import SessionManager
+
+logger = logging.getLogger(__name__)
+
+# Write durability modes (WRITE_DURABILITY)
+DURABILITY_MODES = ("sync", "buffered")
+
+
+class WriteBehindBuffer:
+    """Queues history and session writes and flushes them in batches."""
+    
+    def __init__(
+        self,
+        redis_client: Redis,
+        session_manager: SessionManager,
+        interval: float = 0.05,
+        max_batch: int = 256
+    ):
+        """Initialize buffer.
+        
+        Args:
+            redis_client: Redis client instance
+            session_manager: Session manager used for session updates
+            interval: Seconds between flushes
+            max_batch: Queued messages that trigger an early flush
+        """
+        self.redis = redis_client
+        self.session_manager = session_manager
+        self.interval = interval
+        self.max_batch = max_batch
+        self._messages: List[Tuple[ChatMemoryManager, Dict[str, Any]]] = []
+        self._sessions: Dict[str, Tuple[Dict[str, Any], Optional[ChatMemoryManager]]] = {}
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+    
+    @property
+    def pending(self) -> int:
+        """Number of queued messages and session updates."""
+        return len(self._messages) + len(self._sessions)
+    
+    def add_message(
+        self,
+        memory: ChatMemoryManager,
+        role: str,
+        content: str,
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """Queue a message for a user's history.
+        
+        Args:
+            memory: Memory manager of the user
+            role: Message role
+            content: Message content
+            metadata: Optional metadata about the message
+        
+        Returns:
+            The queued message (its id and timestamp are final)
+        """
+        message = memory.new_message(role, content, metadata)
+        self._messages.append((memory, message))
+        metrics.WRITE_BEHIND_PENDING.set(self.pending)
+        if len(self._messages) >= self.max_batch:
+            self._wake.set()
+        return message
+    
+    def update_session(
+        self,
+        user_id: str,
+        updates: Optional[Dict[str, Any]] = None,
+        count_messages: Optional[ChatMemoryManager] = None
+    ) -> None:
+        """Queue a session update, merged with any still queued for the user.
+        
+        Args:
+            user_id: User identifier
+            updates: Session fields to set
+            count_messages: Memory manager whose history length (in turns)
+                is stored as ``message_count`` at flush time
+        """
+        queued, counter = self._sessions.get(user_id, ({}, None))
+        self._sessions[user_id] = ({**queued, **(updates or {})}, count_messages or counter)
+        metrics.WRITE_BEHIND_PENDING.set(self.pending)
+    
+    def has_pending(self, user_id: str) -> bool:
+        """Whether writes for a user are still queued."""
+        return user_id in self._sessions or any(memory.user_id == user_id for memory, _ in self._messages)
+    
+    def flush_user(self, user_id: str) -> int:
+        """Write only the user's queued messages and session update now.
+        
+        Used before the user's history is read and before their turn lock is
+        released. Other users' writes are left for the periodic flush.
+        
+        Returns:
+            Number of messages and session updates written
+        """
+        messages = [(memory, message) for memory, message in self._messages if memory.user_id == user_id]
+        if messages:
+            self._messages = [(memory, message) for memory, message in self._messages if memory.user_id != user_id]
+        sessions = {user_id: self._sessions.pop(user_id)} if user_id in self._sessions else {}
+        return self._write(messages, sessions)
+    
+    def flush(self) -> int:
+        """Write everything queued.
+        
+        Returns:
+            Number of messages and session updates written; anything that
+            failed stays queued for the next flush
+        """
+        messages, self._messages = self._messages, []
+        sessions, self._sessions = self._sessions, {}
+        return self._write(messages, sessions)
+    
+    def _write(
+        self,
+        messages: List[Tuple[ChatMemoryManager, Dict[str, Any]]],
+        sessions: Dict[str, Tuple[Dict[str, Any], Optional[ChatMemoryManager]]]
+    ) -> int:
+        """Write taken messages and session updates, requeueing what failed."""
+        if not messages and not sessions:
+            return 0
+        
+        by_user: Dict[str, List[Tuple[ChatMemoryManager, Dict[str, Any]]]] = {}
+        for memory, message in messages:
+            by_user.setdefault(memory.user_id, []).append((memory, message))
+        
+        updates = {user_id: dict(changes) for user_id, (changes, _) in sessions.items()}
+        failed_messages: List[Tuple[ChatMemoryManager, Dict[str, Any]]] = []
+        failed_sessions: Dict[str, Tuple[Dict[str, Any], Optional[ChatMemoryManager]]] = {}
+        for user_id in dict.fromkeys(list(by_user) + list(sessions)):
+            user_messages = by_user.get(user_id, [])
+            counter = sessions[user_id][1] if user_id in sessions else None
+            if not user_messages and counter is None:
+                continue
+            try:
+                self._write_user(user_messages, counter, updates)
+            except RedisError as e:
+                failed_messages.extend(user_messages)
+                if user_id in sessions:
+                    failed_sessions[user_id] = sessions[user_id]
+                    del updates[user_id]
+                logger.warning(f"Write-behind flush for {user_id} failed, queued for retry: {e}")
+        
+        try:
+            self.session_manager.update_sessions(updates)
+        except RedisError as e:
+            failed_sessions.update({user_id: (changes, None) for user_id, changes in updates.items()})
+            logger.warning(f"Write-behind session update failed, queued for retry: {e}")
+            updates = {}
+        
+        if failed_messages or failed_sessions:
+            self._requeue(failed_messages, failed_sessions)
+            metrics.WRITE_BEHIND_FLUSHES.labels(result="error").inc()
+        else:
+            metrics.WRITE_BEHIND_FLUSHES.labels(result="ok").inc()
+            metrics.WRITE_BEHIND_PENDING.set(self.pending)
+        return len(messages) - len(failed_messages) + len(updates)
+    
+    def _write_user(
+        self,
+        messages: List[Tuple[ChatMemoryManager, Dict[str, Any]]],
+        counter: Optional[ChatMemoryManager],
+        updates: Dict[str, Dict[str, Any]]
+    ) -> None:
+        """Write one user's queued messages in a transaction, reading the new count."""
+        pipe = self.redis.pipeline()
+        for memory, message in messages:
+            memory.queue_message(pipe, message)
+        if counter is not None:
+            counter.queue_count(pipe)
+        results = pipe.execute()
+        if counter is not None:
+            updates[counter.user_id]["message_count"] = results[-1] // 2
+    
+    def _requeue(
+        self,
+        messages: List[Tuple[ChatMemoryManager, Dict[str, Any]]],
+        sessions: Dict[str, Tuple[Dict[str, Any], Optional[ChatMemoryManager]]]
+    ) -> None:
+        """Put failed writes back ahead of anything queued since."""
+        self._messages = messages + self._messages
+        for user_id, (changes, counter) in sessions.items():
+            newer, newer_counter = self._sessions.get(user_id, ({}, None))
+            self._sessions[user_id] = ({**changes, **newer}, newer_counter or counter)
+        metrics.WRITE_BEHIND_PENDING.set(self.pending)
+    
+    def start(self) -> None:
+        """Start the background flush task."""
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+    
+    async def _run(self) -> None:
+        """Flush every ``interval`` seconds, or early when woken."""
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            self.flush()
+    
+    async def close(self) -> int:
+        """Stop the background task and flush what is left.
+        
+        Returns:
+            Number of writes left unflushed (lost) because Redis failed
+        """
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        self.flush()
+        if self.pending:
+            logger.error(f"Shutting down with {self.pending} unflushed writes")
+        return self.pending
@@ -0,0 +1,94 @@
+"""Compare two benchmark result files and flag regressions.
+
+Usage::
+
+    python -m benchmarks.compare benchmarks/results/baseline.json benchmarks/results/load-....json --threshold 0.10
+
+Throughput (``throughput_rps``, ``ops_per_sec``) regresses when it drops;
+latency percentiles (``latency_ms``, ``ttft_ms``, ``time_us``) regress when
+they grow. Exits with status 1 if any metric regresses by more than the
+threshold.
+"""
+import argparse
+import sys
+from typing import Dict, Iterator, Tuple
+
+from benchmarks.report import load_results
+
+HIGHER_IS_BETTER = ("throughput_rps", "ops_per_sec")
+LOWER_IS_BETTER = ("latency_ms", "ttft_ms", "time_us")
+PERCENTILES = ("p50", "p95", "p99")
+
+
+def comparable_metrics(results: Dict, percentiles=PERCENTILES) -> Iterator[Tuple[str, float, bool]]:
+    """Yield (metric path, value, higher_is_better) for every compared metric."""
+    for scenario, result in results.items():
+        for key, value in result.items():
+            if key in HIGHER_IS_BETTER and isinstance(value, (int, float)):
+                yield f"{scenario}.{key}", float(value), True
+            elif key in LOWER_IS_BETTER and isinstance(value, dict):
+                for p in percentiles:
+                    if p in value:
+                        yield f"{scenario}.{key}.{p}", float(value[p]), False
+
+
+def compare(baseline: Dict, candidate: Dict, threshold: float, percentiles=PERCENTILES) -> Tuple[list, list]:
+    """Compare two result sets.
+    
+    Args:
+        baseline: ``results`` of the baseline run
+        candidate: ``results`` of the new run
+        threshold: Allowed relative change in the bad direction (0.1 = 10%)
+        percentiles: Latency percentiles to compare
+    
+    Returns:
+        (rows, regressions); rows are (metric, base, new, change, regressed)
+    """
+    base_metrics = {path: (value, higher) for path, value, higher in comparable_metrics(baseline, percentiles)}
+    rows, regressions = [], []
+    
+    for path, value, higher in comparable_metrics(candidate, percentiles):
+        if path not in base_metrics:
+            continue
+        base = base_metrics[path][0]
+        change = (value - base) / base if base else 0.0
+        regressed = (-change if higher else change) > threshold
+        rows.append((path, base, value, change, regressed))
+        if regressed:
+            regressions.append(path)
+    
+    return rows, regressions
+
+
+def main() -> None:
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Allowed relative regression")
+    args = parser.parse_args()
+    
+    baseline = load_results(args.baseline)
+    candidate = load_results(args.candidate)
+    print(f"baseline:  {baseline['environment'].get('commit')}  {args.baseline}")
+    print(f"candidate: {candidate['environment'].get('commit')}  {args.candidate}")
+    changed = sorted(
+        key for key in set(baseline["config"]) | set(candidate["config"])
+        if baseline["config"].get(key) != candidate["config"].get(key)
+    )
+    if changed:
+        print(f"warning: runs used different settings ({', '.join(changed)})")
+    
+    rows, regressions = compare(baseline["results"], candidate["results"], args.threshold)
+    for path, base, value, change, regressed in rows:
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{path:<45} {base:>12.3f} -> {value:>12.3f}  {change:+7.1%}{flag}")
+    
+    if regressions:
+        print(f"\n{len(regressions)} metric(s) regressed more than {args.threshold:.0%}")
+        sys.exit(1)
+    print("\nNo regressions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+"""Stub Ollama server for benchmarks.
+
+Emulates ``/api/tags`` and ``/api/generate`` (streaming and non-streaming)
+with a configurable prompt-evaluation latency and generation speed, so load
+tests measure the API and Redis path instead of a real model. The final
+response carries ``prompt_eval_duration``/``eval_count``/``eval_duration``
+like Ollama does.
+
+The same server also answers the OpenAI-compatible ``/v1/models`` and
+``/v1/chat/completions`` (SSE when streaming), so it can stand in for a
+Groq/vLLM/llama.cpp backend at ``<url>/v1``.
+
+Run standalone::
+
+    python -m benchmarks.fake_ollama --port 11435 --tokens-per-second 50 --latency 0.2
+"""
+import argparse
+import json
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+WORDS = ("I", "hear", "you", "and", "it", "sounds", "like", "today", "has", "been", "a", "lot", "to", "carry")
+
+
+class FakeOllamaServer(ThreadingHTTPServer):
+    """Threaded HTTP server with generation timing parameters."""
+    
+    daemon_threads = True
+    
+    def __init__(
+        self,
+        address: tuple,
+        tokens_per_second: float = 50.0,
+        latency: float = 0.2,
+        tokens: int = 64
+    ):
+        """Initialize server.
+        
+        Args:
+            address: (host, port) to bind; port 0 picks a free port
+            tokens_per_second: Generation speed
+            latency: Seconds before the first token (prompt evaluation)
+            tokens: Tokens per response (capped by the request's num_predict)
+        """
+        super().__init__(address, _Handler)
+        self.tokens_per_second = tokens_per_second
+        self.latency = latency
+        self.tokens = tokens
+    
+    @property
+    def url(self) -> str:
+        """Base URL of the server."""
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+    
+    def start_background(self) -> threading.Thread:
+        """Serve from a daemon thread."""
+        thread = threading.Thread(target=self.serve_forever, name="fake-ollama", daemon=True)
+        thread.start()
+        return thread
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Request handler for the fake Ollama API."""
+    
+    protocol_version = "HTTP/1.1"
+    
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+    
+    def do_GET(self):
+        if self.path == "/api/tags":
+            self._send_json({"models": [{"name": "fake"}]})
+        elif self.path == "/v1/models":
+            self._send_json({"object": "list", "data": [{"id": "fake", "object": "model"}]})
+        else:
+            self.send_error(404)
+    
+    def do_POST(self):
+        if self.path == "/v1/chat/completions":
+            self._chat_completions()
+            return
+        if self.path != "/api/generate":
+            self.send_error(404)
+            return
+        
+        request = self._read_json()
+        options = request.get("options") or {}
+        tokens = min(self.server.tokens, options.get("num_predict") or self.server.tokens)
+        model = request.get("model", "fake")
+        
+        started = time.perf_counter()
+        time.sleep(self.server.latency)
+        prompt_eval = time.perf_counter() - started
+        
+        if request.get("stream", True):
+            self._stream(model, tokens, prompt_eval)
+        else:
+            time.sleep(tokens / self.server.tokens_per_second)
+            text = " ".join(WORDS[i % len(WORDS)] for i in range(tokens))
+            self._send_json({
+                "model": model,
+                "response": text,
+                "done": True,
+                **self._stats(tokens, prompt_eval, time.perf_counter() - started - prompt_eval)
+            })
+    
+    def _chat_completions(self) -> None:
+        """Answer an OpenAI-style chat completion."""
+        request = self._read_json()
+        tokens = min(self.server.tokens, request.get("max_tokens") or self.server.tokens)
+        model = request.get("model", "fake")
+        time.sleep(self.server.latency)
+        
+        if not request.get("stream"):
+            time.sleep(tokens / self.server.tokens_per_second)
+            text = " ".join(WORDS[i % len(WORDS)] for i in range(tokens))
+            self._send_json({
+                "object": "chat.completion",
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 32, "completion_tokens": tokens, "total_tokens": 32 + tokens}
+            })
+            return
+        
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        
+        delay = 1.0 / self.server.tokens_per_second
+        for i in range(tokens):
+            token = WORDS[i % len(WORDS)] + " "
+            self._write_event({
+                "object": "chat.completion.chunk",
+                "model": model,
+                "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}]
+            })
+            time.sleep(delay)
+        self._write_event({
+            "object": "chat.completion.chunk",
+            "model": model,
+            "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]
+        })
+        self._write_raw(b"data: [DONE]\n\n")
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+    
+    def _stream(self, model: str, tokens: int, prompt_eval: float) -> None:
+        """Write NDJSON chunks with chunked transfer encoding."""
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        
+        delay = 1.0 / self.server.tokens_per_second
+        eval_started = time.perf_counter()
+        for i in range(tokens):
+            token = WORDS[i % len(WORDS)] + " "
+            self._write_chunk({"model": model, "response": token, "done": False})
+            time.sleep(delay)
+        
+        self._write_chunk({
+            "model": model,
+            "response": "",
+            "done": True,
+            **self._stats(tokens, prompt_eval, time.perf_counter() - eval_started)
+        })
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+    
+    def _write_chunk(self, data: dict) -> None:
+        self._write_raw(json.dumps(data).encode() + b"\n")
+    
+    def _write_event(self, data: dict) -> None:
+        self._write_raw(b"data: " + json.dumps(data).encode() + b"\n\n")
+    
+    def _write_raw(self, body: bytes) -> None:
+        self.wfile.write(f"{len(body):x}\r\n".encode() + body + b"\r\n")
+        self.wfile.flush()
+    
+    def _read_json(self) -> dict:
+        length = int(self.headers.get("Content-Length", 0))
+        return json.loads(self.rfile.read(length) or b"{}")
+    
+    def _send_json(self, data: dict) -> None:
+        body = json.dumps(data).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    @staticmethod
+    def _stats(tokens: int, prompt_eval: float, eval_duration: float) -> dict:
+        return {
+            "prompt_eval_count": 32,
+            "prompt_eval_duration": int(prompt_eval * 1e9),
+            "eval_count": tokens,
+            "eval_duration": int(eval_duration * 1e9)
+        }
+
+
+def main() -> None:
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description="Stub Ollama server for benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--tokens-per-second", type=float, default=50.0)
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds before the first token")
+    parser.add_argument("--tokens", type=int, default=64, help="Tokens per response")
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.INFO)
+    server = FakeOllamaServer(
+        (args.host, args.port),
+        tokens_per_second=args.tokens_per_second,
+        latency=args.latency,
+        tokens=args.tokens
+    )
+    logger.info(f"Fake Ollama listening on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
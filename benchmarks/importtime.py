@@ -0,0 +1,120 @@
+"""Import-time (cold start) benchmark.
+
+Runs ``python -X importtime -c "import <module>"`` in fresh interpreters and
+reports the module's cumulative import time, the peak RSS of the process
+and the heaviest imports::
+
+    python -m benchmarks.importtime
+    python -m benchmarks.importtime --module app.main --runs 10 --top 15
+
+Results use the same JSON format as the other suites, so two commits can be
+compared with ``benchmarks.compare``.
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+from typing import Dict, List, Optional, Tuple
+
+from benchmarks.report import summarize, write_results
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def import_once(module: str) -> Tuple[float, Dict[str, int], float]:
+    """Import a module in a fresh interpreter.
+    
+    Args:
+        module: Module to import
+    
+    Returns:
+        (module import seconds, cumulative microseconds per package, peak RSS in MB)
+    """
+    # Read the RSS of the importing child from a small wrapper process so
+    # every run is measured on its own.
+    code = (
+        "import resource, subprocess, sys; "
+        "subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import ' + sys.argv[1]], check=True); "
+        "print(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss, file=sys.stderr)"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code, module],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    lines = result.stderr.strip().splitlines()
+    rss_mb = int(lines[-1]) / 1024
+    
+    entries = []
+    for line in lines[:-1]:
+        match = LINE.match(line)
+        if match:
+            depth = (len(match.group(3)) - 1) // 2
+            entries.append((depth, match.group(4), int(match.group(2))))
+    
+    # -X importtime lists children before their parent. Charge each package
+    # for the subtrees where it is entered from another package, so e.g.
+    # ``langchain.schema`` imported from ``app.memory`` counts for langchain.
+    own_package = module.split(".")[0]
+    module_micros = 0
+    packages: Dict[str, int] = {}
+    for index, (depth, name, cumulative) in enumerate(entries):
+        if name == module:
+            module_micros = cumulative
+        parent = next((e[1] for e in entries[index + 1:] if e[0] < depth), None)
+        package = name.split(".")[0]
+        if parent is None or package == own_package or parent.split(".")[0] == package:
+            continue
+        packages[package] = packages.get(package, 0) + cumulative
+    return module_micros / 1e6, packages, rss_mb
+
+
+def run(module: str, runs: int) -> Tuple[List[float], List[float], Dict[str, List[int]]]:
+    """Import a module ``runs`` times.
+    
+    Returns:
+        (module import seconds per run, RSS MB per run, per-package microseconds)
+    """
+    totals, rss, per_package = [], [], {}
+    for _ in range(runs):
+        seconds, packages, rss_mb = import_once(module)
+        totals.append(seconds)
+        rss.append(rss_mb)
+        for name, micros in packages.items():
+            per_package.setdefault(name, []).append(micros)
+    return totals, rss, per_package
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description="Measure worker cold-start import time")
+    parser.add_argument("--module", action="append", help="Module to import (repeatable, default app.main)")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="Heaviest packages to list")
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/importtime-<time>-<commit>.json)")
+    args = parser.parse_args(argv)
+    
+    modules = args.module or ["app.main"]
+    results = {}
+    for module in modules:
+        totals, rss, per_package = run(module, args.runs)
+        heaviest = sorted(per_package.items(), key=lambda item: -min(item[1]))[:args.top]
+        results[module] = {
+            "runs": args.runs,
+            "time_us": summarize(totals, scale=1e6),
+            "max_rss_mb": round(max(rss), 1),
+            "heaviest_packages_ms": {name: round(min(micros) / 1000, 1) for name, micros in heaviest}
+        }
+        
+        print(f"{module}: p50 {results[module]['time_us']['p50'] / 1000:.1f} ms, "
+              f"max RSS {results[module]['max_rss_mb']} MB")
+        for name, ms in results[module]["heaviest_packages_ms"].items():
+            print(f"  {ms:>8.1f} ms  {name}")
+    
+    path = write_results("importtime", {"modules": modules, "runs": args.runs}, results, args.output)
+    print(f"\nResults written to {path}")
+
+
+if __name__ == "__main__":
+    main()
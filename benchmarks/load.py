@@ -0,0 +1,263 @@
+"""Load-test scenarios for the chat API.
+
+Starts ``benchmarks.serve`` (API + fakeredis + stub Ollama) in a subprocess,
+runs the scenarios with N concurrent users and writes throughput, latency
+and time-to-first-token percentiles to ``benchmarks/results``::
+
+    python -m benchmarks.load --users 20 --messages 5
+    python -m benchmarks.load --target http://localhost:8000 --scenarios chat,history
+
+Scenarios:
+
+- ``chat``: each user sends ``--messages`` turns through ``POST /api/chat``
+- ``websocket``: each user streams ``--messages`` turns over ``/ws/chat``;
+  TTFT is the time to the first ``chunk`` message
+- ``history``: each user reads ``GET /session/{user_id}/history`` ``--reads`` times
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from benchmarks.report import print_table, summarize, write_results
+
+SCENARIOS = ("chat", "websocket", "history")
+
+
+class ScenarioResult:
+    """Latencies and errors collected while a scenario runs."""
+    
+    def __init__(self):
+        """Initialize empty result."""
+        self.latencies: List[float] = []
+        self.ttfts: List[float] = []
+        self.errors = 0
+        self.started = time.perf_counter()
+        self.finished = self.started
+    
+    def summary(self) -> Dict[str, Any]:
+        """Throughput and latency percentiles for the scenario."""
+        duration = self.finished - self.started
+        result = {
+            "requests": len(self.latencies),
+            "errors": self.errors,
+            "duration_s": round(duration, 3),
+            "throughput_rps": round(len(self.latencies) / duration, 3) if duration else 0.0,
+            "latency_ms": summarize(self.latencies)
+        }
+        if self.ttfts:
+            result["ttft_ms"] = summarize(self.ttfts)
+        return result
+
+
+def user_id(prefix: str, index: int) -> str:
+    """Benchmark user id (no underscores: ``/api/chat`` splits session ids on them)."""
+    return f"{prefix}{index:04d}"
+
+
+async def start_sessions(client: httpx.AsyncClient, prefix: str, users: int) -> None:
+    """Create a session for every benchmark user."""
+    async def start(i):
+        response = await client.post("/session/start", json={"user_id": user_id(prefix, i)})
+        response.raise_for_status()
+    await asyncio.gather(*(start(i) for i in range(users)))
+
+
+async def run_chat(client: httpx.AsyncClient, prefix: str, users: int, messages: int) -> ScenarioResult:
+    """Concurrent users chatting through ``POST /api/chat``."""
+    result = ScenarioResult()
+    
+    async def user(i):
+        session_id = f"session_{user_id(prefix, i)}_0"
+        for n in range(messages):
+            started = time.perf_counter()
+            try:
+                response = await client.post("/api/chat", json={
+                    "session_id": session_id,
+                    "user_message": f"Benchmark message {n}: how can I sleep better?"
+                })
+                response.raise_for_status()
+                result.latencies.append(time.perf_counter() - started)
+            except httpx.HTTPError:
+                result.errors += 1
+    
+    await asyncio.gather(*(user(i) for i in range(users)))
+    result.finished = time.perf_counter()
+    return result
+
+
+async def run_websocket(ws_url: str, prefix: str, users: int, messages: int) -> ScenarioResult:
+    """Concurrent users streaming replies over ``/ws/chat/{user_id}``."""
+    import websockets
+    
+    result = ScenarioResult()
+    
+    async def user(i):
+        try:
+            async with websockets.connect(f"{ws_url}/ws/chat/{user_id(prefix, i)}") as ws:
+                for n in range(messages):
+                    started = time.perf_counter()
+                    first_token = None
+                    await ws.send(json.dumps({"text": f"Benchmark message {n}"}))
+                    while True:
+                        message = json.loads(await ws.recv())
+                        if message["type"] == "chunk" and first_token is None:
+                            first_token = time.perf_counter() - started
+                        elif message["type"] == "complete":
+                            result.latencies.append(time.perf_counter() - started)
+                            if first_token is not None:
+                                result.ttfts.append(first_token)
+                            break
+                        elif message["type"] == "error":
+                            result.errors += 1
+                            break
+        except (OSError, websockets.WebSocketException):
+            result.errors += 1
+    
+    await asyncio.gather(*(user(i) for i in range(users)))
+    result.finished = time.perf_counter()
+    return result
+
+
+async def run_history(client: httpx.AsyncClient, prefix: str, users: int, reads: int) -> ScenarioResult:
+    """Concurrent users reading their conversation history."""
+    result = ScenarioResult()
+    
+    async def user(i):
+        for _ in range(reads):
+            started = time.perf_counter()
+            try:
+                response = await client.get(f"/session/{user_id(prefix, i)}/history", params={"limit": 50})
+                response.raise_for_status()
+                result.latencies.append(time.perf_counter() - started)
+            except httpx.HTTPError:
+                result.errors += 1
+    
+    await asyncio.gather(*(user(i) for i in range(users)))
+    result.finished = time.perf_counter()
+    return result
+
+
+async def run_scenarios(args, base_url: str) -> Dict[str, Any]:
+    """Run the selected scenarios one after another."""
+    results = {}
+    limits = httpx.Limits(max_connections=args.users, max_keepalive_connections=args.users)
+    
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=args.timeout) as client:
+        await start_sessions(client, args.prefix, args.users)
+        
+        for scenario in args.scenarios:
+            if scenario == "chat":
+                result = await run_chat(client, args.prefix, args.users, args.messages)
+            elif scenario == "websocket":
+                ws_url = "ws" + base_url[len("http"):]
+                result = await run_websocket(ws_url, args.prefix, args.users, args.messages)
+            else:
+                result = await run_history(client, args.prefix, args.users, args.reads)
+            results[scenario] = result.summary()
+    
+    return results
+
+
+def free_port() -> int:
+    """Pick an unused local TCP port."""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(args) -> (subprocess.Popen, str):
+    """Start ``benchmarks.serve`` and wait until it answers ``/health``."""
+    port = free_port()
+    command = [
+        sys.executable, "-m", "benchmarks.serve",
+        "--port", str(port),
+        "--tokens-per-second", str(args.tokens_per_second),
+        "--latency", str(args.latency),
+        "--tokens", str(args.tokens),
+        "--seed-prefix", args.prefix,
+        "--seed-users", str(args.users),
+        "--seed-messages", str(args.history_length)
+    ]
+    if args.redis_url:
+        command += ["--redis-url", args.redis_url]
+    if args.max_concurrent:
+        command += ["--max-concurrent", str(args.max_concurrent)]
+    
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    process = subprocess.Popen(command, cwd=root)
+    base_url = f"http://127.0.0.1:{port}"
+    
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Benchmark server exited with code {process.returncode}")
+        try:
+            if httpx.get(f"{base_url}/health", timeout=1).status_code == 200:
+                return process, base_url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    
+    process.terminate()
+    raise RuntimeError("Benchmark server did not become healthy in 30s")
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """Parse command-line arguments."""
+    parser = argparse.ArgumentParser(description="Load-test the chat API")
+    parser.add_argument("--target", help="Benchmark a running server instead of starting one")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        type=lambda s: [x.strip() for x in s.split(",") if x.strip()])
+    parser.add_argument("--users", type=int, default=10, help="Concurrent users")
+    parser.add_argument("--messages", type=int, default=5, help="Chat turns per user")
+    parser.add_argument("--reads", type=int, default=20, help="History reads per user")
+    parser.add_argument("--history-length", type=int, default=10, help="Messages seeded per user")
+    parser.add_argument("--prefix", default="bench", help="User id prefix")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--tokens-per-second", type=float, default=50.0, help="Stub Ollama speed")
+    parser.add_argument("--latency", type=float, default=0.2, help="Stub Ollama time to first token")
+    parser.add_argument("--tokens", type=int, default=64, help="Stub Ollama tokens per reply")
+    parser.add_argument("--max-concurrent", type=int, help="MAX_CONCURRENT_GENERATIONS for the server")
+    parser.add_argument("--redis-url", help="Real Redis for the server instead of fakeredis")
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/load-<time>-<commit>.json)")
+    args = parser.parse_args(argv)
+    
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+    return args
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Command-line entry point."""
+    args = parse_args(argv)
+    
+    process = None
+    if args.target:
+        base_url = args.target.rstrip("/")
+    else:
+        process, base_url = start_server(args)
+    
+    try:
+        results = asyncio.run(run_scenarios(args, base_url))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=10)
+    
+    config = {k: v for k, v in vars(args).items() if k != "output"}
+    path = write_results("load", config, results, args.output)
+    print_table(results)
+    print(f"\nResults written to {path}")
+
+
+if __name__ == "__main__":
+    main()
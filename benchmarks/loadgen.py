@@ -0,0 +1,248 @@
+"""Capacity-planning load generator simulating realistic users.
+
+Each virtual user starts a session, holds a ``--turns`` turn conversation
+with think time between messages (exponentially distributed around
+``--think-time``), reads its history every ``--history-every`` turns, clears
+the session and starts a new conversation, until ``--duration`` is up.
+Users are started evenly over ``--ramp-up`` seconds, so the per-second
+timeline shows how latency and throughput change as concurrency grows::
+
+    python -m benchmarks.loadgen --target http://localhost:8000 --users 50 --ramp-up 60 --duration 300
+    python -m benchmarks.loadgen --target http://localhost:8000 --transport websocket --think-time 8
+
+Results (latency and TTFT percentiles per operation plus the timeline) are
+written in the same JSON format as ``benchmarks.load`` and can be compared
+with ``benchmarks.compare``.
+"""
+import argparse
+import asyncio
+import random
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from benchmarks.report import print_table, summarize, write_results
+from client_async import AsyncNonoChatbotClient, ChatStreamError
+
+MESSAGES = (
+    "Hi, I've been feeling overwhelmed lately",
+    "Work has been really stressful this week",
+    "I keep waking up at 3am and can't get back to sleep",
+    "What can I do to manage stress better?",
+    "That makes sense, can you give me an example?",
+    "Thanks, I'll try that tonight"
+)
+
+
+class OperationStats:
+    """Latencies, TTFTs and errors for one kind of operation."""
+    
+    def __init__(self):
+        """Initialize empty stats."""
+        self.latencies: List[float] = []
+        self.ttfts: List[float] = []
+        self.errors: Counter = Counter()
+    
+    def summary(self, duration: float) -> Dict[str, Any]:
+        """Throughput and latency percentiles over the run."""
+        result = {
+            "requests": len(self.latencies),
+            "errors": sum(self.errors.values()),
+            "throughput_rps": round(len(self.latencies) / duration, 3) if duration else 0.0,
+            "latency_ms": summarize(self.latencies)
+        }
+        if self.ttfts:
+            result["ttft_ms"] = summarize(self.ttfts)
+        if self.errors:
+            result["error_types"] = dict(self.errors)
+        return result
+
+
+class LoadGenerator:
+    """Runs virtual users against the API and records what they see."""
+    
+    def __init__(self, client: AsyncNonoChatbotClient, args: argparse.Namespace):
+        """Initialize load generator.
+        
+        Args:
+            client: Shared pooled API client
+            args: Parsed command-line arguments
+        """
+        self.client = client
+        self.args = args
+        self.random = random.Random(args.seed)
+        self.stats: Dict[str, OperationStats] = {}
+        self.timeline: Dict[int, Dict[str, Any]] = {}
+        self.active_users = 0
+        self.started = 0.0
+        self.deadline = 0.0
+    
+    def _second(self) -> Dict[str, Any]:
+        second = int(time.perf_counter() - self.started)
+        bucket = self.timeline.get(second)
+        if bucket is None:
+            bucket = self.timeline[second] = {
+                "second": second, "active_users": 0, "completed": 0, "errors": 0, "chat_latencies": []
+            }
+        bucket["active_users"] = max(bucket["active_users"], self.active_users)
+        return bucket
+    
+    async def _timed(self, operation: str, coro) -> Any:
+        """Await an API call, recording its latency or error."""
+        stats = self.stats.setdefault(operation, OperationStats())
+        started = time.perf_counter()
+        try:
+            result = await coro
+        except httpx.HTTPStatusError as e:
+            stats.errors[f"HTTP {e.response.status_code}"] += 1
+            self._second()["errors"] += 1
+            return None
+        except (httpx.HTTPError, ChatStreamError, OSError) as e:
+            stats.errors[type(e).__name__] += 1
+            self._second()["errors"] += 1
+            return None
+        
+        latency = time.perf_counter() - started
+        stats.latencies.append(latency)
+        bucket = self._second()
+        bucket["completed"] += 1
+        if operation == "chat":
+            bucket["chat_latencies"].append(latency)
+        return result
+    
+    async def _think(self) -> None:
+        if self.args.think_time > 0:
+            delay = min(self.random.expovariate(1 / self.args.think_time), self.args.think_time * 4)
+            await asyncio.sleep(min(delay, max(self.deadline - time.perf_counter(), 0)))
+    
+    async def _stream_turn(self, chat, text: str) -> None:
+        async for _ in chat.ask(text):
+            pass
+        if chat.last_ttft is not None:
+            self.stats.setdefault("chat", OperationStats()).ttfts.append(chat.last_ttft)
+    
+    async def _conversation(self, user_id: str) -> None:
+        if await self._timed("session_start", self.client.start_session(user_id, self.args.persona)) is None:
+            await self._think()
+            return
+        
+        async def turns(chat=None):
+            for turn in range(1, self.args.turns + 1):
+                if time.perf_counter() >= self.deadline:
+                    return
+                text = self.random.choice(MESSAGES)
+                if chat is None:
+                    await self._timed("chat", self.client.send_message(user_id, text))
+                else:
+                    await self._timed("chat", self._stream_turn(chat, text))
+                if self.args.history_every and turn % self.args.history_every == 0:
+                    await self._timed("history", self.client.get_history(user_id))
+                await self._think()
+        
+        if self.args.transport == "websocket":
+            try:
+                async with self.client.chat_socket(user_id) as chat:
+                    await turns(chat)
+            except OSError as e:
+                self.stats.setdefault("chat", OperationStats()).errors[type(e).__name__] += 1
+        else:
+            await turns()
+        
+        await self._timed("clear", self.client.clear_session(user_id))
+    
+    async def _user(self, index: int, start_delay: float) -> None:
+        await asyncio.sleep(start_delay)
+        self.active_users += 1
+        self._second()
+        try:
+            conversation = 0
+            while time.perf_counter() < self.deadline:
+                await self._conversation(f"{self.args.prefix}{index:04d}c{conversation}")
+                conversation += 1
+        finally:
+            self.active_users -= 1
+    
+    async def run(self) -> Dict[str, Any]:
+        """Run all virtual users until the duration is up.
+        
+        Returns:
+            Per-operation summaries
+        """
+        self.started = time.perf_counter()
+        self.deadline = self.started + self.args.duration
+        users = self.args.users
+        ramp = self.args.ramp_up
+        
+        await asyncio.gather(*(
+            self._user(i, ramp * i / users if users > 1 else 0.0) for i in range(users)
+        ))
+        
+        duration = time.perf_counter() - self.started
+        return {name: stats.summary(duration) for name, stats in self.stats.items()}
+    
+    def timeline_summary(self) -> List[Dict[str, Any]]:
+        """Per-second active users, completions, errors and chat p95."""
+        rows = []
+        for second in sorted(self.timeline):
+            bucket = dict(self.timeline[second])
+            latencies = bucket.pop("chat_latencies")
+            summary = summarize(latencies)
+            bucket["chat_p95_ms"] = summary["p95"] if summary else None
+            rows.append(bucket)
+        return rows
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """Parse command-line arguments."""
+    parser = argparse.ArgumentParser(description="Simulate realistic chat users for capacity planning")
+    parser.add_argument("--target", default="http://localhost:8000", help="API base URL")
+    parser.add_argument("--users", type=int, default=10, help="Peak concurrent users")
+    parser.add_argument("--ramp-up", type=float, default=30.0, help="Seconds over which users are started")
+    parser.add_argument("--duration", type=float, default=120.0, help="Total run time in seconds")
+    parser.add_argument("--turns", type=int, default=6, help="Messages per conversation")
+    parser.add_argument("--think-time", type=float, default=5.0, help="Mean seconds between messages")
+    parser.add_argument("--history-every", type=int, default=3, help="Read history every N turns (0: never)")
+    parser.add_argument("--transport", choices=("http", "websocket"), default="http")
+    parser.add_argument("--persona", default="mental_health_nurse")
+    parser.add_argument("--prefix", default="lg", help="User id prefix (no underscores)")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed for messages and think times")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/loadgen-<time>-<commit>.json)")
+    args = parser.parse_args(argv)
+    
+    if "_" in args.prefix:
+        parser.error("--prefix must not contain '_'")
+    if args.users < 1:
+        parser.error("--users must be at least 1")
+    return args
+
+
+async def run(args: argparse.Namespace) -> tuple:
+    """Run the load test and return (results, timeline)."""
+    async with AsyncNonoChatbotClient(args.target, max_connections=args.users, timeout=args.timeout) as client:
+        generator = LoadGenerator(client, args)
+        results = await generator.run()
+        return results, generator.timeline_summary()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Command-line entry point."""
+    args = parse_args(argv)
+    results, timeline = asyncio.run(run(args))
+    
+    config = {k: v for k, v in vars(args).items() if k != "output"}
+    path = write_results("loadgen", config, results, args.output, timeline=timeline)
+    
+    print(f"{'second':>6} {'users':>6} {'done':>6} {'errors':>6} {'chat p95 ms':>12}")
+    for row in timeline:
+        p95 = "-" if row["chat_p95_ms"] is None else f"{row['chat_p95_ms']:.1f}"
+        print(f"{row['second']:>6} {row['active_users']:>6} {row['completed']:>6} {row['errors']:>6} {p95:>12}")
+    print()
+    print_table(results)
+    print(f"\nResults written to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+"""Micro-benchmarks for the per-turn memory and session hot paths.
+
+Times ``ChatMemoryManager.add_message``, ``get_messages``,
+``get_context_window``, ``get_messages_page`` and
+``SessionManager.update_session`` across message sizes and history lengths,
+against fakeredis (in-process, isolates Python overhead) and a real Redis
+(includes the network round trip). Memory benchmarks run for each history
+storage backend in ``--memory-backends``; those for the stream backend carry
+``memory=stream`` in their parameters::
+
+    python -m benchmarks.micro
+    python -m benchmarks.micro --backends fake,redis --redis-url redis://localhost:6379/15
+    python -m benchmarks.micro --memory-backends list,stream --filter history=1000
+    python -m benchmarks.micro --baseline benchmarks/results/micro-baseline.json --threshold 0.2
+
+Each benchmark is named ``<backend>:<function>[params]`` and reports
+``ops_per_sec`` and ``time_us`` percentiles. With ``--baseline`` the run is
+compared to an earlier results file and the exit status is 1 if the
+throughput or median time of any benchmark regressed by more than
+``--threshold`` (tail percentiles are too noisy at this scale to gate on).
+"""
+import argparse
+import gc
+import sys
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from app.memory import ChatMemoryManager
+from app.session import SessionManager
+from benchmarks.compare import compare
+from benchmarks.report import load_results, print_table, summarize, write_results
+
+MESSAGE_SIZES = (64, 1024, 8192)
+HISTORY_LENGTHS = (10, 100, 1000)
+USER_PREFIX = "microbench"
+
+
+def measure(func: Callable[[], Any], rounds: int, warmup: int) -> List[float]:
+    """Time individual calls of a function.
+    
+    Args:
+        func: Zero-argument callable
+        rounds: Timed calls
+        warmup: Untimed calls made first
+    
+    Returns:
+        Per-call durations in seconds
+    """
+    for _ in range(warmup):
+        func()
+    
+    durations = []
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(rounds):
+            started = time.perf_counter()
+            func()
+            durations.append(time.perf_counter() - started)
+    finally:
+        if gc_enabled:
+            gc.enable()
+    return durations
+
+
+def seeded_memory(redis_client, user_id: str, history: int, size: int, backend: str = "list") -> ChatMemoryManager:
+    """Memory manager whose history already holds ``history`` messages."""
+    memory = ChatMemoryManager(redis_client, user_id, max_messages=history, backend=backend)
+    memory.clear_history()
+    content = "x" * size
+    for n in range(history):
+        memory.add_message("user" if n % 2 == 0 else "assistant", content)
+    return memory
+
+
+def memory_cases(redis_client, backend: str = "list") -> Iterator[Tuple[str, Callable[[], Any]]]:
+    """Yield the memory benchmarks for one history storage backend."""
+    suffix = "" if backend == "list" else f",memory={backend}"
+    user_id = f"{USER_PREFIX}-{backend}-add"
+    for size in MESSAGE_SIZES:
+        memory = seeded_memory(redis_client, user_id, 10, size, backend)
+        content = "x" * size
+        yield f"add_message[size={size},history=10{suffix}]", lambda m=memory, c=content: m.add_message("user", c)
+    
+    memory = seeded_memory(redis_client, user_id, 1000, 1024, backend)
+    yield f"add_message[size=1024,history=1000{suffix}]", lambda m=memory: m.add_message("user", "x" * 1024)
+    
+    for history in HISTORY_LENGTHS:
+        memory = seeded_memory(redis_client, f"{USER_PREFIX}-{backend}-read-{history}", history, 1024, backend)
+        yield f"get_messages[size=1024,history={history}{suffix}]", memory.get_messages
+        yield f"get_context_window[size=1024,history={history}{suffix}]", memory.get_context_window
+    
+    # Second-newest page: the cursor has to be located first
+    cursor = memory.get_messages_page(limit=50)[1]
+    yield f"get_messages_page[size=1024,history=1000{suffix}]", lambda m=memory: m.get_messages_page(
+        limit=50, before=cursor
+    )
+
+
+def cases(redis_client, memory_backends: Tuple[str, ...] = ("list",)) -> Iterator[Tuple[str, Callable[[], Any]]]:
+    """Yield (benchmark name, callable) pairs with their data set up."""
+    for backend in memory_backends:
+        yield from memory_cases(redis_client, backend)
+    
+    sessions = SessionManager(redis_client)
+    sessions.create_session(f"{USER_PREFIX}-session", "mental_health_nurse", {"source": "benchmark"})
+    counter = iter(range(sys.maxsize))
+    yield "update_session", lambda: sessions.update_session(
+        f"{USER_PREFIX}-session", {"message_count": next(counter)}
+    )
+
+
+def cleanup(redis_client) -> None:
+    """Delete every key the benchmarks created."""
+    keys = list(redis_client.scan_iter(match=f"*{USER_PREFIX}*"))
+    if keys:
+        redis_client.delete(*keys)
+
+
+def connect(backend: str, redis_url: str):
+    """Create the Redis client for a backend, or None if it is unreachable."""
+    if backend == "fake":
+        import fakeredis
+        return fakeredis.FakeRedis(decode_responses=True)
+    
+    from redis import Redis
+    from redis.exceptions import RedisError
+    client = Redis.from_url(redis_url, decode_responses=True)
+    try:
+        client.ping()
+    except RedisError as e:
+        print(f"Skipping redis backend ({redis_url}): {e}", file=sys.stderr)
+        return None
+    return client
+
+
+def run(
+    backends: List[str],
+    redis_url: str,
+    rounds: int,
+    warmup: int,
+    filter: Optional[str],
+    memory_backends: Tuple[str, ...] = ("list",)
+) -> Dict[str, Any]:
+    """Run every benchmark on every reachable backend."""
+    results = {}
+    for backend in backends:
+        redis_client = connect(backend, redis_url)
+        if redis_client is None:
+            continue
+        try:
+            for name, func in cases(redis_client, memory_backends):
+                full_name = f"{backend}:{name}"
+                if filter and filter not in full_name:
+                    continue
+                durations = measure(func, rounds, warmup)
+                results[full_name] = {
+                    "rounds": rounds,
+                    "ops_per_sec": round(len(durations) / sum(durations), 1),
+                    "time_us": summarize(durations, scale=1e6)
+                }
+        finally:
+            cleanup(redis_client)
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description="Micro-benchmark memory and session operations")
+    parser.add_argument("--backends", default="fake", help="Comma-separated: fake, redis")
+    parser.add_argument("--redis-url", default="redis://localhost:6379/15")
+    parser.add_argument("--memory-backends", default="list", help="Comma-separated: list, stream")
+    parser.add_argument("--rounds", type=int, default=500)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--filter", help="Only run benchmarks whose name contains this")
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/micro-<time>-<commit>.json)")
+    parser.add_argument("--baseline", help="Results file to check for regressions against")
+    parser.add_argument("--threshold", type=float, default=0.20, help="Allowed relative regression")
+    args = parser.parse_args(argv)
+    
+    backends = [b.strip() for b in args.backends.split(",") if b.strip()]
+    memory_backends = tuple(b.strip() for b in args.memory_backends.split(",") if b.strip())
+    results = run(backends, args.redis_url, args.rounds, args.warmup, args.filter, memory_backends)
+    
+    config = {
+        "backends": backends,
+        "memory_backends": list(memory_backends),
+        "rounds": args.rounds,
+        "warmup": args.warmup,
+        "filter": args.filter
+    }
+    path = write_results("micro", config, results, args.output)
+    print_table(results)
+    print(f"\nResults written to {path}")
+    
+    if args.baseline:
+        rows, regressions = compare(
+            load_results(args.baseline)["results"], results, args.threshold, percentiles=("p50",)
+        )
+        for metric, base, value, change, regressed in rows:
+            if regressed:
+                print(f"REGRESSION {metric}: {base:.3f} -> {value:.3f} ({change:+.1%})")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.threshold:.0%} against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
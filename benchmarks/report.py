@@ -0,0 +1,127 @@
+"""Latency statistics and result files shared by the benchmark scripts."""
+import json
+import os
+import platform
+import subprocess
+import sys
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+def percentile(sorted_values: Sequence[float], q: float) -> float:
+    """Get a percentile by linear interpolation.
+    
+    Args:
+        sorted_values: Values in ascending order
+        q: Percentile (0-100)
+    
+    Returns:
+        Interpolated value (0.0 for no values)
+    """
+    if not sorted_values:
+        return 0.0
+    position = (len(sorted_values) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def summarize(values: List[float], scale: float = 1000.0) -> Optional[Dict[str, float]]:
+    """Summarize durations (in seconds) as p50/p95/p99/mean/max.
+    
+    Args:
+        values: Durations in seconds
+        scale: Multiplier for the output unit (1000 for ms, 1e6 for us)
+    
+    Returns:
+        Summary dictionary, or None if there are no values
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    return {
+        "p50": round(percentile(ordered, 50) * scale, 3),
+        "p95": round(percentile(ordered, 95) * scale, 3),
+        "p99": round(percentile(ordered, 99) * scale, 3),
+        "mean": round(sum(ordered) / len(ordered) * scale, 3),
+        "max": round(ordered[-1] * scale, 3)
+    }
+
+
+def environment() -> Dict[str, Any]:
+    """Describe where the benchmark ran: commit, interpreter and machine."""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    
+    def git(*args) -> str:
+        try:
+            return subprocess.run(
+                ["git", *args], cwd=root, capture_output=True, text=True, check=True
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return ""
+    
+    return {
+        "commit": git("rev-parse", "HEAD") or None,
+        "dirty": bool(git("status", "--porcelain", "--untracked-files=no")),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "timestamp": datetime.utcnow().isoformat()
+    }
+
+
+def write_results(
+    suite: str,
+    config: Dict[str, Any],
+    results: Dict[str, Any],
+    output: Optional[str] = None,
+    **extra
+) -> str:
+    """Write a benchmark run to JSON.
+    
+    Args:
+        suite: Suite name (``load``, ``loadgen`` or ``micro``)
+        config: Parameters the run used
+        results: Per-scenario results
+        output: File path; defaults to ``benchmarks/results/<suite>-<time>-<commit>.json``
+        **extra: Additional top-level fields (e.g. a timeline)
+    
+    Returns:
+        Path written
+    """
+    env = environment()
+    if output is None:
+        stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S")
+        commit = (env["commit"] or "nogit")[:8] + ("-dirty" if env["dirty"] else "")
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"{suite}-{stamp}-{commit}.json")
+    
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({"suite": suite, "environment": env, "config": config, "results": results, **extra}, f, indent=2)
+        f.write("\n")
+    return output
+
+
+def load_results(path: str) -> Dict[str, Any]:
+    """Read a results file written by ``write_results``."""
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def print_table(results: Dict[str, Any], file=sys.stdout) -> None:
+    """Print per-scenario results as an aligned table."""
+    width = max((len(name) for name in results), default=0)
+    for name, result in results.items():
+        parts = [name.ljust(width)]
+        for key, value in result.items():
+            if isinstance(value, dict) and "p50" in value:
+                parts.append(f"{key} p50={value['p50']} p95={value['p95']} p99={value['p99']}")
+            elif isinstance(value, dict):
+                parts.append(f"{key}={value}")
+            elif isinstance(value, float):
+                parts.append(f"{key}={value:.2f}")
+            else:
+                parts.append(f"{key}={value}")
+        print("  ".join(parts), file=file)
@@ -0,0 +1,93 @@
+"""Run the API for benchmarking against fakeredis and the stub Ollama server.
+
+Started as a subprocess by ``benchmarks.load`` so the load generator does
+not share an interpreter (and GIL) with the server under test::
+
+    python -m benchmarks.serve --port 8100 --tokens-per-second 50 --latency 0.2
+
+Pass ``--redis-url`` to use a real Redis instead of fakeredis and
+``--ollama-host`` to use a real Ollama instead of the stub.
+"""
+import argparse
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+
+def seed_history(redis_client, prefix: str, users: int, messages: int) -> None:
+    """Give benchmark users an existing conversation history.
+    
+    Args:
+        redis_client: Redis client the app uses
+        prefix: User id prefix
+        users: Number of users (``<prefix>0000`` ...)
+        messages: Messages per user
+    """
+    from app.memory import ChatMemoryManager
+    
+    text = "This is a seeded benchmark message of fairly typical length for a chat turn."
+    for i in range(users):
+        memory = ChatMemoryManager(redis_client, f"{prefix}{i:04d}", max_messages=messages)
+        for n in range(messages):
+            memory.add_message("user" if n % 2 == 0 else "assistant", text)
+
+
+def main() -> None:
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description="Run the API for benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--redis-url", help="Real Redis to use instead of fakeredis")
+    parser.add_argument("--ollama-host", help="Real Ollama to use instead of the stub server")
+    parser.add_argument("--tokens-per-second", type=float, default=50.0)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--tokens", type=int, default=64)
+    parser.add_argument("--max-concurrent", type=int, help="MAX_CONCURRENT_GENERATIONS for the app")
+    parser.add_argument("--seed-prefix", default="bench")
+    parser.add_argument("--seed-users", type=int, default=0)
+    parser.add_argument("--seed-messages", type=int, default=0)
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.ERROR)
+    
+    if args.ollama_host:
+        ollama_host = args.ollama_host
+    else:
+        from benchmarks.fake_ollama import FakeOllamaServer
+        fake = FakeOllamaServer(
+            ("127.0.0.1", 0),
+            tokens_per_second=args.tokens_per_second,
+            latency=args.latency,
+            tokens=args.tokens
+        )
+        fake.start_background()
+        ollama_host = fake.url
+    
+    # Settings are read on import, so configure the environment first
+    os.environ["OLLAMA_HOST"] = ollama_host
+    os.environ.setdefault("LOG_LEVEL", "ERROR")
+    os.environ.setdefault("SERVER_TIMING_ENABLED", "false")
+    if args.redis_url:
+        os.environ["REDIS_URLS"] = args.redis_url
+    if args.max_concurrent:
+        os.environ["MAX_CONCURRENT_GENERATIONS"] = str(args.max_concurrent)
+    
+    import uvicorn
+    from app import main as app_main
+    
+    if args.redis_url:
+        redis_client = app_main.create_redis_client(app_main.settings)
+    else:
+        import fakeredis
+        redis_client = fakeredis.FakeRedis(decode_responses=True)
+    app_main.create_redis_client = lambda settings: redis_client
+    
+    if args.seed_users and args.seed_messages:
+        seed_history(redis_client, args.seed_prefix, args.seed_users, args.seed_messages)
+    
+    uvicorn.run(app_main.app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
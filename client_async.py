@@ -0,0 +1,242 @@
+"""Async client for the Nono Chatbot API.
+
+Same operations as ``client_example.NonoChatbotClient`` but built on a single
+pooled ``httpx.AsyncClient`` (keep-alive connections are reused across
+requests) plus WebSocket streaming, so many conversations can run
+concurrently from one process.
+
+Example::
+
+    async with AsyncNonoChatbotClient("http://localhost:8000") as client:
+        await client.start_session("demo123")
+        reply = await client.send_message("demo123", "Hi")
+        
+        async with client.chat_socket("demo123") as chat:
+            async for chunk in chat.ask("Tell me more"):
+                print(chunk, end="")
+"""
+import asyncio
+import json
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional
+
+import httpx
+
+
+class ChatStreamError(Exception):
+    """Raised when the server reports an error on the chat WebSocket."""
+    
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        """Initialize error.
+        
+        Args:
+            message: Error message from the server
+            retry_after: Seconds to wait before retrying, if given
+        """
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class ChatSocket:
+    """An open chat WebSocket for one user."""
+    
+    def __init__(self, websocket):
+        """Initialize wrapper.
+        
+        Args:
+            websocket: Connected ``websockets`` client connection
+        """
+        self.websocket = websocket
+        self.last_ttft: Optional[float] = None
+        self.last_response: Optional[str] = None
+    
+    async def ask(self, text: str) -> AsyncIterator[str]:
+        """Send a message and yield the reply chunks as they stream in.
+        
+        After the iteration finishes, ``last_ttft`` holds the seconds until
+        the first chunk and ``last_response`` the full reply.
+        
+        Args:
+            text: User message
+        
+        Yields:
+            Reply chunks
+        
+        Raises:
+            ChatStreamError: If the server reports an error
+        """
+        started = time.perf_counter()
+        self.last_ttft = None
+        self.last_response = None
+        await self.websocket.send(json.dumps({"text": text}))
+        
+        while True:
+            message = json.loads(await self.websocket.recv())
+            if message["type"] == "chunk":
+                if self.last_ttft is None:
+                    self.last_ttft = time.perf_counter() - started
+                yield message["content"]
+            elif message["type"] == "complete":
+                self.last_response = message["response"]
+                return
+            elif message["type"] == "error":
+                raise ChatStreamError(message["message"], message.get("retry_after"))
+
+
+class AsyncNonoChatbotClient:
+    """Async, connection-pooled client for the Nono Chatbot API."""
+    
+    def __init__(
+        self,
+        base_url: str = "http://localhost:8000",
+        max_connections: int = 100,
+        timeout: float = 120.0,
+        transport: Optional[httpx.AsyncBaseTransport] = None
+    ):
+        """Initialize chatbot client.
+        
+        Args:
+            base_url: Base URL of the API
+            max_connections: Size of the HTTP connection pool
+            timeout: Request timeout in seconds (generation can be slow)
+            transport: Custom httpx transport (for tests)
+        """
+        self.base_url = base_url.rstrip('/')
+        self.ws_url = "ws" + self.base_url[len("http"):]
+        self.http = httpx.AsyncClient(
+            base_url=self.base_url,
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            transport=transport
+        )
+    
+    async def __aenter__(self) -> "AsyncNonoChatbotClient":
+        return self
+    
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+    
+    async def close(self) -> None:
+        """Close pooled connections."""
+        await self.http.aclose()
+    
+    async def _request(self, method: str, path: str, **kwargs) -> Dict[str, Any]:
+        response = await self.http.request(method, path, **kwargs)
+        response.raise_for_status()
+        return response.json()
+    
+    async def health_check(self) -> Dict[str, Any]:
+        """Check API health status."""
+        return await self._request("GET", "/health")
+    
+    async def start_session(
+        self,
+        user_id: str,
+        persona: str = "mental_health_nurse",
+        metadata: Optional[Dict] = None
+    ) -> Dict[str, Any]:
+        """Start a new conversation session.
+        
+        Args:
+            user_id: Unique user identifier
+            persona: Persona to use
+            metadata: Optional session metadata
+        
+        Returns:
+            Session information
+        """
+        return await self._request("POST", "/session/start", json={
+            "user_id": user_id,
+            "persona": persona,
+            "metadata": metadata or {}
+        })
+    
+    async def send_message(self, user_id: str, message: str) -> Dict[str, Any]:
+        """Send a message and get the full response.
+        
+        Args:
+            user_id: User identifier (must not contain ``_``; the API
+                derives it from the session id)
+            message: User message
+        
+        Returns:
+            API response with assistant's message
+        """
+        return await self._request("POST", "/api/chat", json={
+            "session_id": f"session_{user_id}",
+            "user_message": message
+        })
+    
+    @asynccontextmanager
+    async def chat_socket(self, user_id: str) -> AsyncIterator[ChatSocket]:
+        """Open a streaming chat WebSocket for a user.
+        
+        Args:
+            user_id: User identifier (needs a started session)
+        
+        Yields:
+            ChatSocket for sending messages
+        """
+        import websockets
+        
+        async with websockets.connect(f"{self.ws_url}/ws/chat/{user_id}") as websocket:
+            yield ChatSocket(websocket)
+    
+    async def get_history(
+        self,
+        user_id: str,
+        limit: int = 50,
+        before: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Get a page of conversation history.
+        
+        Args:
+            user_id: User identifier
+            limit: Maximum messages to return
+            before: Cursor from a previous page's ``next_cursor``
+        
+        Returns:
+            Conversation history page
+        """
+        params = {"limit": limit}
+        if before:
+            params["before"] = before
+        return await self._request("GET", f"/session/{user_id}/history", params=params)
+    
+    async def clear_session(self, user_id: str) -> Dict[str, Any]:
+        """Clear user session."""
+        return await self._request("DELETE", f"/session/{user_id}/clear")
+    
+    async def list_personas(self) -> Dict[str, Any]:
+        """List available personas."""
+        return await self._request("GET", "/personas")
+    
+    async def list_active_sessions(self) -> Dict[str, Any]:
+        """List active user sessions."""
+        return await self._request("GET", "/sessions/active")
+
+
+async def main():
+    """Example: several concurrent conversations over one client."""
+    async with AsyncNonoChatbotClient() as client:
+        health = await client.health_check()
+        print(f"Health: {health['status']}")
+        
+        async def conversation(user_id: str):
+            await client.start_session(user_id)
+            reply = await client.send_message(user_id, "Hi, I've been feeling overwhelmed lately")
+            print(f"[{user_id}] {reply['response'][:80]}")
+            
+            async with client.chat_socket(user_id) as chat:
+                async for _ in chat.ask("What can I do to manage stress better?"):
+                    pass
+                print(f"[{user_id}] streamed reply, first token after {chat.last_ttft:.2f}s")
+            
+            await client.clear_session(user_id)
+        
+        await asyncio.gather(*(conversation(f"demo{i}") for i in range(3)))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
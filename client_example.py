@@ -54,19 +54,20 @@ class NonoChatbotClient:
         """Send a message and get response.
         
         Args:
-            user_id: User identifier
+            user_id: User identifier (must not contain ``_``; the API
+                derives it from the session id)
             message: User message
             
         Returns:
             API response with assistant's message
         """
         payload = {
-            "user_id": user_id,
-            "message": message
+            "session_id": f"session_{user_id}",
+            "user_message": message
         }
         
         response = requests.post(
-            f"{self.base_url}/chat",
+            f"{self.base_url}/api/chat",
             json=payload
         )
         response.raise_for_status()
@@ -130,7 +131,7 @@ def main():
     
     # Start session
     print("\nStarting session...")
-    user_id = "demo_user_123"
+    user_id = "demouser123"
     session = client.start_session(
         user_id,
         persona="mental_health_nurse",
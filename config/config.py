@@ -1,6 +1,6 @@
 """Application configuration management."""
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Any, Dict, List, Optional
 
 
 class Settings(BaseSettings):
@@ -14,20 +14,103 @@ class Settings(BaseSettings):
     redis_host: str = "localhost"
     redis_port: int = 6379
     redis_db: int = 0
+    redis_urls: str = ""  # Comma-separated; overrides host/port/db. Several URLs enable client-side sharding
+    redis_cluster: bool = False
+    redis_hash_tags: bool = False  # Wrap user ids in {...} so a user's keys share one cluster slot
+    redis_max_connections: int = 50  # Per process (and per node when sharded)
+    redis_pool_timeout: float = 5.0  # Seconds to wait for a free pooled connection
+    redis_socket_timeout: float = 5.0
+    redis_socket_connect_timeout: float = 2.0
+    redis_health_check_interval: int = 30
+    redis_retry_attempts: int = 3
+    redis_retry_backoff_base: float = 0.05
+    redis_retry_backoff_cap: float = 1.0
     
     # Ollama Configuration
     ollama_host: str = "http://localhost:11434"
     model_name: str = "llama2"
     embedding_model: str = "nomic-embed-text"
+    ollama_timeout: float = 120.0  # Read timeout (gap between streamed chunks)
+    ollama_connect_timeout: float = 5.0
+    ollama_num_ctx: int = 0  # Context window in tokens; 0 = model default. Personas may override
+    ollama_num_thread: int = 0  # CPU threads per generation; 0 = Ollama decides
+    ollama_keep_alive: str = ""  # How long Ollama keeps the model loaded, e.g. "30m"; empty = Ollama default
+    
+    # OpenAI-compatible backend (Groq, vLLM, llama.cpp server); enabled when the URL is set
+    openai_base_url: str = ""  # Including the version prefix, e.g. https://api.groq.com/openai/v1
+    openai_api_key: str = ""
+    openai_model: str = ""
+    openai_timeout: float = 60.0
+    
+    # Backend routing: personas may pick their own backend with `backend:`
+    llm_backend: str = "ollama"  # Default backend: ollama | openai
+    llm_fallbacks: str = ""  # Comma-separated backends tried in order when the primary fails
+    
+    # Cascade routing: simple turns go to a small Ollama model, the rest to LLM_BACKEND
+    small_model_name: str = ""  # e.g. "llama3.2:1b"; empty disables the cascade
+    cascade_max_chars: int = 200  # Longer messages use the large model
+    cascade_score_threshold: float = 0.5  # Complexity score (0-1) at which the large model is used
+    cascade_escalate_keywords: str = "suicide,self-harm,self harm,kill myself,overdose,abuse,medication,diagnos"
+    cascade_large_personas: str = ""  # Comma-separated personas that always use the large model
+    
+    max_concurrent_generations: int = 4  # Per process; extra requests queue
+    fanout_max_personas: int = 4  # Personas per /api/chat/fanout request
+    batch_concurrency: int = 2  # Default slots a /admin/batch run may hold
+    batch_max_items: int = 1000  # Items per /admin/batch request
+    
+    # Per-user chat turns
+    chat_lock_ttl: float = 30.0  # Turn lock expiry if its worker dies (renewed while running)
+    chat_lock_wait_timeout: float = 120.0  # How long a message waits for the user's previous reply
+    chat_cancel_previous: bool = False  # A new message stops the user's reply in progress
+    idempotency_ttl: int = 86400  # Seconds replies are kept for Idempotency-Key retries
+    reply_stream_ttl: int = 300  # Seconds a streamed reply stays resumable after its last chunk; 0 disables
+    
+    # Per-user rate limits and daily generated-token quotas (UTC days)
+    rate_limit_per_minute: float = 30.0  # Messages per user per minute; 0 disables
+    rate_limit_burst: int = 10  # Messages a user may send back to back
+    daily_token_quota: int = 0  # Generated tokens per user per day; 0 = unlimited
+    persona_daily_token_quotas: str = ""  # Per user and persona, e.g. "life_coach:20000,fitness_coach:5000"
+    
+    # Load-adaptive degradation: less history and shorter replies under load
+    degradation_enabled: bool = True
+    degradation_queue_thresholds: str = "8,16"  # Waiting generations for the reduced and minimal levels
+    degradation_latency_thresholds: str = "30,60"  # Recent latency (seconds) for the reduced and minimal levels
+    degradation_recovery_seconds: float = 30.0  # Calm time before stepping back one level
+    degradation_min_context_messages: int = 2
+    degradation_min_max_tokens: int = 64
+    
+    # Process model
+    web_concurrency: int = 0  # Gunicorn worker processes; 0 = one per CPU core
+    shutdown_grace_period: float = 30.0  # Seconds to let in-flight generations finish on shutdown
+    
+    # Circuit Breaker (per LLM backend)
+    circuit_failure_threshold: int = 5
+    circuit_recovery_timeout: float = 30.0
+    circuit_slow_call_threshold: float = 60.0  # Seconds; slower calls count as failures
+    circuit_half_open_max_calls: int = 1
     
     # Chat Configuration
     max_context_messages: int = 10
+    memory_backend: str = "list"  # History storage: list | stream (Redis Streams, stable message ids)
+    memory_idle_ttl: int = 2592000  # Seconds history/metadata survive without activity (30 days); 0 keeps them forever
+    memory_reaper_interval: float = 3600.0  # Seconds between passes giving a TTL to keys without one; 0 disables
+    write_durability: str = "sync"  # sync: replies stored before responding | buffered: stored by a write-behind flush
+    write_behind_interval: float = 0.05  # Seconds between write-behind flushes
+    write_behind_max_batch: int = 256  # Queued messages that trigger an early flush
     vector_store_dimension: int = 384
     
     # Environment
     environment: str = "development"
     log_level: str = "INFO"
     
+    # Tracing
+    tracing_exporter: str = "none"  # none | file | memory
+    tracing_file: str = "traces.jsonl"
+    server_timing_enabled: bool = True
+    
+    # Admin endpoints (/admin/*) are disabled while empty
+    admin_token: str = ""
+    
     # Session Configuration
     session_timeout: int = 3600
     max_sessions_per_user: int = 5
@@ -36,10 +119,66 @@ class Settings(BaseSettings):
         env_file = ".env"
         case_sensitive = False
     
+    @property
+    def redis_url_list(self) -> List[str]:
+        """All configured Redis URLs (one unless sharding)."""
+        urls = [url.strip() for url in self.redis_urls.split(",") if url.strip()]
+        return urls or [f"redis://{self.redis_host}:{self.redis_port}/{self.redis_db}"]
+    
+    @property
+    def llm_fallback_list(self) -> List[str]:
+        """Fallback backend names in order."""
+        return [name.strip() for name in self.llm_fallbacks.split(",") if name.strip()]
+    
+    @property
+    def degradation_queue_threshold_list(self) -> List[int]:
+        """Queue depths that trigger each degradation level."""
+        return [int(value) for value in self.degradation_queue_thresholds.split(",") if value.strip()]
+    
+    @property
+    def degradation_latency_threshold_list(self) -> List[float]:
+        """Latencies that trigger each degradation level."""
+        return [float(value) for value in self.degradation_latency_thresholds.split(",") if value.strip()]
+    
+    @property
+    def cascade_escalate_keyword_list(self) -> List[str]:
+        """Phrases that send a message to the large model."""
+        return [word.strip() for word in self.cascade_escalate_keywords.split(",") if word.strip()]
+    
+    @property
+    def cascade_large_persona_list(self) -> List[str]:
+        """Personas that never use the small model."""
+        return [key.strip() for key in self.cascade_large_personas.split(",") if key.strip()]
+    
+    @property
+    def persona_daily_token_quota_map(self) -> Dict[str, int]:
+        """Daily token quota per persona key."""
+        quotas = {}
+        for item in self.persona_daily_token_quotas.split(","):
+            persona, _, limit = item.partition(":")
+            if persona.strip() and limit.strip():
+                quotas[persona.strip()] = int(limit)
+        return quotas
+    
+    @property
+    def ollama_default_options(self) -> Dict[str, Any]:
+        """Ollama options applied to every generation unless a persona sets them."""
+        options = {"num_ctx": self.ollama_num_ctx, "num_thread": self.ollama_num_thread}
+        return {name: value for name, value in options.items() if value}
+    
     @property
     def redis_url(self) -> str:
         """Construct Redis URL from configuration."""
-        return f"redis://{self.redis_host}:{self.redis_port}/{self.redis_db}"
+        return self.redis_url_list[0]
+    
+    @property
+    def redis_use_hash_tags(self) -> bool:
+        """Whether per-user keys must carry a hash tag.
+        
+        Always on for Redis Cluster and client-side sharding, where a user's
+        keys have to live on the same slot/node.
+        """
+        return self.redis_hash_tags or self.redis_cluster or len(self.redis_url_list) > 1
 
 
 settings = Settings()
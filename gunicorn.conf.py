@@ -0,0 +1,61 @@
+"""Gunicorn configuration for multi-process deployments.
+
+Run with::
+
+    gunicorn -c gunicorn.conf.py app.main:app
+
+Every worker is an independent uvicorn event loop with its own Redis pool,
+Ollama client and generation scheduler; sessions and conversation memory
+live in Redis, so any worker can serve any HTTP request or WebSocket.
+
+Metrics are per worker too; they are shared through files in
+``PROMETHEUS_MULTIPROC_DIR`` so ``/metrics`` on any worker reports all of
+them (see ``app.metrics``).
+"""
+import glob
+import os
+import tempfile
+
+from app import metrics
+from config.config import settings
+
+
+def _cpu_count() -> int:
+    """CPUs this process may run on (respects container cpusets)."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+bind = f"{settings.fastapi_host}:{settings.fastapi_port}"
+worker_class = "uvicorn.workers.UvicornWorker"
+workers = settings.web_concurrency or _cpu_count()
+
+# Generations stream for a long time; don't let the arbiter kill busy workers
+timeout = int(settings.ollama_timeout) + 30
+# On SIGTERM/HUP workers stop accepting connections and finish in-flight
+# generations before exiting
+graceful_timeout = int(settings.shutdown_grace_period)
+keepalive = 5
+
+# Import the app in each worker, not the arbiter, so no sockets or file
+# handles are shared across fork
+preload_app = False
+
+accesslog = "-"
+loglevel = settings.log_level.lower()
+
+# Set here, in the arbiter, so every worker inherits it
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", tempfile.mkdtemp(prefix="nono-metrics-"))
+
+
+def on_starting(server):
+    """Remove metric files left by a previous run."""
+    for path in glob.glob(os.path.join(os.environ["PROMETHEUS_MULTIPROC_DIR"], "metrics_*.json")):
+        os.remove(path)
+
+
+def child_exit(server, worker):
+    """Stop reporting an exited worker's gauges."""
+    metrics.mark_process_dead(worker.pid)
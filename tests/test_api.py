@@ -7,7 +7,7 @@ from fastapi.testclient import TestClient
 
 # Mock imports before creating app
 with patch('app.main.Redis'):
-    with patch('app.main.OllamaLLM'):
+    with patch('app.main.create_llm_router'):
         with patch('app.main.SessionManager'):
             with patch('app.main.PersonaManager'):
                 from app.main import app
@@ -27,6 +27,7 @@ def test_health_check(client):
     data = response.json()
     assert "status" in data
     assert "timestamp" in data
+    assert data["degradation"]["name"] == "normal"
 
 
 def test_list_personas_endpoint(client):
@@ -89,7 +90,7 @@ def test_chat_endpoint(client):
     """Test chat endpoint."""
     with patch('app.main.session_manager') as mock_sm, \
          patch('app.main.redis_client') as mock_redis, \
-         patch('app.main.ollama_client') as mock_ollama, \
+         patch('app.main.llm_router') as mock_ollama, \
          patch('app.main.persona_manager') as mock_pm, \
          patch('app.main.ChatMemoryManager') as mock_memory_class:
         
@@ -148,10 +149,13 @@ def test_get_history(client):
          patch('app.main.ChatMemoryManager') as mock_memory_class:
         
         mock_memory = MagicMock()
-        mock_memory.get_messages.return_value = [
-            {"role": "user", "content": "Hi"},
-            {"role": "assistant", "content": "Hello!"}
-        ]
+        mock_memory.get_messages_page.return_value = (
+            [
+                {"role": "user", "content": "Hi"},
+                {"role": "assistant", "content": "Hello!"}
+            ],
+            None
+        )
         mock_memory_class.return_value = mock_memory
         
         response = client.get("/session/user123/history")
@@ -161,6 +165,77 @@ def test_get_history(client):
         assert data["user_id"] == "user123"
         assert data["message_count"] == 2
         assert len(data["messages"]) == 2
+        assert data["next_cursor"] is None
+
+
+def test_get_history_page_with_fields(client):
+    """Test paginated history with field selection."""
+    with patch('app.main.redis_client') as mock_redis, \
+         patch('app.main.ChatMemoryManager') as mock_memory_class:
+        
+        mock_memory = MagicMock()
+        mock_memory.get_messages_page.return_value = (
+            [{"id": "2", "role": "user", "content": "Hi", "timestamp": "t"}],
+            "2"
+        )
+        mock_memory_class.return_value = mock_memory
+        
+        response = client.get("/session/user123/history?limit=1&before=3&fields=role,content")
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert data["messages"] == [{"role": "user", "content": "Hi"}]
+        assert data["next_cursor"] == "2"
+        mock_memory.get_messages_page.assert_called_once_with(limit=1, before="3", after=None)
+
+
+def test_get_history_rejects_invalid_cursor(client):
+    """Test a cursor the memory backend cannot parse is a 400."""
+    with patch('app.main.redis_client') as mock_redis, \
+         patch('app.main.ChatMemoryManager') as mock_memory_class:
+        
+        mock_memory_class.return_value.get_messages_page.side_effect = ValueError("Invalid history cursor: 'x'")
+        
+        response = client.get("/session/user123/history?before=x")
+        
+        assert response.status_code == 400
+
+
+@pytest.mark.parametrize("query", ["before=x", "after=not-a-time", "format=ndjson&before=1-0"])
+def test_get_history_rejects_invalid_cursor_for_list_history(client, query):
+    """Test the list backend rejects a malformed cursor instead of misreading it."""
+    fakeredis = pytest.importorskip("fakeredis")
+    from app.memory import ChatMemoryManager
+    redis = fakeredis.FakeRedis(decode_responses=True)
+    
+    with patch('app.main.redis_client', redis), \
+         patch('app.memory.settings.memory_backend', "list"):
+        ChatMemoryManager(redis, "user123").add_message("user", "Hi")
+        
+        response = client.get(f"/session/user123/history?{query}")
+    
+    assert response.status_code == 400
+    assert "Invalid history cursor" in response.json()["detail"]
+
+
+def test_get_history_ndjson(client):
+    """Test streaming history export as NDJSON."""
+    with patch('app.main.redis_client') as mock_redis, \
+         patch('app.main.ChatMemoryManager') as mock_memory_class:
+        
+        mock_memory = MagicMock()
+        mock_memory.iter_messages.return_value = iter([
+            {"role": "user", "content": "Hi"},
+            {"role": "assistant", "content": "Hello!"}
+        ])
+        mock_memory_class.return_value = mock_memory
+        
+        response = client.get("/session/user123/history?format=ndjson&fields=content")
+        
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert lines == [{"content": "Hi"}, {"content": "Hello!"}]
 
 
 def test_list_active_sessions(client):
@@ -174,3 +249,466 @@ def test_list_active_sessions(client):
         data = response.json()
         assert data["count"] == 3
         assert len(data["active_users"]) == 3
+
+
+def test_chat_fast_fails_when_circuit_open(client):
+    """Test chat returns 503 with Retry-After while the Ollama circuit is open."""
+    from app.circuit_breaker import CircuitOpenError
+    
+    with patch('app.main.session_manager') as mock_sm, \
+         patch('app.main.redis_client') as mock_redis, \
+         patch('app.main.llm_router') as mock_ollama, \
+         patch('app.main.persona_manager') as mock_pm, \
+         patch('app.main.ChatMemoryManager') as mock_memory_class:
+        
+        mock_pm.get_persona_info.return_value = {"temperature": 0.7, "max_tokens": 500}
+        mock_pm.get_system_prompt.return_value = "You are Clara."
+        mock_memory_class.return_value.get_context_window.return_value = ""
+        mock_ollama.generate.side_effect = CircuitOpenError("ollama", 12.0)
+        
+        response = client.post("/api/chat", json={
+            "session_id": "session_user123_1",
+            "user_message": "Hello"
+        })
+        
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "12"
+
+
+def test_chat_rate_limited(client):
+    """Test chat (also via the legacy route) returns 429 once the user is over the limit."""
+    from app.rate_limit import RateLimitResult
+    
+    with patch('app.main.session_manager'), \
+         patch('app.main.redis_client'), \
+         patch('app.main.llm_router') as mock_ollama, \
+         patch('app.main.persona_manager'), \
+         patch('app.main.rate_limiter') as mock_limiter:
+        
+        mock_limiter.check.return_value = RateLimitResult(
+            False, reason="rate", retry_after=2.5, remaining_requests=0, remaining_tokens=800
+        )
+        
+        response = client.post("/chat", json={
+            "session_id": "session_user123_1",
+            "user_message": "Hello"
+        })
+        
+        assert response.status_code == 429
+        assert response.headers["Retry-After"] == "3"
+        assert response.headers["X-Quota-Remaining"] == "800"
+        mock_limiter.check.assert_called_once_with("user123", "default")
+        mock_ollama.generate.assert_not_called()
+
+
+def test_chat_replays_reply_for_idempotency_key(client):
+    """Test a retried request returns the stored reply without generating again."""
+    fakeredis = pytest.importorskip("fakeredis")
+    
+    with patch('app.main.session_manager') as mock_sm, \
+         patch('app.main.redis_client', fakeredis.FakeRedis(decode_responses=True)), \
+         patch('app.main.llm_router') as mock_ollama, \
+         patch('app.main.persona_manager') as mock_pm:
+        
+        mock_pm.get_system_prompt.return_value = "You are Clara."
+        mock_ollama.generate.return_value = "Hello!"
+        body = {"session_id": "session_user123_1", "user_message": "Hello"}
+        
+        first = client.post("/api/chat", json=body, headers={"Idempotency-Key": "req-1"})
+        retry = client.post("/api/chat", json=body, headers={"Idempotency-Key": "req-1"})
+        other = client.post("/api/chat", json=body, headers={"Idempotency-Key": "req-2"})
+    
+    assert first.status_code == retry.status_code == other.status_code == 200
+    assert retry.json() == first.json()
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert "Idempotent-Replayed" not in other.headers
+    assert mock_ollama.generate.call_count == 2
+
+
+def test_superseded_reply_closes_upstream_stream():
+    """Test a superseded turn stops streaming and closes the generation."""
+    import asyncio
+    from app.main import _collect_reply
+    from app.turns import Turn, TurnCancelled
+    
+    turn = Turn("token")
+    closed = []
+    
+    def generate_stream(**kwargs):
+        try:
+            yield "Hel"
+            turn.cancelled = True
+            yield "lo"
+            yield "!"
+        finally:
+            closed.append(True)
+    
+    with patch('app.main.llm_router') as mock_ollama:
+        mock_ollama.generate_stream.side_effect = generate_stream
+        with pytest.raises(TurnCancelled):
+            asyncio.run(_collect_reply(turn, prompt="Hi"))
+    
+    assert closed == [True]
+
+
+def test_metrics_endpoint(client):
+    """Test Prometheus metrics are exposed."""
+    response = client.get("/metrics")
+    
+    assert response.status_code == 200
+    assert "nono_chat_latency_seconds" in response.text
+    assert "nono_active_websockets" in response.text
+
+
+def test_websocket_streams_single_generation(client):
+    """Test WebSocket streams chunks from one generation and stores the reply."""
+    with patch('app.main.session_manager') as mock_sm, \
+         patch('app.main.redis_client') as mock_redis, \
+         patch('app.main.llm_router') as mock_ollama, \
+         patch('app.main.persona_manager') as mock_pm, \
+         patch('app.main.ChatMemoryManager') as mock_memory_class:
+        
+        mock_sm.get_session.return_value = {"user_id": "user123", "persona": "mental_health_nurse"}
+        mock_pm.get_persona_info.return_value = {"temperature": 0.7, "max_tokens": 500}
+        mock_pm.get_system_prompt.return_value = "You are Clara."
+        mock_memory = MagicMock()
+        mock_memory.get_context_window.return_value = ""
+        mock_memory_class.return_value = mock_memory
+        mock_ollama.generate_stream.return_value = iter(["Hel", "lo"])
+        
+        with client.websocket_connect("/ws/chat/user123") as ws:
+            ws.send_text(json.dumps({"text": "Hi"}))
+            messages = [ws.receive_json() for _ in range(3)]
+        
+        assert [m["type"] for m in messages] == ["chunk", "chunk", "complete"]
+        assert messages[-1]["response"] == "Hello"
+        assert mock_ollama.generate_stream.call_count == 1
+        mock_memory.add_message.assert_called_with("assistant", "Hello")
+
+
+def test_chat_server_timing_header(client):
+    """Test chat responses carry a Server-Timing breakdown."""
+    with patch('app.main.session_manager') as mock_sm, \
+         patch('app.main.redis_client') as mock_redis, \
+         patch('app.main.llm_router') as mock_ollama, \
+         patch('app.main.persona_manager') as mock_pm:
+        
+        mock_pm.get_persona_info.return_value = {"temperature": 0.7, "max_tokens": 500}
+        mock_pm.get_system_prompt.return_value = "You are Clara."
+        mock_redis.pipeline.return_value.execute.return_value = [1, True]
+        mock_redis.lrange.return_value = []
+        mock_redis.llen.return_value = 2
+        mock_ollama.generate.return_value = "Hello!"
+        
+        response = client.post("/api/chat", json={
+            "session_id": "session_user123_1",
+            "user_message": "Hello"
+        })
+        
+        assert response.status_code == 200
+        timing = response.headers["Server-Timing"]
+        assert "memory;dur=" in timing
+        assert "prompt;dur=" in timing
+        assert "total;dur=" in timing
+
+
+def test_startup_is_idempotent_per_process():
+    """Test a repeated startup in the same worker does not reconnect."""
+    import asyncio
+    from app import main
+    
+    with patch('app.main.create_redis_client') as mock_create, \
+         patch('app.main.create_llm_router'), \
+         patch('app.main.PersonaManager'), \
+         patch('app.main.redis_client'), \
+         patch('app.main.llm_router'), \
+         patch('app.main.session_manager'), \
+         patch('app.main.persona_manager'), \
+         patch('app.main._initialized_pid', None):
+        
+        asyncio.run(main.startup_event())
+        asyncio.run(main.startup_event())
+        assert mock_create.call_count == 1
+        
+        asyncio.run(main.shutdown_event())
+        assert main._initialized_pid is None
+
+
+def test_websocket_turn_stores_reply_after_disconnect():
+    """Test a generation finishes and is stored when the socket closes mid-stream."""
+    import asyncio
+    from app.main import _websocket_turn
+    
+    websocket = MagicMock()
+    sent = []
+    
+    async def send_json(data):
+        if sent:
+            raise RuntimeError("WebSocket is not connected")
+        sent.append(data)
+    
+    websocket.send_json = send_json
+    
+    with patch('app.main.session_manager') as mock_sm, \
+         patch('app.main.redis_client'), \
+         patch('app.main.llm_router') as mock_ollama, \
+         patch('app.main.persona_manager') as mock_pm, \
+         patch('app.main.ChatMemoryManager') as mock_memory_class:
+        
+        mock_sm.get_session.return_value = {"persona": "mental_health_nurse"}
+        mock_pm.get_persona_info.return_value = {}
+        mock_memory = MagicMock()
+        mock_memory.get_context_window.return_value = ""
+        mock_memory_class.return_value = mock_memory
+        mock_ollama.generate_stream.return_value = iter(["Hel", "lo", "!"])
+        
+        asyncio.run(_websocket_turn(websocket, "user123", {"text": "Hi"}))
+    
+    assert [(m["type"], m["content"], m["offset"]) for m in sent] == [("chunk", "Hel", 1)]
+    mock_memory.add_message.assert_called_with("assistant", "Hello!")
+
+
+def test_resume_reply_over_sse(client):
+    """Test a reconnecting client resumes a reply after its Last-Event-ID."""
+    fakeredis = pytest.importorskip("fakeredis")
+    from app.reply_stream import ReplyPublisher
+    
+    redis = fakeredis.FakeRedis(decode_responses=True)
+    publisher = ReplyPublisher(redis, "user123", "gen1", ttl=60)
+    for event in ({"type": "chunk", "content": "Hel"}, {"type": "chunk", "content": "lo"},
+                  {"type": "complete", "response": "Hello"}):
+        publisher.publish(event)
+    
+    with patch('app.main.redis_client', redis):
+        response = client.get("/api/chat/replies/user123/latest", headers={"Last-Event-ID": "1"})
+        missing = client.get("/api/chat/replies/user123/nope")
+    
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = [block for block in response.text.split("\n\n") if block]
+    assert [block.splitlines()[0] for block in events] == ["id: 2", "id: 3"]
+    assert json.loads(events[-1].splitlines()[2][len("data: "):])["response"] == "Hello"
+    assert missing.status_code == 404
+
+
+def test_websocket_resume_after_reconnect(client):
+    """Test a new WebSocket connection can resume a reply by generation id."""
+    fakeredis = pytest.importorskip("fakeredis")
+    
+    redis = fakeredis.FakeRedis(decode_responses=True)
+    with patch('app.main.session_manager') as mock_sm, \
+         patch('app.main.redis_client', redis), \
+         patch('app.main.llm_router') as mock_ollama, \
+         patch('app.main.persona_manager') as mock_pm:
+        
+        mock_sm.get_session.return_value = {"user_id": "user123", "persona": "mental_health_nurse"}
+        mock_pm.get_system_prompt.return_value = "You are Clara."
+        mock_ollama.generate_stream.return_value = iter(["Hel", "lo"])
+        
+        # Read the whole reply before closing: the test client cancels the
+        # app on close, which a server does not do
+        with client.websocket_connect("/ws/chat/user123") as ws:
+            ws.send_text(json.dumps({"text": "Hi"}))
+            first, *_ = [ws.receive_json() for _ in range(3)]
+        
+        with client.websocket_connect("/ws/chat/user123") as ws:
+            ws.send_text(json.dumps({"resume": first["generation_id"], "offset": first["offset"]}))
+            resumed = [ws.receive_json() for _ in range(2)]
+    
+    assert first["offset"] == 1
+    assert [(m["type"], m["offset"]) for m in resumed] == [("chunk", 2), ("complete", 3)]
+    assert resumed[-1]["response"] == "Hello"
+
+
+def test_chat_fanout_streams_tagged_chunks(client):
+    """Test fan-out reads memory once and streams every persona's reply."""
+    with patch('app.main.redis_client') as mock_redis, \
+         patch('app.main.llm_router') as mock_ollama, \
+         patch('app.main.persona_manager') as mock_pm, \
+         patch('app.main.ChatMemoryManager') as mock_memory_class:
+        
+        mock_pm.get_persona.return_value = {"name": "x"}
+        mock_pm.get_persona_info.return_value = {"temperature": 0.7, "max_tokens": 500}
+        mock_pm.get_system_prompt.side_effect = lambda key: f"You are {key}."
+        mock_memory = MagicMock()
+        mock_memory.get_context_window.return_value = "User: Earlier\nAssistant: Hi"
+        mock_memory_class.return_value = mock_memory
+        mock_ollama.generate_stream.side_effect = lambda **kwargs: iter([kwargs["system"].split()[-1]])
+        
+        response = client.post("/api/chat/fanout", json={
+            "user_id": "user123",
+            "message": "Hello",
+            "personas": ["mental_health_nurse", "supportive_coach", "mental_health_nurse"]
+        })
+        events = [json.loads(line) for line in response.text.splitlines()]
+    
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    complete = {e["persona"]: e["response"] for e in events if e["type"] == "complete"}
+    assert complete == {"mental_health_nurse": "mental_health_nurse.", "supportive_coach": "supportive_coach."}
+    assert events[-1] == {"type": "done"}
+    mock_memory.get_context_window.assert_called_once()
+    mock_memory.add_message.assert_not_called()
+    assert mock_ollama.generate_stream.call_count == 2
+
+
+def test_chat_fanout_is_rate_limited_per_persona(client):
+    """Test fan-out takes one message per persona from the limit and charges every reply."""
+    from app.rate_limit import RateLimitResult
+    
+    with patch('app.main.redis_client'), \
+         patch('app.main.llm_router') as mock_ollama, \
+         patch('app.main.persona_manager') as mock_pm, \
+         patch('app.main.ChatMemoryManager') as mock_memory_class, \
+         patch('app.main.rate_limiter') as mock_limiter:
+        
+        mock_pm.get_persona.return_value = {"name": "x"}
+        mock_memory_class.return_value.get_context_window.return_value = ""
+        mock_ollama.generate_stream.side_effect = lambda **kwargs: iter(["12345678"])
+        mock_limiter.check.side_effect = [
+            RateLimitResult(True, remaining_requests=1, remaining_tokens=900),
+            RateLimitResult(True, remaining_requests=0, remaining_tokens=950),
+            RateLimitResult(True, remaining_requests=2),
+            RateLimitResult(False, reason="rate", retry_after=4, remaining_requests=0)
+        ]
+        request = {"user_id": "user123", "message": "Hello", "personas": ["life_coach", "nurse"]}
+        
+        response = client.post("/api/chat/fanout", json=request)
+        response.read()
+        limited = client.post("/api/chat/fanout", json=request)
+    
+    assert response.headers["X-RateLimit-Remaining"] == "0"
+    assert response.headers["X-Quota-Remaining"] == "900"
+    assert sorted(c.args for c in mock_limiter.charge.call_args_list) == [
+        ("user123", "life_coach", 2), ("user123", "nurse", 2)
+    ]
+    assert limited.status_code == 429
+    assert limited.headers["Retry-After"] == "4"
+    assert mock_ollama.generate_stream.call_count == 2
+
+
+def _buffered_redis():
+    """Fake Redis with a session manager and a write-behind buffer that is not started."""
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")  # The turn lock is released by a Lua script
+    from app.session import SessionManager
+    from app.write_behind import WriteBehindBuffer
+    
+    redis = fakeredis.FakeRedis(decode_responses=True)
+    sessions = SessionManager(redis, 3600)
+    return redis, sessions, WriteBehindBuffer(redis, sessions)
+
+
+def test_buffered_chat_writes_reply_after_response_under_lock(client):
+    """Test /api/chat flushes only the user's reply, in the background, before releasing the lock."""
+    from app import keys
+    from app.memory import ChatMemoryManager
+    
+    redis, sessions, buffer = _buffered_redis()
+    buffer.add_message(ChatMemoryManager(redis, "other"), "assistant", "Queued")
+    locked = []
+    flush_user = buffer.flush_user
+    
+    def checked_flush(user_id):
+        locked.append(redis.exists(keys.turn_lock_key(user_id)))
+        return flush_user(user_id)
+    
+    with patch('app.main.session_manager', sessions), \
+         patch('app.main.redis_client', redis), \
+         patch('app.main.write_buffer', buffer), \
+         patch.object(buffer, 'flush_user', side_effect=checked_flush), \
+         patch('app.main.llm_router') as mock_ollama, \
+         patch('app.main.persona_manager') as mock_pm:
+        
+        mock_pm.get_system_prompt.return_value = "You are Clara."
+        mock_ollama.generate.return_value = "Hello!"
+        
+        response = client.post("/api/chat", json={"session_id": "session_user123_1", "user_message": "Hi"})
+    
+    assert response.status_code == 200
+    assert locked == [1, 1]  # Before reading history, and after the response
+    assert [m["content"] for m in ChatMemoryManager(redis, "user123").get_messages()] == ["Hi", "Hello!"]
+    assert sessions.get_session("user123")["message_count"] == 1
+    assert not redis.exists(keys.turn_lock_key("user123"))
+    assert buffer.has_pending("other") and not buffer.has_pending("user123")
+
+
+def test_chat_fanout_reads_buffered_reply_under_lock(client):
+    """Test fan-out flushes the user's buffered reply first and holds the turn lock while streaming."""
+    from app import keys
+    from app.memory import ChatMemoryManager
+    
+    redis, sessions, buffer = _buffered_redis()
+    buffer.add_message(ChatMemoryManager(redis, "user123"), "assistant", "Buffered")
+    locked = []
+    
+    def generate_stream(**kwargs):
+        locked.append(redis.exists(keys.turn_lock_key("user123")))
+        yield "Hi"
+    
+    with patch('app.main.redis_client', redis), \
+         patch('app.main.write_buffer', buffer), \
+         patch('app.main.llm_router') as mock_ollama, \
+         patch('app.main.persona_manager') as mock_pm:
+        
+        mock_pm.get_persona.return_value = {"name": "x"}
+        mock_ollama.generate_stream.side_effect = generate_stream
+        
+        response = client.post("/api/chat/fanout", json={
+            "user_id": "user123",
+            "message": "Hello",
+            "personas": ["life_coach"]
+        })
+        response.read()
+    
+    assert mock_ollama.generate_stream.call_args.kwargs["prompt"].startswith("Assistant: Buffered")
+    assert locked == [1]
+    assert not redis.exists(keys.turn_lock_key("user123"))
+
+
+def test_chat_fanout_rejects_unknown_persona(client):
+    """Test fan-out validates persona keys before generating."""
+    with patch('app.main.redis_client'), \
+         patch('app.main.llm_router') as mock_ollama, \
+         patch('app.main.persona_manager') as mock_pm:
+        
+        mock_pm.get_persona.side_effect = lambda key: {"name": "x"} if key == "mental_health_nurse" else None
+        
+        response = client.post("/api/chat/fanout", json={
+            "user_id": "user123",
+            "message": "Hello",
+            "personas": ["mental_health_nurse", "pirate"]
+        })
+    
+    assert response.status_code == 400
+    assert "pirate" in response.json()["detail"]
+    mock_ollama.generate_stream.assert_not_called()
+
+
+def test_admin_batch_streams_results(client):
+    """Test batch endpoint answers JSONL items without touching memory."""
+    body = "\n".join([
+        json.dumps({"id": "a", "prompt": "Hello"}),
+        json.dumps({"id": "b", "prompt": "Bye", "persona": "supportive_coach"})
+    ])
+    
+    with patch('app.main.settings.admin_token', "secret"), \
+         patch('app.main.redis_client') as mock_redis, \
+         patch('app.main.llm_router') as mock_ollama, \
+         patch('app.main.persona_manager') as mock_pm:
+        
+        mock_pm.get_default_persona.return_value = "mental_health_nurse"
+        mock_pm.get_persona_info.return_value = {"temperature": 0.7, "max_tokens": 500}
+        mock_ollama.generate.return_value = "Reply"
+        
+        response = client.post("/admin/batch", content=body, headers={"X-Admin-Token": "secret"})
+        results = {r["id"]: r for r in map(json.loads, response.text.splitlines())}
+        bad = client.post("/admin/batch", content='{"id": "a"}', headers={"X-Admin-Token": "secret"})
+    
+    assert response.status_code == 200
+    assert results["a"]["persona"] == "mental_health_nurse"
+    assert results["b"]["persona"] == "supportive_coach"
+    assert all(r["response"] == "Reply" and r["error"] is None for r in results.values())
+    assert "total_ms" in results["a"]["timings"]
+    assert mock_redis.mock_calls == []
+    assert bad.status_code == 400
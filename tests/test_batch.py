@@ -0,0 +1,171 @@
+"""Unit tests for batch chat runs."""
+import asyncio
+import json
+import threading
+import time
+import pytest
+from unittest.mock import MagicMock
+from app.batch import BatchRunner, build_prompt, completed_ids, parse_items, run_file
+from app.circuit_breaker import CircuitOpenError
+from app.scheduler import GenerationScheduler
+
+
+@pytest.fixture
+def persona_manager():
+    """Create persona manager knowing a single persona."""
+    manager = MagicMock()
+    manager.get_default_persona.return_value = "mental_health_nurse"
+    manager.get_persona_info.side_effect = lambda key: (
+        {"temperature": 0.5, "max_tokens": 100} if key == "mental_health_nurse" else {}
+    )
+    manager.get_system_prompt.return_value = "You are Clara."
+    return manager
+
+
+def _collect(runner, items):
+    async def run():
+        return [result async for result in runner.run(items)]
+    return asyncio.run(run())
+
+
+def test_parse_items_defaults_and_errors():
+    """Test ids default to line numbers and bad lines are rejected."""
+    items = list(parse_items(['{"prompt": "Hi"}', '', '{"id": 7, "prompt": "Yo"}']))
+    assert [item["id"] for item in items] == ["1", "7"]
+    
+    with pytest.raises(ValueError, match="Line 2"):
+        list(parse_items(['{"prompt": "Hi"}', '{"persona": "x"}']))
+    with pytest.raises(ValueError, match="user_id"):
+        list(parse_items(['{"prompt": "Hi"}'], require_user_id=True))
+
+
+def test_build_prompt_matches_chat_format():
+    """Test prompts are formatted like the chat endpoints."""
+    assert build_prompt([], "Hi") == "User: Hi\nAssistant:"
+    conversation = [{"role": "user", "content": "Hello"}, {"role": "assistant", "content": "Hi there"}]
+    assert build_prompt(conversation, "How are you?") == (
+        "User: Hello\nAssistant: Hi there\n\nUser: How are you?\nAssistant:"
+    )
+
+
+def test_runner_bounds_concurrency(persona_manager):
+    """Test no more than ``concurrency`` items generate at once."""
+    lock = threading.Lock()
+    state = {"active": 0, "peak": 0}
+    
+    def generate(**kwargs):
+        with lock:
+            state["active"] += 1
+            state["peak"] = max(state["peak"], state["active"])
+        time.sleep(0.02)
+        with lock:
+            state["active"] -= 1
+        return kwargs["prompt"].split("\n")[0]
+    
+    llm = MagicMock()
+    llm.generate.side_effect = generate
+    runner = BatchRunner(llm, persona_manager, GenerationScheduler(8), concurrency=2)
+    
+    results = _collect(runner, ({"id": str(i), "prompt": f"q{i}"} for i in range(6)))
+    
+    assert sorted(r["id"] for r in results) == [str(i) for i in range(6)]
+    assert all(r["response"] == f"User: q{r['id']}" for r in results)
+    assert all(r["timings"]["generate_ms"] >= 15 for r in results)
+    assert state["peak"] == 2
+
+
+def test_runner_reports_errors_per_item(persona_manager):
+    """Test unknown personas and generation failures become item errors."""
+    llm = MagicMock()
+    llm.generate.side_effect = [RuntimeError("boom")]
+    runner = BatchRunner(llm, persona_manager, GenerationScheduler(1), concurrency=1)
+    
+    results = {r["id"]: r for r in _collect(runner, [
+        {"id": "a", "prompt": "Hi", "persona": "pirate"},
+        {"id": "b", "prompt": "Hi"}
+    ])}
+    
+    assert results["a"]["error"] == "Unknown persona: pirate"
+    assert results["b"]["error"] == "boom"
+    assert results["b"]["response"] is None
+
+
+def test_runner_waits_out_open_circuit(persona_manager, monkeypatch):
+    """Test an open circuit is retried after its retry_after."""
+    sleeps = []
+    
+    async def fake_sleep(seconds):
+        sleeps.append(seconds)
+    
+    monkeypatch.setattr("app.batch.asyncio.sleep", fake_sleep)
+    llm = MagicMock()
+    llm.generate.side_effect = [CircuitOpenError("ollama", 5.0), "Hello"]
+    runner = BatchRunner(llm, persona_manager, GenerationScheduler(1), concurrency=1)
+    
+    result = asyncio.run(runner.run_item({"id": "1", "prompt": "Hi"}))
+    
+    assert result["response"] == "Hello"
+    assert result["error"] is None
+    assert sleeps == [5.0]
+
+
+def test_runner_memory_mode_reads_and_appends(persona_manager):
+    """Test memory mode uses stored history and records the exchange."""
+    fakeredis = pytest.importorskip("fakeredis")
+    from app.memory import ChatMemoryManager
+    
+    redis_client = fakeredis.FakeRedis(decode_responses=True)
+    ChatMemoryManager(redis_client, "eval1").add_message("user", "Earlier")
+    llm = MagicMock()
+    llm.generate.return_value = "Reply"
+    runner = BatchRunner(llm, persona_manager, GenerationScheduler(1), redis_client=redis_client)
+    
+    asyncio.run(runner.run_item({"id": "1", "prompt": "Now", "user_id": "eval1"}))
+    
+    assert llm.generate.call_args.kwargs["prompt"] == "User: Earlier\n\nUser: Now\nAssistant:"
+    contents = [m["content"] for m in ChatMemoryManager(redis_client, "eval1").get_messages()]
+    assert contents == ["Earlier", "Now", "Reply"]
+
+
+def test_runner_memory_mode_flushes_buffered_replies_first(persona_manager):
+    """Test memory mode writes the user's buffered reply before reading history."""
+    fakeredis = pytest.importorskip("fakeredis")
+    from app.memory import ChatMemoryManager
+    from app.session import SessionManager
+    from app.write_behind import WriteBehindBuffer
+    
+    redis_client = fakeredis.FakeRedis(decode_responses=True)
+    buffer = WriteBehindBuffer(redis_client, SessionManager(redis_client, 3600))
+    buffer.add_message(ChatMemoryManager(redis_client, "eval1"), "assistant", "Buffered")
+    llm = MagicMock()
+    llm.generate.return_value = "Reply"
+    runner = BatchRunner(llm, persona_manager, GenerationScheduler(1), redis_client=redis_client, write_buffer=buffer)
+    
+    asyncio.run(runner.run_item({"id": "1", "prompt": "Now", "user_id": "eval1"}))
+    
+    assert llm.generate.call_args.kwargs["prompt"] == "Assistant: Buffered\n\nUser: Now\nAssistant:"
+    assert buffer.pending == 0
+
+
+def test_run_file_resumes_from_checkpoint(persona_manager, tmp_path):
+    """Test resuming skips answered items and retries failed ones."""
+    input_path = tmp_path / "in.jsonl"
+    output_path = tmp_path / "out.jsonl"
+    input_path.write_text("\n".join(json.dumps({"id": i, "prompt": f"q{i}"}) for i in range(4)) + "\n")
+    output_path.write_text(
+        json.dumps({"id": "0", "response": "a", "error": None}) + "\n"
+        + json.dumps({"id": "1", "response": None, "error": "boom"}) + "\n"
+        + '{"id": "2", "respo'
+    )
+    assert completed_ids(str(output_path)) == {"0"}
+    
+    llm = MagicMock()
+    llm.generate.return_value = "ok"
+    runner = BatchRunner(llm, persona_manager, GenerationScheduler(2), concurrency=2)
+    
+    summary = asyncio.run(run_file(runner, str(input_path), str(output_path), resume=True))
+    
+    assert summary["completed"] == 3
+    assert summary["skipped"] == 1
+    assert llm.generate.call_count == 3
+    assert completed_ids(str(output_path)) == {"0", "1", "2", "3"}
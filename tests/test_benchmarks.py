@@ -0,0 +1,57 @@
+"""Unit tests for the benchmark helpers."""
+import pytest
+from app.llm import GenerationOptions
+from app.ollama_client import OllamaLLM
+from benchmarks.compare import compare
+from benchmarks.fake_ollama import FakeOllamaServer
+from benchmarks.report import percentile, summarize
+
+
+def test_percentile_interpolates():
+    """Test percentiles interpolate between samples."""
+    values = [1.0, 2.0, 3.0, 4.0, 5.0]
+    assert percentile(values, 50) == 3.0
+    assert percentile(values, 95) == 4.8
+    assert percentile([], 50) == 0.0
+    assert summarize([]) is None
+    assert summarize([0.001, 0.002, 0.003])["p50"] == 2.0
+
+
+def test_compare_flags_regressions_by_direction():
+    """Test lower throughput and higher latency count as regressions."""
+    baseline = {"chat": {"throughput_rps": 100.0, "latency_ms": {"p50": 10.0, "p95": 20.0, "p99": 30.0}}}
+    candidate = {"chat": {"throughput_rps": 120.0, "latency_ms": {"p50": 10.5, "p95": 25.0, "p99": 30.0}}}
+    
+    rows, regressions = compare(baseline, candidate, threshold=0.10)
+    
+    assert len(rows) == 4
+    assert regressions == ["chat.latency_ms.p95"]
+    
+    rows, regressions = compare(baseline, candidate, threshold=0.10, percentiles=("p50",))
+    assert regressions == []
+
+
+def test_micro_benchmarks_run_on_fakeredis():
+    """Test the micro-benchmark harness and clean-up on the in-process backend."""
+    pytest.importorskip("fakeredis")
+    from benchmarks import micro
+    
+    results = micro.run(["fake"], "", rounds=3, warmup=1, filter="history=10]")
+    
+    assert "fake:get_context_window[size=1024,history=10]" in results
+    assert all(r["rounds"] == 3 and r["ops_per_sec"] > 0 for r in results.values())
+
+
+def test_fake_ollama_serves_generate():
+    """Test the stub server works with the real Ollama client."""
+    server = FakeOllamaServer(("127.0.0.1", 0), tokens_per_second=1000, latency=0, tokens=5)
+    server.start_background()
+    try:
+        client = OllamaLLM(server.url, "fake")
+        assert client.health_check()
+        assert len(client.generate("Hi").split()) == 5
+        assert len(list(client.generate_stream("Hi"))) == 5
+        assert len(client.generate("Hi", options=GenerationOptions(num_predict=3)).split()) == 3
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,58 @@
+"""Unit tests for small/large model cascade routing."""
+from config.config import Settings
+from app.cascade import LARGE, SMALL, ModelCascade, complexity_score, create_cascade
+from app.llm_router import create_llm_router
+
+
+def test_complexity_score_ranks_messages():
+    """Test greetings score low and multi-part reasoning questions score high."""
+    simple = complexity_score("hi, thanks!")
+    hard = complexity_score(
+        "Why do I feel worse in the evenings?\nShould I change my routine?\n"
+        "Can you explain the pros and cons of journaling?"
+    )
+    
+    assert 0.0 <= simple < 0.1
+    assert 0.5 <= hard <= 1.0
+
+
+def test_cascade_routes_with_reasons():
+    """Test each rule in order: persona, keyword, length, score, then small."""
+    cascade = ModelCascade(
+        max_chars=80,
+        threshold=0.5,
+        escalate_keywords=["Overdose"],
+        large_personas=["mental_health_nurse"]
+    )
+    
+    assert cascade.route("hello", "mental_health_nurse") == (LARGE, "persona")
+    assert cascade.route("what is an overdose", "supportive_coach") == (LARGE, "keyword")
+    assert cascade.route("x" * 81, "supportive_coach") == (LARGE, "length")
+    assert cascade.route("hello", "supportive_coach") == (SMALL, "simple")
+    
+    scored = ModelCascade(scorer=lambda message: 0.9)
+    assert scored.route("hello") == (LARGE, "score")
+
+
+def test_cascade_select_backend_respects_pinned_persona():
+    """Test simple turns go to the small backend unless the persona is pinned."""
+    cascade = ModelCascade()
+    
+    assert cascade.select_backend("hi", "supportive_coach", None) == SMALL
+    assert cascade.select_backend("hi", "supportive_coach", "openai") == "openai"
+    assert cascade.select_backend("x" * 500, "supportive_coach", None) is None
+
+
+def test_create_cascade_requires_small_model():
+    """Test the cascade and the small backend only exist when a small model is set."""
+    assert create_cascade(Settings(small_model_name="")) is None
+    assert "small" not in create_llm_router(Settings(small_model_name="")).backends
+    
+    settings = Settings(small_model_name="llama3.2:1b", cascade_large_personas="mental_health_nurse")
+    cascade = create_cascade(settings)
+    router = create_llm_router(settings)
+    
+    assert cascade.large_personas == {"mental_health_nurse"}
+    assert router.backends["small"].model == "llama3.2:1b"
+    # A failing small model escalates to the default (large) backend
+    assert [b.name for b in router.chain("small")][:2] == ["small", "ollama"]
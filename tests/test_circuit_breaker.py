@@ -0,0 +1,72 @@
+"""Unit tests for the circuit breaker."""
+import pytest
+from unittest.mock import patch
+from app.circuit_breaker import CircuitBreaker, CircuitOpenError
+
+
+@pytest.fixture
+def breaker():
+    """Create a breaker with a low threshold."""
+    return CircuitBreaker("test", failure_threshold=2, recovery_timeout=10, slow_call_threshold=1.0)
+
+
+def _fail(breaker):
+    """Record one failed call through the breaker."""
+    with pytest.raises(RuntimeError):
+        breaker.call(lambda: (_ for _ in ()).throw(RuntimeError("boom")))
+
+
+def test_opens_after_consecutive_failures(breaker):
+    """Test circuit opens and fast-fails after the threshold."""
+    _fail(breaker)
+    assert breaker.state == CircuitBreaker.CLOSED
+    _fail(breaker)
+    assert breaker.state == CircuitBreaker.OPEN
+    
+    with pytest.raises(CircuitOpenError) as exc_info:
+        breaker.call(lambda: "ok")
+    assert exc_info.value.retry_after > 0
+
+
+def test_success_resets_failures(breaker):
+    """Test a success between failures keeps the circuit closed."""
+    _fail(breaker)
+    assert breaker.call(lambda: "ok") == "ok"
+    _fail(breaker)
+    
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_slow_calls_count_as_failures(breaker):
+    """Test calls over the slow-call threshold open the circuit."""
+    breaker.record_success(duration=5.0)
+    breaker.record_success(duration=5.0)
+    
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_half_open_probe(breaker):
+    """Test half-open allows limited probes and closes on success."""
+    with patch("app.circuit_breaker.time.monotonic", return_value=100.0):
+        _fail(breaker)
+        _fail(breaker)
+    
+    with patch("app.circuit_breaker.time.monotonic", return_value=111.0):
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        breaker.before_call()
+        with pytest.raises(CircuitOpenError):
+            breaker.before_call()
+        breaker.record_success(duration=0.1)
+    
+    assert breaker.snapshot() == {"state": "closed", "consecutive_failures": 0}
+
+
+def test_half_open_failure_reopens(breaker):
+    """Test a failed probe re-opens the circuit."""
+    with patch("app.circuit_breaker.time.monotonic", return_value=100.0):
+        _fail(breaker)
+        _fail(breaker)
+    
+    with patch("app.circuit_breaker.time.monotonic", return_value=111.0):
+        _fail(breaker)
+        assert breaker.state == CircuitBreaker.OPEN
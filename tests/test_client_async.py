@@ -0,0 +1,51 @@
+"""Unit tests for the async API client and load generator."""
+import asyncio
+import json
+import httpx
+from benchmarks.loadgen import LoadGenerator, parse_args
+from client_async import AsyncNonoChatbotClient
+
+
+def _api_transport(calls):
+    """Mock transport answering the endpoints the load generator uses."""
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append((request.method, request.url.path, json.loads(request.content or b"null")))
+        if request.url.path == "/api/chat":
+            return httpx.Response(200, json={"response": "ok", "session_id": "s", "timestamp": "t"})
+        if request.url.path.endswith("/history"):
+            return httpx.Response(200, json={"messages": [], "next_cursor": None})
+        return httpx.Response(200, json={"status": "ok"})
+    return httpx.MockTransport(handler)
+
+
+def test_send_message_uses_chat_api_payload():
+    """Test messages are sent in the /api/chat request format."""
+    calls = []
+    
+    async def run():
+        async with AsyncNonoChatbotClient(transport=_api_transport(calls)) as client:
+            return await client.send_message("user123", "Hello")
+    
+    assert asyncio.run(run())["response"] == "ok"
+    assert calls == [("POST", "/api/chat", {"session_id": "session_user123", "user_message": "Hello"})]
+
+
+def test_load_generator_records_operations():
+    """Test virtual users start sessions, chat, read history and clear."""
+    calls = []
+    args = parse_args([
+        "--users", "2", "--ramp-up", "0", "--duration", "0.2",
+        "--turns", "2", "--think-time", "0.01", "--history-every", "2"
+    ])
+    
+    async def run():
+        async with AsyncNonoChatbotClient(transport=_api_transport(calls)) as client:
+            generator = LoadGenerator(client, args)
+            return await generator.run(), generator.timeline_summary()
+    
+    results, timeline = asyncio.run(run())
+    
+    assert set(results) == {"session_start", "chat", "history", "clear"}
+    assert 0 < results["history"]["requests"] <= results["chat"]["requests"] // 2
+    assert results["chat"]["errors"] == 0
+    assert timeline[0]["active_users"] == 2
@@ -0,0 +1,102 @@
+"""Unit tests for load-adaptive degradation."""
+import asyncio
+from types import SimpleNamespace
+from app.degradation import DegradationController
+from app.llm import GenerationOptions
+from app.scheduler import GenerationScheduler
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+    
+    def __call__(self):
+        return self.now
+
+
+def _controller(**kwargs):
+    scheduler = SimpleNamespace(waiting=0, active=0, recent_latency=0.0)
+    clock = FakeClock()
+    controller = DegradationController(
+        scheduler, queue_thresholds=(4, 8), latency_thresholds=(10.0, 20.0),
+        recovery_seconds=30.0, clock=clock, **kwargs
+    )
+    return controller, scheduler, clock
+
+
+def test_level_rises_with_queue_depth_and_latency():
+    """Test queue depth and recent latency each raise the level immediately."""
+    controller, scheduler, _ = _controller()
+    assert controller.update().name == "normal"
+    
+    scheduler.waiting = 5
+    assert controller.update().name == "reduced"
+    
+    scheduler.waiting, scheduler.active, scheduler.recent_latency = 0, 2, 25.0
+    assert controller.update().name == "minimal"
+    assert controller.snapshot()["level"] == 2
+
+
+def test_level_recovers_one_step_after_calm_period():
+    """Test the level falls a step at a time once load stays low."""
+    controller, scheduler, clock = _controller()
+    scheduler.waiting = 10
+    controller.update()
+    
+    scheduler.waiting = 0
+    assert controller.update().name == "minimal"
+    clock.now = 29.0
+    assert controller.update().name == "minimal"
+    clock.now = 31.0
+    assert controller.update().name == "reduced"
+    clock.now = 62.0
+    assert controller.update().name == "normal"
+
+
+def test_idle_scheduler_ignores_stale_latency():
+    """Test a high latency average does not keep an idle process degraded."""
+    controller, scheduler, _ = _controller()
+    scheduler.recent_latency = 50.0
+    
+    assert controller.update().name == "normal"
+
+
+def test_degraded_context_and_max_tokens():
+    """Test history and max_tokens shrink per level, within their floors."""
+    controller, scheduler, _ = _controller(min_context_messages=2, min_max_tokens=64)
+    options = GenerationOptions(num_predict=500)
+    
+    assert controller.context_limit(10) == 10
+    assert controller.apply(options) is options
+    
+    scheduler.waiting = 5
+    controller.update()
+    assert controller.context_limit(10) == 5
+    assert controller.apply(options).num_predict == 300
+    assert options.num_predict == 500
+    
+    scheduler.waiting = 8
+    controller.update()
+    assert controller.context_limit(10) == 2
+    assert controller.apply(GenerationOptions(num_predict=100)).num_predict == 64
+    assert controller.apply(GenerationOptions(num_predict=50)).num_predict == 50
+
+
+def test_disabled_controller_stays_normal():
+    """Test DEGRADATION_ENABLED=false leaves prompts and replies untouched."""
+    controller, scheduler, _ = _controller(enabled=False)
+    scheduler.waiting = 100
+    
+    assert controller.update().name == "normal"
+
+
+def test_scheduler_tracks_recent_latency():
+    """Test the scheduler keeps a moving average of call times."""
+    scheduler = GenerationScheduler(max_concurrent=1, latency_smoothing=0.5)
+    
+    asyncio.run(scheduler.run(lambda: None))
+    first = scheduler.recent_latency
+    scheduler._observe_latency(first + 2.0)
+    
+    assert first >= 0
+    assert abs(scheduler.recent_latency - (first + 1.0)) < 1e-9
@@ -0,0 +1,83 @@
+"""Unit tests for multi-persona fan-out."""
+import asyncio
+import threading
+import time
+from app.circuit_breaker import CircuitOpenError
+from app.fanout import fan_out
+from app.llm import GenerationOptions
+from app.scheduler import GenerationScheduler
+
+
+def _persona(key):
+    return {"key": key, "system": f"You are {key}.", "options": GenerationOptions(num_predict=50)}
+
+
+def _collect(scheduler, generate_stream, personas):
+    async def run():
+        return [event async for event in fan_out(scheduler, generate_stream, "User: Hi\nAssistant:", personas)]
+    return asyncio.run(run())
+
+
+def test_fan_out_runs_personas_concurrently():
+    """Test personas stream in parallel, tagged, within scheduler slots."""
+    def generate_stream(prompt, system, options, backend=None):
+        for word in system.split():
+            time.sleep(0.05)
+            yield word
+    
+    started = time.perf_counter()
+    events = _collect(GenerationScheduler(max_concurrent=3), generate_stream,
+                      [_persona("clara"), _persona("alex"), _persona("sam")])
+    elapsed = time.perf_counter() - started
+    
+    complete = {e["persona"]: e["response"] for e in events if e["type"] == "complete"}
+    assert complete == {"clara": "Youareclara.", "alex": "Youarealex.", "sam": "Youaresam."}
+    assert elapsed < 0.4  # 3 personas x 3 chunks x 50ms would take 0.45s sequentially
+    
+    first_chunks = [e["persona"] for e in events if e["type"] == "chunk"][:3]
+    assert sorted(first_chunks) == ["alex", "clara", "sam"]
+
+
+def test_fan_out_reports_errors_per_persona():
+    """Test one persona failing does not stop the others."""
+    def generate_stream(prompt, system, options, backend=None):
+        if "alex" in system:
+            raise CircuitOpenError("ollama", 12.0)
+        yield "ok"
+    
+    events = _collect(GenerationScheduler(max_concurrent=1), generate_stream, [_persona("clara"), _persona("alex")])
+    
+    by_persona = {e["persona"]: e for e in events if e["type"] != "chunk"}
+    assert by_persona["clara"]["type"] == "complete"
+    assert by_persona["alex"]["type"] == "error"
+    assert by_persona["alex"]["retry_after"] == 12.0
+
+
+def test_fan_out_disconnect_mid_chunk_closes_generation_in_slot():
+    """Test a client leaving during a chunk closes the generator before freeing its slot."""
+    scheduler = GenerationScheduler(max_concurrent=1)
+    in_chunk = threading.Event()
+    release = threading.Event()
+    closed = []
+    
+    def generate_stream(prompt, system, options, backend=None):
+        try:
+            yield "Hi"
+            in_chunk.set()
+            release.wait(5)
+            yield "there"
+        finally:
+            closed.append(scheduler.active)
+    
+    async def run():
+        events = fan_out(scheduler, generate_stream, "User: Hi\nAssistant:", [_persona("clara")])
+        assert (await events.__anext__())["content"] == "Hi"
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, in_chunk.wait, 5)
+        loop.call_later(0.1, release.set)
+        await events.aclose()
+    
+    asyncio.run(run())
+    
+    assert closed == [1]  # Closed while the slot was still held
+    assert scheduler.active == 0
@@ -0,0 +1,144 @@
+"""Unit tests for LLM backends and failover routing."""
+import socket
+import pytest
+from app.circuit_breaker import CircuitBreaker, CircuitOpenError
+from app.llm import GenerationOptions, LLMBackend
+from app.llm_router import LLMRouter
+from app.ollama_client import OllamaLLM
+from app.openai_client import OpenAICompatibleLLM
+from benchmarks.fake_ollama import FakeOllamaServer
+
+
+class StubBackend(LLMBackend):
+    """Backend returning canned chunks or raising."""
+    
+    def __init__(self, name, chunks=("Hi",), error=None, fail_after=None):
+        self.name = name
+        self.model = "stub"
+        self.breaker = CircuitBreaker(name)
+        self.chunks = list(chunks)
+        self.error = error
+        self.fail_after = fail_after
+        self.calls = 0
+    
+    def health_check(self):
+        return self.error is None
+    
+    def generate(self, prompt, system=None, options=None):
+        self.calls += 1
+        if self.error:
+            raise self.error
+        return "".join(self.chunks)
+    
+    def generate_stream(self, prompt, system=None, options=None):
+        self.calls += 1
+        if self.error and self.fail_after is None:
+            raise self.error
+        for i, chunk in enumerate(self.chunks):
+            if self.fail_after == i:
+                raise self.error
+            yield chunk
+
+
+@pytest.fixture
+def stub_server():
+    """Run the stub Ollama/OpenAI server."""
+    server = FakeOllamaServer(("127.0.0.1", 0), tokens_per_second=1000, latency=0, tokens=5)
+    server.start_background()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _dead_url():
+    """URL of a local port nothing listens on."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return f"http://127.0.0.1:{sock.getsockname()[1]}"
+
+
+def test_router_rejects_unknown_backends():
+    """Test misconfigured default or fallbacks fail at start-up."""
+    with pytest.raises(ValueError, match="groq"):
+        LLMRouter({"ollama": StubBackend("ollama")}, "ollama", ["groq"])
+
+
+def test_router_uses_persona_backend_first():
+    """Test the persona's backend leads the chain, then the default, then the fallbacks."""
+    backends = {name: StubBackend(name) for name in ("ollama", "openai", "spare")}
+    router = LLMRouter(backends, "ollama", ["openai", "spare"])
+    
+    assert [b.name for b in router.chain()] == ["ollama", "openai", "spare"]
+    assert [b.name for b in router.chain("openai")] == ["openai", "ollama", "spare"]
+    assert [b.name for b in router.chain("spare")] == ["spare", "ollama", "openai"]
+    assert [b.name for b in router.chain("unknown")] == ["ollama", "openai", "spare"]
+
+
+def test_router_fails_over_in_order():
+    """Test errors and open circuits move to the next backend."""
+    primary = StubBackend("ollama", error=ConnectionError("down"))
+    secondary = StubBackend("openai", error=CircuitOpenError("openai", 10.0))
+    tertiary = StubBackend("spare", chunks=["Hel", "lo"])
+    router = LLMRouter({"ollama": primary, "openai": secondary, "spare": tertiary}, "ollama", ["openai", "spare"])
+    
+    assert router.generate("Hi") == "Hello"
+    assert list(router.generate_stream("Hi")) == ["Hel", "lo"]
+    assert (primary.calls, secondary.calls, tertiary.calls) == (2, 2, 2)
+
+
+def test_router_raises_circuit_open_when_all_open():
+    """Test callers still get Retry-After information when everything is open."""
+    router = LLMRouter({
+        "ollama": StubBackend("ollama", error=CircuitOpenError("ollama", 20.0)),
+        "openai": StubBackend("openai", error=CircuitOpenError("openai", 5.0))
+    }, "ollama", ["openai"])
+    
+    with pytest.raises(CircuitOpenError) as exc:
+        router.generate("Hi")
+    assert exc.value.retry_after == 5.0
+    
+    with pytest.raises(CircuitOpenError):
+        list(router.generate_stream("Hi"))
+
+
+def test_router_does_not_fail_over_mid_stream():
+    """Test a stream that already produced output is not restarted elsewhere."""
+    primary = StubBackend("ollama", chunks=["Hel", "lo"], error=ConnectionError("reset"), fail_after=1)
+    secondary = StubBackend("openai")
+    router = LLMRouter({"ollama": primary, "openai": secondary}, "ollama", ["openai"])
+    
+    received = []
+    with pytest.raises(ConnectionError):
+        for chunk in router.generate_stream("Hi"):
+            received.append(chunk)
+    assert received == ["Hel"]
+    assert secondary.calls == 0
+
+
+def test_openai_backend_against_stub(stub_server):
+    """Test the OpenAI-compatible client with the stub server."""
+    client = OpenAICompatibleLLM(f"{stub_server.url}/v1", "fake", api_key="key")
+    
+    assert client.health_check()
+    assert len(client.generate("Hi", system="Be kind").split()) == 5
+    assert len(client.generate("Hi", options=GenerationOptions(num_predict=3)).split()) == 3
+    assert len(list(client.generate_stream("Hi"))) == 5
+    
+    payload = client._build_payload("Hi", "Be kind", GenerationOptions(stop=list("abcdef"), seed=1), False)
+    assert payload["messages"][0] == {"role": "system", "content": "Be kind"}
+    assert payload["stop"] == ["a", "b", "c", "d"]
+    assert payload["seed"] == 1
+
+
+def test_failover_from_dead_ollama_to_openai_stub(stub_server):
+    """Test generation survives the primary being down."""
+    router = LLMRouter({
+        "ollama": OllamaLLM(_dead_url(), "llama2", breaker=CircuitBreaker("ollama", failure_threshold=1)),
+        "openai": OpenAICompatibleLLM(f"{stub_server.url}/v1", "fake")
+    }, "ollama", ["openai"])
+    
+    assert len(router.generate("Hi").split()) == 5
+    assert router.snapshot()["ollama"]["state"] == "open"
+    # With the circuit open the dead backend is skipped without a connection attempt
+    assert len(list(router.generate_stream("Hi"))) == 5
+    assert router.health_check()
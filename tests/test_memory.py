@@ -1,7 +1,7 @@
 """Unit tests for memory management."""
 import pytest
 import json
-from unittest.mock import Mock, MagicMock
+from unittest.mock import Mock, MagicMock, patch
 from app.memory import ChatMemoryManager
 
 
@@ -21,15 +21,18 @@ def test_add_message(memory_manager, mock_redis):
     """Test adding a message to history."""
     memory_manager.add_message("user", "Hello!")
     
-    # Verify rpush was called
-    mock_redis.rpush.assert_called_once()
-    args, kwargs = mock_redis.rpush.call_args
+    # Verify rpush and trim were pipelined
+    pipe = mock_redis.pipeline.return_value
+    pipe.rpush.assert_called_once()
+    args, kwargs = pipe.rpush.call_args
     
     assert args[0] == "chat:test_user:history"
     message_data = json.loads(args[1])
     assert message_data["role"] == "user"
     assert message_data["content"] == "Hello!"
     assert "timestamp" in message_data
+    pipe.ltrim.assert_called_once_with("chat:test_user:history", -5, -1)
+    pipe.execute.assert_called_once()
 
 
 def test_get_messages(memory_manager, mock_redis):
@@ -100,3 +103,126 @@ def test_session_info(memory_manager, mock_redis):
     assert len(info["messages"]) == 1
     assert info["metadata"]["persona"] == "nurse"
     assert info["message_count"] == 1
+
+
+def _history(count):
+    """Build raw history entries with sequential ids."""
+    return [
+        json.dumps({"id": f"{i:020d}", "role": "user", "content": str(i), "timestamp": f"2024-01-01T00:00:{i:02d}"})
+        for i in range(1, count + 1)
+    ]
+
+
+def _lrange(entries):
+    """Emulate Redis LRANGE (inclusive, negative indexes) over a list."""
+    def lrange(key, start, end):
+        n = len(entries)
+        start = max(start + n if start < 0 else start, 0)
+        end = end + n if end < 0 else end
+        return entries[start:end + 1]
+    return lrange
+
+
+def test_get_messages_page_newest(memory_manager, mock_redis):
+    """Test newest page and backwards cursor."""
+    mock_redis.lrange.side_effect = _lrange(_history(7))
+    
+    page, cursor = memory_manager.get_messages_page(limit=3)
+    assert [m["content"] for m in page] == ["5", "6", "7"]
+    assert cursor == f"{5:020d}"
+    
+    page, cursor = memory_manager.get_messages_page(limit=3, before=cursor)
+    assert [m["content"] for m in page] == ["2", "3", "4"]
+    
+    page, cursor = memory_manager.get_messages_page(limit=3, before=cursor)
+    assert [m["content"] for m in page] == ["1"]
+    assert cursor is None
+
+
+def test_get_messages_page_after_timestamp(memory_manager, mock_redis):
+    """Test forward paging with a timestamp cursor."""
+    mock_redis.lrange.side_effect = _lrange(_history(5))
+    
+    page, cursor = memory_manager.get_messages_page(limit=2, after="2024-01-01T00:00:02")
+    assert [m["content"] for m in page] == ["3", "4"]
+    assert cursor == f"{4:020d}"
+    
+    page, cursor = memory_manager.get_messages_page(limit=2, after=cursor)
+    assert [m["content"] for m in page] == ["5"]
+    assert cursor is None
+
+
+def test_iter_messages_batches(memory_manager, mock_redis):
+    """Test batched iteration over the full history."""
+    mock_redis.lrange.side_effect = _lrange(_history(5))
+    
+    messages = list(memory_manager.iter_messages(batch_size=2))
+    
+    assert [m["content"] for m in messages] == ["1", "2", "3", "4", "5"]
+    assert mock_redis.lrange.call_count == 3
+
+
+def test_iter_messages_survives_concurrent_trim(memory_manager, mock_redis):
+    """Test a trim between batches neither skips nor repeats messages."""
+    entries = _history(6)
+    mock_redis.lrange.side_effect = _lrange(entries)
+    iterator = memory_manager.iter_messages(batch_size=2)
+    
+    seen = [next(iterator)["content"] for _ in range(2)]
+    del entries[:3]
+    seen += [m["content"] for m in iterator]
+    
+    assert seen == ["1", "2", "4", "5", "6"]
+
+
+def test_get_messages_page_survives_concurrent_append(memory_manager, mock_redis):
+    """Test an append between batches does not repeat a message in the page."""
+    entries = _history(5)
+    lrange = _lrange(entries)
+    
+    def appending_lrange(key, start, end):
+        result = lrange(key, start, end)
+        if len(entries) == 5:
+            entries.append(_history(6)[-1])
+        return result
+    mock_redis.lrange.side_effect = appending_lrange
+    
+    page, _ = memory_manager.get_messages_page(limit=2, before=f"{4:020d}")
+    
+    assert [m["content"] for m in page] == ["2", "3"]
+
+
+def test_message_ids_are_unique_within_a_clock_tick():
+    """Test ids stay unique and ordered when the clock does not advance."""
+    with patch("app.memory.time.time_ns", return_value=1_700_000_000_000_000_000):
+        ids = [ChatMemoryManager._new_message_id() for _ in range(3)]
+    
+    assert len(set(ids)) == 3
+    assert ids == sorted(ids)
+    assert all(i.isdigit() for i in ids)
+
+
+def test_langchain_not_imported_at_startup():
+    """Test importing the app does not load LangChain."""
+    import subprocess
+    import sys
+    
+    code = "import sys, app.main; print(any(m.split('.')[0] == 'langchain' for m in sys.modules))"
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    
+    assert result.stdout.strip() == "False"
+
+
+def test_get_langchain_messages(memory_manager, mock_redis):
+    """Test conversion to LangChain messages when LangChain is installed."""
+    schema = pytest.importorskip("langchain.schema")
+    mock_redis.lrange.return_value = [
+        json.dumps({"role": "user", "content": "Hi"}),
+        json.dumps({"role": "assistant", "content": "Hello"})
+    ]
+    
+    messages = memory_manager.get_langchain_messages()
+    
+    assert isinstance(messages[0], schema.HumanMessage)
+    assert isinstance(messages[1], schema.AIMessage)
+    assert messages[1].content == "Hello"
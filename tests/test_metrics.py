@@ -0,0 +1,139 @@
+"""Unit tests for metrics and the generation scheduler."""
+import asyncio
+import time
+import pytest
+from unittest.mock import patch
+from app.metrics import (
+    Counter,
+    Gauge,
+    Histogram,
+    Registry,
+    mark_process_dead,
+    merge_files,
+    observe_ollama_stats,
+    TOKENS_PER_SECOND
+)
+from app.scheduler import GenerationScheduler
+
+
+@pytest.fixture
+def registry():
+    """Create an isolated registry."""
+    return Registry()
+
+
+def test_histogram_render(registry):
+    """Test cumulative buckets, sum and count are rendered."""
+    histogram = Histogram("latency_seconds", "Latency", ["endpoint"], buckets=(0.1, 1.0), registry=registry)
+    histogram.labels(endpoint="chat").observe(0.05)
+    histogram.labels(endpoint="chat").observe(0.5)
+    histogram.labels(endpoint="chat").observe(5)
+    
+    text = registry.render()
+    
+    assert 'latency_seconds_bucket{endpoint="chat",le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{endpoint="chat",le="1"} 2' in text
+    assert 'latency_seconds_bucket{endpoint="chat",le="+Inf"} 3' in text
+    assert 'latency_seconds_sum{endpoint="chat"} 5.55' in text
+    assert 'latency_seconds_count{endpoint="chat"} 3' in text
+
+
+def test_counter_and_gauge(registry):
+    """Test counter and gauge updates."""
+    counter = Counter("requests_total", "Requests", registry=registry)
+    gauge = Gauge("open_sockets", "Sockets", registry=registry)
+    counter.inc()
+    counter.inc(2)
+    gauge.inc()
+    gauge.inc()
+    gauge.dec()
+    
+    text = registry.render()
+    
+    assert "# TYPE requests_total counter" in text
+    assert "requests_total 3" in text
+    assert "open_sockets 1" in text
+
+
+def test_histogram_time_decorator(registry):
+    """Test timing decorator records one observation per call."""
+    histogram = Histogram("op_seconds", "Op", ["operation"], registry=registry)
+    
+    @histogram.time(operation="get")
+    def op():
+        return "ok"
+    
+    assert op() == "ok"
+    assert histogram.labels(operation="get").count == 1
+
+
+def test_observe_ollama_stats():
+    """Test tokens/second is derived from Ollama eval fields."""
+    before = TOKENS_PER_SECOND.labels().count
+    
+    observe_ollama_stats({"eval_count": 50, "eval_duration": 2_000_000_000, "prompt_eval_duration": 10})
+    
+    child = TOKENS_PER_SECOND.labels()
+    assert child.count == before + 1
+    assert child.sum >= 25
+
+
+def test_scheduler_limits_concurrency():
+    """Test the scheduler never runs more than max_concurrent calls."""
+    scheduler = GenerationScheduler(max_concurrent=2)
+    peak = {"active": 0}
+    
+    def work():
+        peak["active"] = max(peak["active"], scheduler.active)
+        return "done"
+    
+    async def run_all():
+        return await asyncio.gather(*(scheduler.run(work) for _ in range(6)))
+    
+    assert asyncio.run(run_all()) == ["done"] * 6
+    assert peak["active"] <= 2
+    assert scheduler.snapshot() == {"waiting": 0, "active": 0, "max_concurrent": 2}
+
+
+def test_scheduler_stream():
+    """Test streaming a blocking generator through the scheduler."""
+    scheduler = GenerationScheduler(max_concurrent=1)
+    
+    async def collect():
+        return [chunk async for chunk in scheduler.stream(lambda: iter(["a", "b"]))]
+    
+    assert asyncio.run(collect()) == ["a", "b"]
+
+
+def test_scheduler_drain_waits_for_generations():
+    """Test drain returns once in-flight generations finish, or times out."""
+    scheduler = GenerationScheduler(max_concurrent=1)
+    
+    async def run():
+        generation = asyncio.ensure_future(scheduler.run(time.sleep, 0.2))
+        await asyncio.sleep(0.05)
+        timed_out = await scheduler.drain(timeout=0.01)
+        drained = await scheduler.drain(timeout=5)
+        await generation
+        return timed_out, drained
+    
+    assert asyncio.run(run()) == (False, True)
+
+
+def test_multiprocess_merge(tmp_path):
+    """Test worker files are merged: counters and histograms summed, gauges per live pid."""
+    for pid, requests, sockets in ((101, 2, 3), (102, 5, 1)):
+        worker = Registry()
+        Counter("requests_total", "Requests", ["endpoint"], registry=worker).labels(endpoint="chat").inc(requests)
+        Gauge("open_sockets", "Sockets", registry=worker).set(sockets)
+        Histogram("latency_seconds", "Latency", buckets=(1.0,), registry=worker).observe(0.5)
+        with patch("app.metrics.os.getpid", return_value=pid):
+            worker.dump(str(tmp_path))
+    
+    mark_process_dead(102, str(tmp_path))
+    text = merge_files(str(tmp_path))
+    
+    assert 'requests_total{endpoint="chat"} 7' in text
+    assert 'latency_seconds_count 2' in text
+    assert 'open_sockets{pid="101"} 3' in text
+    assert 'pid="102"' not in text
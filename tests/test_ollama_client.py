@@ -0,0 +1,93 @@
+"""Unit tests for the Ollama client."""
+import json
+import pytest
+from unittest.mock import MagicMock, patch
+from app.circuit_breaker import CircuitBreaker
+from app.llm import DEFAULT_STOP, GenerationOptions
+from app.ollama_client import OllamaLLM
+
+
+def test_generation_options_to_options():
+    """Test unset options are omitted and keep_alive stays out of options."""
+    options = GenerationOptions(temperature=0.2, num_predict=64, seed=7, keep_alive="5m")
+    
+    assert options.to_options() == {
+        "temperature": 0.2,
+        "num_predict": 64,
+        "stop": DEFAULT_STOP,
+        "seed": 7
+    }
+
+
+def test_generation_options_from_config():
+    """Test max_tokens aliases num_predict and unknown keys are ignored."""
+    options = GenerationOptions.from_config({"max_tokens": 200, "name": "Clara", "stop": []})
+    
+    assert options.num_predict == 200
+    assert options.stop == []
+    assert GenerationOptions.from_config({"max_tokens": 200, "num_predict": 100}).num_predict == 100
+
+
+@patch("app.ollama_client.requests.post")
+def test_generate_sends_options_object(mock_post):
+    """Test sampling settings go in ``options`` with client defaults merged in."""
+    mock_post.return_value.json.return_value = {"response": " Hi "}
+    client = OllamaLLM(
+        "http://ollama:11434",
+        "llama2",
+        default_options={"num_ctx": 2048, "num_thread": 4},
+        keep_alive="30m"
+    )
+    
+    result = client.generate("User: Hi\nAssistant:", system="Be kind",
+                             options=GenerationOptions(num_predict=50, num_ctx=4096))
+    
+    payload = mock_post.call_args.kwargs["json"]
+    assert result == "Hi"
+    assert payload["options"]["num_predict"] == 50
+    assert payload["options"]["num_ctx"] == 4096
+    assert payload["options"]["num_thread"] == 4
+    assert payload["options"]["stop"] == DEFAULT_STOP
+    assert payload["keep_alive"] == "30m"
+    assert payload["system"] == "Be kind"
+    assert "num_predict" not in payload and "temperature" not in payload
+
+
+@patch("app.ollama_client.requests.post")
+def test_generate_stream_sends_options_object(mock_post):
+    """Test streaming requests carry the same options."""
+    response = MagicMock()
+    response.iter_lines.return_value = [
+        json.dumps({"response": "Hel"}).encode(),
+        json.dumps({"response": "lo", "done": True}).encode()
+    ]
+    mock_post.return_value.__enter__.return_value = response
+    client = OllamaLLM("http://ollama:11434", "llama2")
+    
+    chunks = list(client.generate_stream("Hi", options=GenerationOptions(num_predict=10, keep_alive="1m")))
+    
+    payload = mock_post.call_args.kwargs["json"]
+    assert chunks == ["Hel", "lo"]
+    assert payload["stream"] is True
+    assert payload["options"]["num_predict"] == 10
+    assert payload["keep_alive"] == "1m"
+
+
+@pytest.mark.parametrize("stream", [False, True])
+@patch("app.ollama_client.requests.post")
+def test_unexpected_error_settles_half_open_probe(mock_post, stream):
+    """Test a non-transport error fails the probe instead of leaking it."""
+    mock_post.return_value.json.side_effect = ValueError("bad body")
+    mock_post.return_value.__enter__.return_value.iter_lines.side_effect = KeyError("response")
+    breaker = CircuitBreaker("ollama", failure_threshold=1, recovery_timeout=0)
+    breaker.record_failure()
+    client = OllamaLLM("http://ollama:11434", "llama2", breaker=breaker)
+    
+    with pytest.raises((ValueError, KeyError)):
+        if stream:
+            list(client.generate_stream("Hi"))
+        else:
+            client.generate("Hi")
+    
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    breaker.before_call()  # The failed probe no longer holds the only slot
@@ -24,6 +24,9 @@ def persona_config():
                 "system_prompt": "You are Alex, a motivating coach.",
                 "temperature": 0.6,
                 "max_tokens": 400,
+                "num_ctx": 4096,
+                "stop": ["\nUser:"],
+                "seed": 42,
                 "system_tags": ["motivational"]
             }
         }
@@ -73,6 +76,22 @@ def test_get_persona_info(persona_manager):
     assert len(info["tags"]) == 2
 
 
+def test_get_generation_options(persona_manager):
+    """Test persona settings are mapped onto generation options."""
+    options = persona_manager.get_generation_options("coach")
+    
+    assert options.temperature == 0.6
+    assert options.num_predict == 400
+    assert options.num_ctx == 4096
+    assert options.stop == ["\nUser:"]
+    assert options.seed == 42
+    assert options.num_thread is None
+    
+    defaults = persona_manager.get_generation_options("unknown")
+    assert defaults.num_predict == 500
+    assert "\nUser:" in defaults.stop
+
+
 def test_list_personas(persona_manager):
     """Test listing all available personas."""
     personas = persona_manager.list_personas()
@@ -0,0 +1,97 @@
+"""Unit tests for runtime profiling hooks."""
+import time
+import pytest
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from app.profiling import AllocationTracker, RequestProfiler, RuntimeProfiler, StackSampler
+
+
+def _busy(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        sum(range(100))
+
+
+def test_stack_sampler_collects_collapsed_stacks():
+    """Test the sampler records stacks of other threads."""
+    sampler = StackSampler(interval=0.001)
+    sampler.start()
+    _busy(0.1)
+    report = sampler.stop()
+    
+    assert not sampler.running
+    assert "test_profiling.py:_busy" in report
+    stack, count = report.splitlines()[0].rsplit(" ", 1)
+    assert int(count) > 0
+
+
+def test_request_profiler_report():
+    """Test the cProfile report covers profiled work only."""
+    profiler = RequestProfiler(sample_rate=1.0)
+    assert profiler.report() == "No requests profiled\n"
+    
+    assert profiler.should_profile()
+    assert not profiler.should_profile()  # one request at a time
+    profiler.enable()
+    _busy(0.01)
+    profiler.disable()
+    
+    report = profiler.report()
+    assert report.startswith("Profiled requests: 1")
+    assert "_busy" in report
+    assert profiler.dump()
+
+
+def test_runtime_profiler_start_stop():
+    """Test mode validation and double-start protection."""
+    profiler = RuntimeProfiler()
+    with pytest.raises(ValueError):
+        profiler.start("perf")
+    
+    profiler.start("cprofile", sample_rate=0.5)
+    with pytest.raises(RuntimeError):
+        profiler.start("sampling")
+    assert profiler.status() == {"sampling": False, "cprofile": True, "tracemalloc": False}
+    
+    assert isinstance(profiler.stop(raw=True), bytes)
+    with pytest.raises(RuntimeError):
+        profiler.stop()
+
+
+def test_allocation_tracker_report():
+    """Test allocation sites and per-endpoint averages."""
+    tracker = AllocationTracker(frames=1)
+    tracker.start()
+    try:
+        data = [bytearray(1024) for _ in range(100)]
+        tracker.record("chat_api", 4000)
+        tracker.record("chat_api", 2000)
+        report = tracker.report(limit=5)
+    finally:
+        tracker.stop()
+    
+    assert len(data) == 100
+    assert report["endpoints"] == {"chat_api": {"requests": 2, "avg_net_bytes": 3000}}
+    assert any("test_profiling.py" in site["site"] for site in report["top"])
+
+
+def test_admin_endpoints_require_token():
+    """Test admin endpoints are hidden without a token and need the right one."""
+    from app.main import app
+    client = TestClient(app)
+    
+    with patch('app.main.settings.admin_token', ""):
+        assert client.get("/admin/profiling").status_code == 404
+    
+    with patch('app.main.settings.admin_token', "secret"):
+        assert client.get("/admin/profiling").status_code == 403
+        assert client.get("/admin/profiling", headers={"X-Admin-Token": "wrong"}).status_code == 403
+        
+        headers = {"X-Admin-Token": "secret"}
+        response = client.post("/admin/profiling/start?mode=cprofile&sample_rate=1", headers=headers)
+        assert response.status_code == 200
+        assert client.get("/admin/profiling", headers=headers).json()["cprofile"] is True
+        
+        response = client.post("/admin/profiling/stop", headers=headers)
+        assert response.status_code == 200
+        assert response.text.startswith("Profiled requests:")
@@ -0,0 +1,118 @@
+"""Unit tests for per-user rate limiting and daily token quotas."""
+import pytest
+from redis.exceptions import ConnectionError
+from unittest.mock import patch
+from app import keys
+from app.rate_limit import RateLimiter, estimate_tokens
+from app.redis_client import ShardedRedis
+
+fakeredis = pytest.importorskip("fakeredis")
+pytest.importorskip("lupa")  # fakeredis needs lupa to run Lua scripts
+
+# 2026-01-01 12:00:00 UTC
+NOON = 1767268800.0
+
+
+class Clock:
+    def __init__(self, now=NOON):
+        self.now = now
+    
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def redis_client():
+    return fakeredis.FakeRedis(decode_responses=True)
+
+
+def test_bucket_allows_burst_then_refills(redis_client):
+    """Test a user can send the burst at once, then one message per refill interval."""
+    clock = Clock()
+    limiter = RateLimiter(redis_client, per_minute=6, burst=3, clock=clock)
+    
+    results = [limiter.check("user1") for _ in range(4)]
+    
+    assert [r.allowed for r in results] == [True, True, True, False]
+    assert [r.remaining_requests for r in results[:3]] == [2, 1, 0]
+    assert results[3].reason == "rate"
+    assert results[3].retry_after == pytest.approx(10.0)
+    assert results[3].headers()["Retry-After"] == "10"
+    assert limiter.check("user2").allowed
+    
+    clock.now += 10
+    assert limiter.check("user1").allowed
+    assert not limiter.check("user1").allowed
+    assert 0 < redis_client.ttl(keys.rate_limit_key("user1")) <= 31
+
+
+def test_daily_quota_blocks_until_midnight(redis_client):
+    """Test replies are charged to the quota and a used-up quota refuses turns until the next UTC day."""
+    clock = Clock()
+    limiter = RateLimiter(redis_client, per_minute=0, daily_tokens=100, clock=clock)
+    
+    assert limiter.check("user1").remaining_tokens == 100
+    limiter.charge("user1", None, 60)
+    assert limiter.check("user1").remaining_tokens == 40
+    limiter.charge("user1", None, 60)
+    
+    result = limiter.check("user1")
+    assert not result.allowed and result.reason == "quota"
+    assert result.remaining_tokens == 0
+    assert result.retry_after == pytest.approx(12 * 3600)
+    assert result.remaining_requests is None
+    
+    clock.now += 12 * 3600
+    assert limiter.check("user1").allowed
+
+
+def test_persona_quota(redis_client):
+    """Test persona quotas only apply to turns with that persona, on top of the user's quota."""
+    limiter = RateLimiter(
+        redis_client, per_minute=0, daily_tokens=1000, persona_tokens={"life_coach": 50}, clock=Clock()
+    )
+    limiter.charge("user1", "life_coach", 50)
+    
+    assert not limiter.check("user1", "life_coach").allowed
+    result = limiter.check("user1", "fitness_coach")
+    assert result.allowed and result.remaining_tokens == 950
+
+
+def test_quota_refusal_does_not_take_from_bucket(redis_client):
+    """Test a refused turn leaves the rate limit bucket untouched."""
+    limiter = RateLimiter(redis_client, per_minute=60, burst=2, daily_tokens=10, clock=Clock())
+    limiter.charge("user1", None, 10)
+    
+    assert limiter.check("user1").reason == "quota"
+    assert not redis_client.exists(keys.rate_limit_key("user1"))
+
+
+def test_redis_failure_allows(redis_client):
+    """Test the limiter fails open when Redis is unavailable."""
+    limiter = RateLimiter(redis_client, per_minute=1, burst=1, daily_tokens=10, clock=Clock())
+    
+    with patch.object(redis_client, "evalsha", side_effect=ConnectionError("down")):
+        assert limiter.check("user1").allowed
+
+
+def test_estimate_tokens():
+    """Test generated text is charged at about four characters per token."""
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("Hello there!") == 3
+
+
+def test_limits_with_sharded_redis():
+    """Test the check script and charges run on the user's node when sharded."""
+    nodes = [fakeredis.FakeRedis(server=fakeredis.FakeServer(), decode_responses=True) for _ in range(3)]
+    sharded = ShardedRedis(nodes)
+    
+    with patch("app.keys.settings.redis_hash_tags", True):
+        limiter = RateLimiter(sharded, per_minute=60, burst=2, daily_tokens=10, clock=Clock())
+        assert limiter.check("user1").allowed
+        limiter.charge("user1", None, 10)
+        result = limiter.check("user1")
+        node = sharded.get_node(keys.rate_limit_key("user1"))
+    
+    assert result.reason == "quota"
+    assert node.exists("chat:{user1}:ratelimit")
+    assert sum(len(n.keys()) for n in nodes) == len(node.keys())
@@ -0,0 +1,137 @@
+"""Unit tests for key schema and Redis client construction."""
+import pytest
+from unittest.mock import MagicMock, patch
+from app import keys
+from redis import BlockingConnectionPool, Redis
+from app.redis_client import ShardedRedis, create_redis_client, hash_slot_key, pool_stats
+
+
+def test_keys_without_hash_tags():
+    """Test legacy key layout."""
+    with patch("app.keys.settings") as mock_settings:
+        mock_settings.redis_use_hash_tags = False
+        
+        assert keys.history_key("u1") == "chat:u1:history"
+        assert keys.session_key("u1") == "session:u1"
+
+
+def test_keys_with_hash_tags():
+    """Test all of a user's keys share one hash tag."""
+    with patch("app.keys.settings") as mock_settings:
+        mock_settings.redis_use_hash_tags = True
+        
+        user_keys = keys.user_keys("u1")
+        
+        assert keys.history_key("u1") == "chat:{u1}:history"
+        assert {hash_slot_key(k) for k in user_keys} == {"u1"}
+        assert keys.user_id_from_key("session:{u1}", keys.session_key("*")) == "u1"
+
+
+def test_hash_slot_key():
+    """Test Redis Cluster hash tag extraction rules."""
+    assert hash_slot_key("chat:{abc}:history") == "abc"
+    assert hash_slot_key("chat:{}:history") == "chat:{}:history"
+    assert hash_slot_key("plain") == "plain"
+
+
+@pytest.fixture
+def sharded():
+    """Create ShardedRedis over three mock nodes."""
+    return ShardedRedis([MagicMock(name=f"node{i}") for i in range(3)])
+
+
+def test_sharded_routes_user_keys_to_one_node(sharded):
+    """Test a user's tagged keys always map to the same node."""
+    for user in ["a", "b", "c", "d", "e"]:
+        nodes = {id(sharded.get_node(f"{prefix}:{{{user}}}:x")) for prefix in ["chat", "session", "gen"]}
+        assert len(nodes) == 1
+    
+    users = [f"user{i}" for i in range(200)]
+    used = {id(sharded.get_node(f"session:{{{u}}}")) for u in users}
+    assert len(used) == 3
+
+
+def test_sharded_command_routing(sharded):
+    """Test single-key commands go to the owning node."""
+    node = sharded.get_node("session:{u1}")
+    
+    sharded.get("session:{u1}")
+    
+    node.get.assert_called_once_with("session:{u1}")
+
+
+def test_sharded_pipeline_preserves_order(sharded):
+    """Test pipeline results come back in command order across nodes."""
+    keys_by_node = {}
+    for i in range(50):
+        keys_by_node.setdefault(id(sharded.get_node(f"k{i}")), f"k{i}")
+    first, second = list(keys_by_node.values())[:2]
+    sharded.get_node(first).pipeline.return_value.execute.return_value = ["r1", "r3"]
+    sharded.get_node(second).pipeline.return_value.execute.return_value = ["r2"]
+    
+    pipe = sharded.pipeline(transaction=False)
+    pipe.get(first)
+    pipe.get(second)
+    pipe.get(first)
+    
+    assert pipe.execute() == ["r1", "r2", "r3"]
+
+
+def test_sharded_rejects_unroutable_commands(sharded):
+    """Test commands without a routable key fail instead of going to a random node."""
+    with pytest.raises(TypeError, match="cannot shard 'xread'"):
+        sharded.xread({"chat:{u1}:reply:abc": "0-0"})
+    with pytest.raises(TypeError, match="cannot shard"):
+        sharded.register_script("return 1")
+    with pytest.raises(TypeError, match="different nodes"):
+        sharded.mget(*[f"session:{{user{i}}}" for i in range(20)])
+    with pytest.raises(TypeError, match="cannot shard 'watch'"):
+        sharded.pipeline().watch("session:{u1}")
+    
+    sharded.mget("chat:{u1}:turn", "chat:{u1}:turn:cancel")
+    sharded.get_node("chat:{u1}:turn").mget.assert_called_once()
+
+
+def test_sharded_scan_iter_fans_out(sharded):
+    """Test SCAN covers every node."""
+    for i, node in enumerate(sharded.nodes):
+        node.scan_iter.return_value = iter([f"session:{i}"])
+    
+    assert sorted(sharded.scan_iter(match="session:*")) == ["session:0", "session:1", "session:2"]
+
+
+def test_create_redis_client_applies_pool_settings():
+    """Test pool size, timeouts and retry policy come from settings."""
+    settings = MagicMock(
+        redis_url_list=["redis://localhost:6379/0"],
+        redis_cluster=False,
+        redis_max_connections=7,
+        redis_pool_timeout=1.5,
+        redis_socket_timeout=0.5,
+        redis_socket_connect_timeout=0.25,
+        redis_health_check_interval=10,
+        redis_retry_attempts=4,
+        redis_retry_backoff_base=0.01,
+        redis_retry_backoff_cap=0.5
+    )
+    
+    client = create_redis_client(settings)
+    pool = client.connection_pool
+    
+    assert isinstance(client, Redis)
+    assert isinstance(pool, BlockingConnectionPool)
+    assert pool.max_connections == 7
+    assert pool.timeout == 1.5
+    assert pool.connection_kwargs["socket_timeout"] == 0.5
+    assert pool.connection_kwargs["socket_connect_timeout"] == 0.25
+    assert pool.connection_kwargs["health_check_interval"] == 10
+    assert pool.connection_kwargs["retry"]._retries == 4
+
+
+def test_pool_stats_sums_sharded_nodes():
+    """Test pool utilization is summed across shards."""
+    nodes = [Redis(connection_pool=BlockingConnectionPool(max_connections=5)) for _ in range(2)]
+    
+    stats = pool_stats(ShardedRedis(nodes))
+    
+    assert stats == {"max": 10, "created": 0, "in_use": 0, "idle": 0}
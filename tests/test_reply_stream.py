@@ -0,0 +1,93 @@
+"""Unit tests for resumable streamed replies."""
+import asyncio
+import pytest
+from unittest.mock import patch
+from app import keys
+from app.redis_client import ShardedRedis
+from app.reply_stream import ReplyNotFound, ReplyPublisher, latest_generation, read_reply
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+@pytest.fixture
+def redis_client():
+    return fakeredis.FakeRedis(decode_responses=True)
+
+
+def _publish_reply(redis_client, generation_id="gen1", chunks=("Hel", "lo")):
+    publisher = ReplyPublisher(redis_client, "user1", generation_id, ttl=60)
+    for chunk in chunks:
+        publisher.publish({"type": "chunk", "content": chunk})
+    publisher.publish({"type": "complete", "response": "".join(chunks)})
+    return publisher
+
+
+def _read(redis_client, generation_id="gen1", after=0):
+    async def run():
+        return [item async for item in read_reply(redis_client, "user1", generation_id, after=after, poll_interval=0.01)]
+    return asyncio.run(run())
+
+
+def test_reply_is_readable_from_any_offset(redis_client):
+    """Test a reconnecting client gets only the events after its offset."""
+    _publish_reply(redis_client)
+    
+    assert [offset for offset, _ in _read(redis_client)] == [1, 2, 3]
+    assert _read(redis_client, after=2) == [(3, {"type": "complete", "response": "Hello"})]
+    assert _read(redis_client, after=3) == []
+
+
+def test_reader_follows_reply_still_generating(redis_client):
+    """Test events published after the reader attached are delivered."""
+    publisher = ReplyPublisher(redis_client, "user1", "gen1", ttl=60)
+    publisher.publish({"type": "chunk", "content": "Hel"})
+    
+    async def generate():
+        for chunk in ("lo", "!"):
+            await asyncio.sleep(0.03)
+            publisher.publish({"type": "chunk", "content": chunk})
+        publisher.publish({"type": "complete", "response": "Hello!"})
+    
+    async def read():
+        return [item async for item in read_reply(redis_client, "user1", "gen1", after=1, poll_interval=0.01)]
+    
+    async def run():
+        events, _ = await asyncio.gather(read(), generate())
+        return events
+    
+    events = asyncio.run(run())
+    
+    assert [event.get("content") for _, event in events[:-1]] == ["lo", "!"]
+    assert events[-1] == (4, {"type": "complete", "response": "Hello!"})
+
+
+def test_reply_streams_expire_and_track_latest(redis_client):
+    """Test streams get a TTL and the latest generation id is recorded."""
+    _publish_reply(redis_client, "gen1")
+    _publish_reply(redis_client, "gen2")
+    
+    assert latest_generation(redis_client, "user1") == "gen2"
+    assert 0 < redis_client.ttl(keys.reply_stream_key("user1", "gen1")) <= 60
+    
+    with pytest.raises(ReplyNotFound):
+        _read(redis_client, "missing")
+
+
+def test_disabled_publisher_writes_nothing(redis_client):
+    """Test a TTL of 0 disables publishing but still numbers events."""
+    publisher = ReplyPublisher(redis_client, "user1", "gen1", ttl=0)
+    
+    assert publisher.publish({"type": "chunk", "content": "Hi"}) == 1
+    assert redis_client.keys("*") == []
+
+
+def test_reply_resumes_with_sharded_redis():
+    """Test a reply is published and resumed on the user's node when sharded."""
+    nodes = [fakeredis.FakeRedis(server=fakeredis.FakeServer(), decode_responses=True) for _ in range(3)]
+    sharded = ShardedRedis(nodes)
+    
+    with patch("app.keys.settings.redis_hash_tags", True):
+        _publish_reply(sharded)
+        
+        assert latest_generation(sharded, "user1") == "gen1"
+        assert [offset for offset, _ in _read(sharded, after=1)] == [2, 3]
@@ -0,0 +1,88 @@
+"""Unit tests for idle expiry of conversation keys and the memory report."""
+import pytest
+from app import keys
+from app.memory import ChatMemoryManager
+from app.retention import REAPER_LOCK_KEY, MemoryReaper, memory_report
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+@pytest.fixture
+def redis_client():
+    return fakeredis.FakeRedis(decode_responses=True)
+
+
+@pytest.mark.parametrize("backend", ["list", "stream"])
+def test_activity_refreshes_idle_ttl(redis_client, backend):
+    """Test appending a message sets the idle TTL on history and metadata."""
+    memory = ChatMemoryManager(redis_client, "user1", backend=backend, idle_ttl=600)
+    memory.set_metadata({"persona": "coach"})
+    redis_client.expire(memory.metadata_key, 5)
+
+    memory.add_message("user", "Hi")
+
+    assert 590 < redis_client.ttl(memory.history_key) <= 600
+    assert 590 < redis_client.ttl(memory.metadata_key) <= 600
+
+
+def test_zero_idle_ttl_keeps_keys(redis_client):
+    """Test MEMORY_IDLE_TTL=0 leaves conversation keys without expiry."""
+    memory = ChatMemoryManager(redis_client, "user1", idle_ttl=0)
+    memory.add_message("user", "Hi")
+    memory.set_metadata({"persona": "coach"})
+
+    assert redis_client.ttl(memory.history_key) == -1
+    assert redis_client.ttl(memory.metadata_key) == -1
+
+
+def test_reaper_sets_missing_ttls_only(redis_client):
+    """Test the reaper backfills TTLs without touching other keys."""
+    redis_client.rpush(keys.history_key("old", "list"), "{}")
+    redis_client.xadd(keys.history_key("old", "stream"), {"message": "{}"})
+    redis_client.set(keys.metadata_key("old"), "{}")
+    redis_client.set(keys.metadata_key("active"), "{}", ex=100)
+    redis_client.set(keys.session_key("old"), "{}")
+
+    counts = MemoryReaper(redis_client, idle_ttl=600, batch_size=2).reap_once()
+
+    assert counts == {"history": 1, "history_stream": 1, "metadata": 1, "chat_session": 0}
+    assert redis_client.ttl(keys.history_key("old", "list")) > 0
+    assert redis_client.ttl(keys.metadata_key("active")) <= 100
+    assert redis_client.ttl(keys.session_key("old")) == -1
+
+
+def test_reaper_pass_is_claimed_once_per_interval(redis_client):
+    """Test only one worker claims a pass within the interval."""
+    first, second = MemoryReaper(redis_client, 600), MemoryReaper(redis_client, 600)
+
+    assert first.claim(60)
+    assert not second.claim(60)
+    assert 0 < redis_client.ttl(REAPER_LOCK_KEY) <= 60
+
+
+def test_memory_report_by_key_type(redis_client):
+    """Test the report counts sampled keys and keys without a TTL per type."""
+    for n in range(3):
+        redis_client.rpush(keys.history_key(f"u{n}", "list"), "{}")
+    redis_client.setex(keys.session_key("u0"), 60, "{}")
+    redis_client.set("unrelated", "x")
+
+    report = memory_report(redis_client, batch_size=2)
+
+    assert report["total_keys"] == report["sampled_keys"] == 5
+    assert report["types"]["history"]["keys"] == 3
+    assert report["types"]["history"]["without_ttl"] == 3
+    assert report["types"]["session"]["without_ttl"] == 0
+    assert report["types"]["other"]["estimated_keys"] == 1
+
+
+def test_key_type():
+    """Test keys are classified by the key schema."""
+    assert keys.key_type("chat:u1:history") == "history"
+    assert keys.key_type("chat:{u1}:log") == "history_stream"
+    assert keys.key_type("chat:u1:turn:cancel") == "turn_lock"
+    assert keys.key_type("chat:u1:idempotency:abc:log") == "idempotency"
+    assert keys.key_type(b"session:u1") == "session"
+    assert keys.key_type(keys.rate_limit_key("u1")) == "rate_limit"
+    assert keys.key_type(keys.token_quota_key("u1", "20260101", "history")) == "quota"
+    assert keys.key_type("nono:reaper:lock") == "other"
@@ -104,9 +104,7 @@ def test_get_session_ttl(session_manager, mock_redis):
 def test_list_active_sessions(session_manager, mock_redis):
     """Test listing active sessions."""
     # Mock scan results
-    mock_redis.scan.side_effect = [
-        (0, [b"session:user1", b"session:user2"])
-    ]
+    mock_redis.scan_iter.return_value = iter(["session:user1", b"session:user2"])
     
     active_users = session_manager.list_active_sessions()
     
@@ -0,0 +1,97 @@
+"""Unit tests for the Redis Streams history backend."""
+import gzip
+import json
+import pytest
+from unittest.mock import patch
+from app.memory import ChatMemoryManager
+from app.session import SessionManager
+from app.stream_history import StreamHistory
+from app.transfer import ConversationTransfer
+from config.config import settings
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+@pytest.fixture
+def redis_client():
+    return fakeredis.FakeRedis(decode_responses=True)
+
+
+def _memory(redis_client, count=0, max_messages=100):
+    memory = ChatMemoryManager(redis_client, "user1", max_messages=max_messages, backend="stream")
+    for n in range(count):
+        memory.add_message("user", f"m{n}")
+    return memory
+
+
+def test_messages_get_stream_ids(redis_client):
+    """Test messages are stored in a stream and carry their entry ids."""
+    memory = _memory(redis_client, 5)
+    
+    messages = memory.get_messages(3)
+    
+    assert memory.history_key == "chat:user1:log"
+    assert redis_client.type(memory.history_key) == "stream"
+    assert [m["content"] for m in messages] == ["m2", "m3", "m4"]
+    assert [m["id"] for m in messages] == [entry for entry, _ in redis_client.xrange(memory.history_key)[2:]]
+    assert memory.message_count() == 5
+    assert memory.get_session_info()["message_count"] == 5
+
+
+def test_pages_by_stream_id(redis_client):
+    """Test paging backwards and forwards with the returned cursors."""
+    memory = _memory(redis_client, 7)
+    
+    page, cursor = memory.get_messages_page(limit=3)
+    assert [m["content"] for m in page] == ["m4", "m5", "m6"]
+    page, cursor = memory.get_messages_page(limit=3, before=cursor)
+    assert [m["content"] for m in page] == ["m1", "m2", "m3"]
+    page, cursor = memory.get_messages_page(limit=3, before=cursor)
+    assert [m["content"] for m in page] == ["m0"] and cursor is None
+    
+    page, cursor = memory.get_messages_page(limit=4, after=page[0]["id"])
+    assert [m["content"] for m in page] == ["m1", "m2", "m3", "m4"]
+    page, cursor = memory.get_messages_page(limit=4, after=cursor)
+    assert [m["content"] for m in page] == ["m5", "m6"] and cursor is None
+
+
+def test_iter_messages_between_cursors(redis_client):
+    """Test batched iteration honours both cursors and rejects bad ones."""
+    memory = _memory(redis_client, 6)
+    ids = [m["id"] for m in memory.get_messages(6)]
+    
+    messages = list(memory.iter_messages(batch_size=2, after=ids[0], before=ids[5]))
+    
+    assert [m["content"] for m in messages] == ["m1", "m2", "m3", "m4"]
+    assert list(memory.iter_messages(after="2000-01-01T00:00:00"))[0]["content"] == "m0"
+    with pytest.raises(ValueError):
+        memory.iter_messages(before="yesterday")
+
+
+def test_cursors_and_import_ids():
+    """Test timestamp and list-backend cursors map to stream ids, and import ids increase."""
+    assert StreamHistory.cursor_id("1700000000000-3") == "1700000000000-3"
+    assert StreamHistory.cursor_id("1970-01-01T00:00:01") == "1000-0"
+    assert StreamHistory.cursor_id(f"{1_500_000_000:020d}") == "1500-0"
+    
+    ids = StreamHistory.entry_ids([
+        {"id": "5000-0"}, {"timestamp": "1970-01-01T00:00:01"}, {}, {"id": f"{6_000_000_000:020d}"}
+    ])
+    assert ids == ["5000-0", "5000-1", "5000-2", "6000-0"]
+
+
+def test_transfer_round_trip(redis_client, tmp_path):
+    """Test export and import read and write the history stream."""
+    memory = _memory(redis_client, 3)
+    original = memory.get_messages()
+    path = str(tmp_path / "export.ndjson.gz")
+    
+    with patch.object(settings, "memory_backend", "stream"):
+        transfer = ConversationTransfer(redis_client, SessionManager(redis_client, 3600))
+        transfer.export(path)
+        memory.clear_history()
+        transfer.import_(path)
+    
+    with gzip.open(path, "rt") as f:
+        assert [m["content"] for m in json.loads(f.readline())["messages"]] == ["m0", "m1", "m2"]
+    assert memory.get_messages() == original
@@ -0,0 +1,71 @@
+"""Unit tests for request tracing."""
+import json
+import pytest
+from app import tracing
+
+
+@pytest.fixture
+def exporter():
+    """Install an in-memory exporter for the test."""
+    exporter = tracing.InMemorySpanExporter()
+    tracing.configure(exporter)
+    yield exporter
+    tracing.configure(None)
+
+
+def test_nested_spans_share_trace(exporter):
+    """Test child spans link to their parent."""
+    with tracing.span("ws.chat_turn") as parent:
+        with tracing.span("memory.add_message") as child:
+            pass
+    
+    assert exporter.names() == ["memory.add_message", "ws.chat_turn"]
+    assert child.trace_id == parent.trace_id
+    assert child.parent_span_id == parent.span_id
+
+
+def test_traced_decorator_records_errors(exporter):
+    """Test decorated functions record failures on their span."""
+    @tracing.traced("llm.generate")
+    def fail():
+        raise RuntimeError("boom")
+    
+    with pytest.raises(RuntimeError):
+        fail()
+    
+    span = exporter.spans[0]
+    assert span.status == "ERROR"
+    assert span.to_otlp()["status"]["code"] == "STATUS_CODE_ERROR"
+
+
+def test_server_timing_summary(exporter):
+    """Test Server-Timing sums categories without double counting nesting."""
+    with tracing.request_trace("POST /api/chat") as trace:
+        with tracing.span("memory.set_metadata"):
+            with tracing.span("memory.get_metadata"):
+                pass
+        with tracing.span("llm.generate"):
+            pass
+        header = trace.server_timing()
+    
+    parts = [part.split(";")[0] for part in header.split(", ")]
+    assert parts == ["memory", "llm", "total"]
+    assert len(trace.spans) == 3
+
+
+def test_file_exporter_writes_otlp(tmp_path):
+    """Test spans are appended as OTLP JSON lines."""
+    path = tmp_path / "traces.jsonl"
+    exporter = tracing.FileSpanExporter(str(path))
+    tracing.configure(exporter)
+    try:
+        with tracing.span("persona.get_persona_info", persona="coach"):
+            pass
+    finally:
+        tracing.configure(None)
+        exporter.close()
+    
+    record = json.loads(path.read_text().splitlines()[0])
+    assert record["name"] == "persona.get_persona_info"
+    assert record["attributes"] == [{"key": "persona", "value": {"stringValue": "coach"}}]
+    assert len(record["traceId"]) == 32
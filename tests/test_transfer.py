@@ -0,0 +1,87 @@
+"""Unit tests for bulk conversation export and import."""
+import gzip
+import json
+import pytest
+from unittest.mock import MagicMock
+from app.session import SessionManager
+from app.transfer import ConversationTransfer
+
+
+@pytest.fixture
+def mock_redis():
+    """Create mock Redis client."""
+    return MagicMock()
+
+
+@pytest.fixture
+def transfer(mock_redis):
+    """Create ConversationTransfer with a small batch size."""
+    return ConversationTransfer(mock_redis, SessionManager(mock_redis, 3600), batch_size=2)
+
+
+def test_export_writes_one_line_per_user(transfer, mock_redis, tmp_path):
+    """Test export pipelines reads per batch and writes NDJSON."""
+    mock_redis.scan_iter.side_effect = [iter(["chat:u1:history", "chat:u2:history"]), iter([]), iter([])]
+    pipe = mock_redis.pipeline.return_value
+    pipe.execute.return_value = [
+        [json.dumps({"role": "user", "content": "Hi"})], json.dumps({"persona": "coach"}),
+        json.dumps({"user_id": "u1"}), 120,
+        [], None, None, -2,
+    ]
+    output = tmp_path / "export.ndjson.gz"
+    
+    summary = transfer.export(str(output))
+    
+    with gzip.open(output, "rt") as f:
+        records = [json.loads(line) for line in f]
+    assert [r["user_id"] for r in records] == ["u1", "u2"]
+    assert records[0]["messages"][0]["content"] == "Hi"
+    assert records[0]["session_ttl"] == 120
+    assert records[1]["session"] is None
+    assert summary["users"] == 2
+    assert summary["messages"] == 1
+    mock_redis.pipeline.assert_called_with(transaction=False)
+
+
+def test_import_writes_batches(transfer, mock_redis, tmp_path):
+    """Test import replays records through pipelines."""
+    source = tmp_path / "import.ndjson.gz"
+    with gzip.open(source, "wt") as f:
+        for i in range(3):
+            f.write(json.dumps({
+                "user_id": f"u{i}",
+                "messages": [{"role": "user", "content": "Hi"}],
+                "metadata": {},
+                "session": {"user_id": f"u{i}"},
+                "session_ttl": None
+            }) + "\n")
+    
+    summary = transfer.import_(str(source))
+    
+    pipe = mock_redis.pipeline.return_value
+    assert pipe.execute.call_count == 2
+    assert pipe.rpush.call_count == 3
+    pipe.setex.assert_any_call("session:u0", 3600, json.dumps({"user_id": "u0"}))
+    assert summary["users"] == 3
+
+
+def test_import_caps_and_expires_history(transfer, mock_redis, tmp_path):
+    """Test imported history is trimmed and expires like add_message writes."""
+    source = tmp_path / "import.ndjson.gz"
+    with gzip.open(source, "wt") as f:
+        f.write(json.dumps({
+            "user_id": "u1",
+            "messages": [{"role": "user", "content": str(i)} for i in range(25)],
+            "metadata": {"persona": "coach"},
+            "session": None,
+            "session_ttl": None
+        }) + "\n")
+    
+    transfer.import_(str(source))
+    
+    pipe = mock_redis.pipeline.return_value
+    pipe.delete.assert_called_once()
+    assert "session:u1" in pipe.delete.call_args.args
+    pipe.ltrim.assert_called_once_with("chat:u1:history", -10, -1)
+    pipe.expire.assert_any_call("chat:u1:history", 2592000)
+    pipe.expire.assert_any_call("chat:u1:metadata", 2592000)
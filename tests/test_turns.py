@@ -0,0 +1,133 @@
+"""Unit tests for per-user turn locking and idempotent replies."""
+import asyncio
+import pytest
+from unittest.mock import patch
+from app import keys
+from app.redis_client import ShardedRedis
+from app.turns import IdempotencyStore, TurnCancelled, UserBusyError, UserTurnLock
+
+fakeredis = pytest.importorskip("fakeredis")
+pytest.importorskip("lupa")  # fakeredis needs lupa to run the release script
+
+
+@pytest.fixture
+def redis_client():
+    return fakeredis.FakeRedis(decode_responses=True)
+
+
+def _lock(redis_client, **kwargs):
+    return UserTurnLock(redis_client, poll_interval=0.01, **kwargs)
+
+
+def test_turns_for_one_user_run_one_at_a_time(redis_client):
+    """Test a second turn waits until the first releases the lock."""
+    events = []
+    
+    async def turn(name, delay):
+        await asyncio.sleep(delay)
+        async with _lock(redis_client).hold("user1"):
+            events.append(f"{name} start")
+            await asyncio.sleep(0.05)
+            events.append(f"{name} end")
+    
+    async def run():
+        await asyncio.gather(turn("first", 0), turn("second", 0.01))
+    
+    asyncio.run(run())
+    
+    assert events == ["first start", "first end", "second start", "second end"]
+    assert not redis_client.exists(keys.turn_lock_key("user1"))
+
+
+def test_other_users_are_not_blocked(redis_client):
+    """Test the lock is per user."""
+    async def run():
+        async with _lock(redis_client).hold("user1"):
+            async with _lock(redis_client, wait_timeout=0.05).hold("user2"):
+                return True
+    
+    assert asyncio.run(run())
+
+
+def test_new_turn_supersedes_running_turn(redis_client):
+    """Test supersede cancels the holder, which stops at its next check."""
+    outcome = {}
+    
+    async def running():
+        try:
+            async with _lock(redis_client).hold("user1") as turn:
+                for _ in range(100):
+                    await asyncio.sleep(0.01)
+                    turn.check()
+        except TurnCancelled:
+            outcome["first"] = "cancelled"
+    
+    async def newer():
+        await asyncio.sleep(0.02)
+        async with _lock(redis_client).hold("user1", supersede=True) as turn:
+            outcome["second"] = "cancelled" if turn.cancelled else "ran"
+    
+    async def run():
+        await asyncio.gather(running(), newer())
+    
+    asyncio.run(run())
+    
+    assert outcome == {"first": "cancelled", "second": "ran"}
+    assert not redis_client.exists(keys.turn_cancel_key("user1"))
+
+
+def test_retry_with_same_key_does_not_supersede(redis_client):
+    """Test a retry waits for the request it repeats instead of cancelling it."""
+    async def run():
+        async with _lock(redis_client).hold("user1", owner="req-1") as turn:
+            with pytest.raises(UserBusyError):
+                async with _lock(redis_client, wait_timeout=0.05).hold("user1", supersede=True, owner="req-1"):
+                    pass
+            await asyncio.sleep(0.03)
+            return turn.cancelled
+    
+    assert asyncio.run(run()) is False
+
+
+def test_lock_expires_if_holder_dies(redis_client):
+    """Test the lock has a TTL and waiting turns give up with UserBusyError."""
+    redis_client.set(keys.turn_lock_key("user1"), "dead-worker:", px=100)
+    
+    async def run():
+        with pytest.raises(UserBusyError):
+            async with _lock(redis_client, wait_timeout=0.02).hold("user1"):
+                pass
+        async with _lock(redis_client, wait_timeout=1).hold("user1") as turn:
+            return turn
+    
+    assert asyncio.run(run()).cancelled is False
+
+
+def test_idempotency_store(redis_client):
+    """Test stored replies are returned per user and key, with a TTL."""
+    store = IdempotencyStore(redis_client, ttl=60)
+    
+    assert store.get("user1", "req-1") is None
+    store.put("user1", "req-1", {"response": "Hello"})
+    
+    assert store.get("user1", "req-1") == {"response": "Hello"}
+    assert store.get("user2", "req-1") is None
+    assert 0 < redis_client.ttl(keys.idempotency_key("user1", "req-1")) <= 60
+
+
+def test_lock_with_sharded_redis():
+    """Test turns acquire and release the lock on the user's node when sharded."""
+    nodes = [fakeredis.FakeRedis(server=fakeredis.FakeServer(), decode_responses=True) for _ in range(3)]
+    sharded = ShardedRedis(nodes)
+    
+    async def run():
+        for _ in range(2):
+            async with _lock(sharded, wait_timeout=0.5).hold("user1"):
+                pass
+    
+    with patch("app.keys.settings.redis_hash_tags", True):
+        asyncio.run(run())
+        lock_key = keys.turn_lock_key("user1")
+    
+    assert lock_key == "chat:{user1}:turn"
+    assert not any(node.exists(lock_key) for node in nodes)
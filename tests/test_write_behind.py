@@ -0,0 +1,134 @@
+"""Unit tests for write-behind persistence."""
+import asyncio
+import pytest
+from unittest.mock import patch
+from redis.exceptions import ConnectionError
+from app.memory import ChatMemoryManager
+from app.session import SessionManager
+from app.write_behind import WriteBehindBuffer
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+@pytest.fixture
+def redis_client():
+    return fakeredis.FakeRedis(decode_responses=True)
+
+
+@pytest.fixture
+def sessions(redis_client):
+    manager = SessionManager(redis_client, 3600)
+    for user_id in ("user1", "user2"):
+        manager.create_session(user_id, "coach")
+    return manager
+
+
+def _turn(buffer, redis_client, user_id, reply="Hello"):
+    memory = ChatMemoryManager(redis_client, user_id)
+    memory.add_message("user", "Hi")
+    buffer.add_message(memory, "assistant", reply)
+    buffer.update_session(user_id, count_messages=memory)
+    return memory
+
+
+def test_writes_are_deferred_until_flush(redis_client, sessions):
+    """Test replies and message counts are written by the flush, for all users at once."""
+    buffer = WriteBehindBuffer(redis_client, sessions)
+    first = _turn(buffer, redis_client, "user1")
+    second = _turn(buffer, redis_client, "user2", "Hey")
+    
+    assert [m["role"] for m in first.get_messages()] == ["user"]
+    assert buffer.has_pending("user1") and buffer.pending == 4
+    
+    assert buffer.flush() == 4
+    
+    assert [m["content"] for m in first.get_messages()] == ["Hi", "Hello"]
+    assert second.get_messages()[-1]["content"] == "Hey"
+    assert sessions.get_session("user1")["message_count"] == 1
+    assert buffer.pending == 0 and not buffer.has_pending("user1")
+
+
+def test_flush_user_writes_only_that_user(redis_client, sessions):
+    """Test a user's next turn flushes their queued reply and leaves other users queued."""
+    buffer = WriteBehindBuffer(redis_client, sessions)
+    memory = _turn(buffer, redis_client, "user1")
+    other = _turn(buffer, redis_client, "user2", "Hey")
+    
+    assert buffer.flush_user("ghost") == 0
+    assert buffer.pending == 4
+    
+    assert buffer.flush_user("user1") == 2
+    assert len(memory.get_messages()) == 2
+    assert sessions.get_session("user1")["message_count"] == 1
+    assert buffer.pending == 2 and buffer.has_pending("user2")
+    assert len(other.get_messages()) == 1
+
+
+def test_failed_flush_is_retried(redis_client, sessions):
+    """Test writes stay queued, in order, when Redis fails."""
+    buffer = WriteBehindBuffer(redis_client, sessions)
+    memory = _turn(buffer, redis_client, "user1", "first")
+    
+    with patch.object(redis_client, "pipeline", side_effect=ConnectionError("down")):
+        assert buffer.flush() == 0
+    buffer.add_message(memory, "assistant", "second")
+    
+    assert buffer.flush() == 3
+    assert [m["content"] for m in memory.get_messages()] == ["Hi", "first", "second"]
+    assert sessions.get_session("user1")["message_count"] == 1
+
+
+def test_background_flush_and_close(redis_client, sessions):
+    """Test the flush task writes on its interval and close flushes the rest."""
+    async def run():
+        buffer = WriteBehindBuffer(redis_client, sessions, interval=0.01)
+        buffer.start()
+        memory = _turn(buffer, redis_client, "user1")
+        await asyncio.sleep(0.05)
+        flushed = len(memory.get_messages())
+        
+        buffer.interval = 60
+        await asyncio.sleep(0.02)
+        _turn(buffer, redis_client, "user2")
+        left = await buffer.close()
+        return flushed, left, buffer.pending
+    
+    flushed, left, pending = asyncio.run(run())
+    
+    assert flushed == 2
+    assert left == pending == 0
+    assert len(ChatMemoryManager(redis_client, "user2").get_messages()) == 2
+
+
+def test_update_sessions_skips_missing(redis_client, sessions):
+    """Test batched session updates only touch existing sessions."""
+    updated = sessions.update_sessions({"user1": {"message_count": 3}, "ghost": {"message_count": 1}})
+    
+    assert updated == 1
+    assert sessions.get_session("user1")["message_count"] == 3
+    assert sessions.get_session("ghost") is None
+
+
+def test_failed_user_is_retried_without_duplicates(redis_client, sessions):
+    """Test a flush that fails for one user writes the others once and retries only the failed user."""
+    buffer = WriteBehindBuffer(redis_client, sessions)
+    first = _turn(buffer, redis_client, "user1", "one")
+    second = _turn(buffer, redis_client, "user2", "two")
+    real_pipeline = redis_client.pipeline
+    calls = []
+    
+    def flaky_pipeline(*args, **kwargs):
+        calls.append(kwargs)
+        if len(calls) == 2:
+            raise ConnectionError("down")
+        return real_pipeline(*args, **kwargs)
+    
+    with patch.object(redis_client, "pipeline", side_effect=flaky_pipeline):
+        assert buffer.flush() == 2
+    assert buffer.has_pending("user2") and not buffer.has_pending("user1")
+    
+    buffer.flush()
+    
+    assert [m["content"] for m in first.get_messages()] == ["Hi", "one"]
+    assert [m["content"] for m in second.get_messages()] == ["Hi", "two"]
+    assert sessions.get_session("user2")["message_count"] == 1